@@ -0,0 +1,185 @@
+"""
+Admission Control for SwiftCart Order Manager
+Decides, before an order is ingested, whether the system can take it.
+Orders are rejected outright while the queue is at its depth limit, and
+otherwise pass a global token bucket and one per customer. Bucket refill
+rates shrink as the queue fills past its soft limit or recent p95
+processing latency rises above its target, so ingest slows down before
+the queue limit is reached. Rejections carry the time until a retry can
+succeed, which the API returns as Retry-After.
+"""
+
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# Recent latency is read from this OrderMetrics window
+LATENCY_WINDOW_SEC = 60
+
+
+class TokenBucket:
+    """Tokens refill at `rate` per second (times a pressure factor) up to `capacity`."""
+
+    __slots__ = ('capacity', 'tokens', 'updated')
+
+    def __init__(self, capacity: float, now: float):
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def refill(self, rate: float, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+    def wait_for(self, count: int, rate: float) -> float:
+        """
+        Seconds until `count` tokens are available (0 if they are now).
+        A count above capacity only waits for a full bucket and leaves it
+        in debt, so large batches are slowed rather than never admitted.
+        """
+        needed = min(count, self.capacity)
+        if self.tokens >= needed:
+            return 0.0
+        return (needed - self.tokens) / rate if rate > 0 else math.inf
+
+
+class AdmissionController:
+    """
+    A rate or depth of 0 disables that limit. `metrics` is the server's
+    OrderMetrics, read for queue depth, throughput and recent latency;
+    the pressure factor is recomputed at most every `refresh_sec`.
+    Per-customer buckets are kept for the `max_customers` most recently
+    seen customers. Runs on the event loop only, so no locking.
+    """
+
+    def __init__(self, metrics, global_rate: float = 0.0, global_burst: float = 0.0,
+                 customer_rate: float = 0.0, customer_burst: float = 0.0,
+                 max_queue_depth: int = 10_000, soft_queue_ratio: float = 0.5,
+                 latency_target_ms: float = 0.0, min_rate_factor: float = 0.1,
+                 max_customers: int = 100_000, refresh_sec: float = 1.0):
+        self.metrics = metrics
+        self.global_rate = global_rate
+        self.customer_rate = customer_rate
+        self.global_burst = global_burst or global_rate
+        self.customer_burst = customer_burst or customer_rate
+        self.max_queue_depth = max_queue_depth
+        self.soft_queue_depth = max_queue_depth * soft_queue_ratio
+        self.latency_target_ms = latency_target_ms
+        self.min_rate_factor = min_rate_factor
+        self.max_customers = max_customers
+        self.refresh_sec = refresh_sec
+
+        now = time.monotonic()
+        self._global = TokenBucket(self.global_burst, now)
+        self._customers: 'OrderedDict[str, TokenBucket]' = OrderedDict()
+        self.rate_factor = 1.0
+        self.recent_p95_ms = 0.0
+        self._refreshed_at = -math.inf
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "global": 0, "customer": 0}
+
+    @classmethod
+    def from_env(cls, metrics):
+        return cls(
+            metrics,
+            global_rate=float(os.environ.get('ADMISSION_GLOBAL_RATE', 0)),
+            global_burst=float(os.environ.get('ADMISSION_GLOBAL_BURST', 0)),
+            customer_rate=float(os.environ.get('ADMISSION_CUSTOMER_RATE', 0)),
+            customer_burst=float(os.environ.get('ADMISSION_CUSTOMER_BURST', 0)),
+            max_queue_depth=int(os.environ.get('ADMISSION_MAX_QUEUE_DEPTH', 10_000)),
+            latency_target_ms=float(os.environ.get('ADMISSION_LATENCY_TARGET_MS', 0)),
+            min_rate_factor=float(os.environ.get('ADMISSION_MIN_RATE_FACTOR', 0.1)),
+        )
+
+    def _refresh(self, now: float):
+        """Recompute the pressure factor from queue depth and recent latency."""
+        self._refreshed_at = now
+        factor = 1.0
+        depth = self.metrics.queue_depth
+        if self.max_queue_depth and depth > self.soft_queue_depth:
+            factor = 1 - (depth - self.soft_queue_depth) / (self.max_queue_depth - self.soft_queue_depth)
+        if self.latency_target_ms:
+            self.recent_p95_ms = self.metrics.latency.window(LATENCY_WINDOW_SEC).percentile(95)
+            if self.recent_p95_ms > self.latency_target_ms:
+                factor = min(factor, self.latency_target_ms / self.recent_p95_ms)
+        self.rate_factor = max(self.min_rate_factor, factor)
+
+    def _customer_bucket(self, customer_id: str, now: float) -> TokenBucket:
+        bucket = self._customers.get(customer_id)
+        if bucket is None:
+            bucket = self._customers[customer_id] = TokenBucket(self.customer_burst, now)
+            if len(self._customers) > self.max_customers:
+                self._customers.popitem(last=False)
+        else:
+            self._customers.move_to_end(customer_id)
+        return bucket
+
+    def _queue_retry_after(self) -> float:
+        """Time for the worker to drain the queue back under its soft limit."""
+        excess = self.metrics.queue_depth - self.soft_queue_depth
+        return min(60.0, max(1.0, excess / max(self.metrics.throughput_per_sec(), 1.0)))
+
+    def admit(self, customer_counts: Dict[str, int], now: Optional[float] = None) -> Optional[float]:
+        """
+        Admit orders given as {customer_id: count}; all or none are taken.
+        Returns None when admitted, else the seconds to wait before retrying.
+        """
+        now = now if now is not None else time.monotonic()
+        if now - self._refreshed_at >= self.refresh_sec:
+            self._refresh(now)
+        total = sum(customer_counts.values())
+
+        if self.max_queue_depth and self.metrics.queue_depth + total > self.max_queue_depth:
+            self.rejected["queue_full"] += total
+            return self._queue_retry_after()
+
+        wait, reason = 0.0, None
+        if self.global_rate:
+            rate = self.global_rate * self.rate_factor
+            self._global.refill(rate, now)
+            wait, reason = self._global.wait_for(total, rate), "global"
+        buckets = []
+        if self.customer_rate:
+            rate = self.customer_rate * self.rate_factor
+            for customer_id, count in customer_counts.items():
+                bucket = self._customer_bucket(customer_id, now)
+                bucket.refill(rate, now)
+                customer_wait = bucket.wait_for(count, rate)
+                if customer_wait > wait:
+                    wait, reason = customer_wait, "customer"
+                buckets.append((bucket, count))
+        if wait > 0:
+            self.rejected[reason] += total
+            return wait
+
+        if self.global_rate:
+            self._global.tokens -= total
+        for bucket, count in buckets:
+            bucket.tokens -= count
+        self.admitted += total
+        return None
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "rate_factor": round(self.rate_factor, 3),
+            "queue_depth": self.metrics.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "recent_p95_ms": self.recent_p95_ms,
+            "latency_target_ms": self.latency_target_ms,
+            "global": {
+                "rate": self.global_rate,
+                "burst": self.global_burst,
+                "tokens": round(self._global.tokens, 2),
+            },
+            "customer": {
+                "rate": self.customer_rate,
+                "burst": self.customer_burst,
+                "tracked": len(self._customers),
+            },
+        }
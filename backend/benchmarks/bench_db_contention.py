@@ -0,0 +1,110 @@
+"""
+InMemoryDB Lock Contention Benchmark
+Compares ingest throughput of the striped / per-collection locking in
+InMemoryDB against a single global lock, while several order processor
+workers run alongside the ingest clients.
+
+Each write awaits a simulated durable-storage latency (--io-ms) inside
+its critical section, which is where lock granularity decides how much
+work can overlap.
+
+Run with: python backend/benchmarks/bench_db_contention.py
+"""
+
+import argparse
+import asyncio
+import contextlib
+import itertools
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from storage import InMemoryDB  # noqa: E402
+
+
+class SimulatedIODB(InMemoryDB):
+    """InMemoryDB whose writes await a fixed storage latency."""
+
+    def __init__(self, io_ms, **kwargs):
+        super().__init__(**kwargs)
+        self._io_sec = io_ms / 1000
+
+    async def _persist(self, collection, op, payload, outbox_rows=()):
+        # Outbox rows share the write's commit, as in InMemoryDB._persist
+        await asyncio.sleep(self._io_sec)
+
+
+class GlobalLockDB(SimulatedIODB):
+    """Baseline: every operation serializes behind one lock."""
+
+    def __init__(self, io_ms, **kwargs):
+        super().__init__(io_ms, **kwargs)
+        self._global_lock = asyncio.Lock()
+
+    def _stripe_lock(self, key):
+        return self._global_lock
+
+    def _collection_lock(self, collection):
+        # Already covered by the global lock taken as the "stripe"
+        return contextlib.nullcontext()
+
+
+async def run_workload(db, clients, workers, duration):
+    ids = itertools.count()
+    ingested = 0
+    processed = 0
+    deadline = time.perf_counter() + duration
+
+    async def ingest_client():
+        nonlocal ingested
+        while time.perf_counter() < deadline:
+            order_id = f"ORD-{next(ids)}"
+            await db.insert_one("idempotency_keys", {"key": f"k-{order_id}", "order_id": order_id})
+            await db.insert_one("orders_queue", {"order_id": order_id, "status": "pending", "processed": False})
+            ingested += 1
+
+    async def worker():
+        nonlocal processed
+        while time.perf_counter() < deadline:
+            doc = await db.find_one("orders_queue", {"processed": False})
+            if doc is None:
+                await asyncio.sleep(0.001)
+                continue
+            order_id = doc["order_id"]
+            await db.update_one("orders_queue", {"order_id": order_id}, {"$set": {"processed": True}})
+            await db.update_one("orders", {"order_id": order_id}, {"$set": {**doc, "status": "completed"}}, upsert=True)
+            await db.insert_one("order_events", {"order_id": order_id, "event_type": "order_completed"})
+            processed += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(ingest_client() for _ in range(clients)),
+        *(worker() for _ in range(workers)),
+    )
+    elapsed = time.perf_counter() - start
+    return ingested / elapsed, processed / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--io-ms", type=float, default=1.0, help="simulated latency per write")
+    parser.add_argument("--duration", type=float, default=2.0, help="seconds per scenario")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 50, 200])
+    args = parser.parse_args()
+
+    print(f"{'clients':>8} {'workers':>8} {'global ingest/s':>16} {'striped ingest/s':>17} {'speedup':>8}")
+    for workers in args.workers:
+        for clients in args.clients:
+            global_ingest, _ = asyncio.run(run_workload(GlobalLockDB(args.io_ms), clients, workers, args.duration))
+            striped_ingest, _ = asyncio.run(run_workload(SimulatedIODB(args.io_ms), clients, workers, args.duration))
+            print(
+                f"{clients:>8} {workers:>8} {global_ingest:>16.0f} {striped_ingest:>17.0f} "
+                f"{striped_ingest / max(global_ingest, 1e-9):>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
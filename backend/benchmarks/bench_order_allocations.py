@@ -0,0 +1,140 @@
+"""
+Order Lifecycle Allocation Benchmark
+Memory allocated per order across ingest and processing, for the previous
+copy-per-stage path (pydantic Order -> model_dump -> Kafka copy ->
+full-snapshot OrderEvent) versus the shared-document path the server uses
+now (one order dict, status-delta events). Measured with tracemalloc:
+`retained` is what stays in the queue, orders and order_events stores,
+`peak` the largest transient footprint while handling a single order.
+Response encoding is identical for both paths and is left out.
+
+Run with: python backend/benchmarks/bench_order_allocations.py --orders 20000
+"""
+
+import argparse
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from server import (  # noqa: E402
+    Order, OrderCreate, OrderEvent, build_order_doc, build_status_event,
+    generate_event_id, generate_order_id,
+)
+from storage.records import OrderRecord  # noqa: E402
+
+PRODUCTS = [(f"PROD-{i:03d}", f"Product {i}") for i in range(100)]
+
+
+def make_input(n, rng):
+    return OrderCreate(
+        customer_id=f"CUST-{rng.randrange(100_000)}",
+        customer_name=f"Customer {rng.randrange(100_000)}",
+        items=[
+            {"product_id": pid, "name": name, "quantity": rng.randint(1, 5), "price": round(rng.uniform(10, 500), 2)}
+            for pid, name in rng.sample(PRODUCTS, rng.randint(1, 3))
+        ],
+        idempotency_key=f"key-{n:012x}",
+    )
+
+
+def finish(doc, rng):
+    doc["status"] = "completed" if rng.random() > 0.05 else "failed"
+    doc["processing_time_ms"] = rng.uniform(50, 200)
+    doc["updated_at"] = datetime.now(timezone.utc).isoformat()
+
+
+def legacy_lifecycle(order_input, stores, rng):
+    """The pre-change create_order + order_processor_worker data flow."""
+    queue, orders, events = stores
+    subtotal = sum(item.quantity * item.price for item in order_input.items)
+    tax = subtotal * 0.1
+    now = datetime.now(timezone.utc)
+    order = Order(
+        order_id=generate_order_id(), customer_id=order_input.customer_id,
+        customer_name=order_input.customer_name, items=order_input.items,
+        subtotal=subtotal, tax=tax, total=subtotal + tax, status="pending",
+        idempotency_key=order_input.idempotency_key, created_at=now, updated_at=now,
+    )
+    queue_doc = order.model_dump()
+    queue_doc['created_at'] = queue_doc['created_at'].isoformat()
+    queue_doc['updated_at'] = queue_doc['updated_at'].isoformat()
+    queue_doc['processed'] = False
+    queue[queue_doc["order_id"]] = queue_doc
+    json.dumps({**queue_doc, "event_type": "order_created"}, default=str)
+
+    finish(queue_doc, rng)
+    order_fields = {k: v for k, v in queue_doc.items() if k != "processed"}
+    orders[queue_doc["order_id"]] = OrderRecord.from_doc(order_fields)
+    queue_doc["processed"] = True
+    event_doc = OrderEvent(
+        event_id=generate_event_id(), order_id=queue_doc["order_id"],
+        event_type=f"order_{queue_doc['status']}", timestamp=datetime.now(timezone.utc),
+        data=queue_doc,
+    ).model_dump()
+    event_doc['timestamp'] = event_doc['timestamp'].isoformat()
+    events.append(event_doc)
+    json.dumps(event_doc, default=str)
+
+
+def shared_lifecycle(order_input, stores, rng):
+    """The current data flow: one document, status-delta events."""
+    queue, orders, events = stores
+    doc = build_order_doc(order_input, generate_order_id(), order_input.idempotency_key,
+                          datetime.now(timezone.utc))
+    queue[doc["order_id"]] = doc
+    json.dumps(doc, default=str)
+
+    finish(doc, rng)
+    orders[doc["order_id"]] = OrderRecord.from_doc(doc)
+    doc["processed"] = True
+    event_doc = build_status_event(doc["order_id"], doc["status"], doc["processing_time_ms"],
+                                   datetime.now(timezone.utc))
+    events.append(event_doc)
+    json.dumps(event_doc, default=str)
+
+
+def measure(label, lifecycle, inputs):
+    rng = random.Random(7)
+    stores = ({}, {}, [])
+    gc.collect()
+    tracemalloc.start()
+    peak_total = 0
+    start = time.perf_counter()
+    for order_input in inputs:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        lifecycle(order_input, stores, rng)
+        _, peak = tracemalloc.get_traced_memory()
+        peak_total += peak - before
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    n = len(inputs)
+    print(f"{label:>8} {retained / n:>10.0f} {peak_total / n:>10.0f} {elapsed / n * 1e6:>10.1f}")
+    return retained / n, peak_total / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--orders", type=int, default=20_000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    inputs = [make_input(n, rng) for n in range(args.orders)]
+    print(f"{args.orders} orders (tracemalloc adds overhead to the timings)")
+    print(f"{'path':>8} {'retained B':>10} {'peak B':>10} {'us/order':>10}")
+    old = measure("legacy", legacy_lifecycle, inputs)
+    new = measure("shared", shared_lifecycle, inputs)
+    print(f"{'saving':>8} {(1 - new[0] / old[0]) * 100:>9.1f}% {(1 - new[1] / old[1]) * 100:>9.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Order ID Benchmark
+Generation cost of the time-sortable ORD- IDs against the previous
+uuid4-hex IDs, and uniqueness across --processes forked processes.
+
+Run with: python backend/benchmarks/bench_order_ids.py --ids 1000000
+"""
+
+import argparse
+import multiprocessing
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ids import generate_order_id  # noqa: E402
+
+
+def uuid_order_id():
+    return f"ORD-{uuid.uuid4().hex[:12].upper()}"
+
+
+def rate(fn, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        fn()
+    return count / (time.perf_counter() - start)
+
+
+def generate_batch(count):
+    return [generate_order_id() for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--ids", type=int, default=1_000_000)
+    parser.add_argument("--processes", type=int, default=8)
+    args = parser.parse_args()
+
+    uuid_rate = rate(uuid_order_id, args.ids)
+    sortable_rate = rate(generate_order_id, args.ids)
+    print(f"{'uuid4 hex':>12} {uuid_rate:>12,.0f} ids/s")
+    print(f"{'sortable':>12} {sortable_rate:>12,.0f} ids/s  ({sortable_rate / uuid_rate:.1f}x)")
+
+    per_process = args.ids // args.processes
+    with multiprocessing.get_context("fork").Pool(args.processes) as pool:
+        batches = pool.map(generate_batch, [per_process] * args.processes)
+    issued = [order_id for batch in batches for order_id in batch]
+    print(f"{args.processes} processes: {len(issued):,} ids, {len(set(issued)):,} unique, "
+          f"each process sorted: {all(b == sorted(b) for b in batches)}")
+
+
+if __name__ == "__main__":
+    main()
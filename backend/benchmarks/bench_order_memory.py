@@ -0,0 +1,81 @@
+"""
+Order Record Memory Benchmark
+Bytes per stored order for plain document dicts (the previous in-memory
+representation) versus slotted OrderRecords, measured with tracemalloc.
+
+Run with: python backend/benchmarks/bench_order_memory.py --orders 1000000
+"""
+
+import argparse
+import gc
+import random
+import sys
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from storage.records import OrderRecord  # noqa: E402
+
+PRODUCTS = [(f"PROD-{i:03d}", f"Product {i}") for i in range(100)]
+STATUSES = ["completed"] * 19 + ["failed"]
+
+
+def make_doc(n, rng, start):
+    """An order document shaped like the ones the order processor stores."""
+    items = [
+        {"product_id": pid, "name": name, "quantity": rng.randint(1, 5), "price": round(rng.uniform(10, 500), 2)}
+        for pid, name in rng.sample(PRODUCTS, rng.randint(1, 3))
+    ]
+    subtotal = sum(i["quantity"] * i["price"] for i in items)
+    created = start + timedelta(microseconds=n * 1731)
+    return {
+        "order_id": f"ORD-{n:012X}",
+        "customer_id": f"CUST-{rng.randrange(100_000)}",
+        "customer_name": f"Customer {rng.randrange(100_000)}",
+        "items": items,
+        "subtotal": subtotal,
+        "tax": subtotal * 0.1,
+        "total": subtotal * 1.1,
+        "status": "".join(rng.choice(STATUSES)),  # a fresh string, as decoded from JSON
+        "idempotency_key": f"key-{n:012x}",
+        "created_at": created.isoformat(),
+        "updated_at": (created + timedelta(milliseconds=120)).isoformat(),
+        "processing_time_ms": rng.uniform(50, 200),
+    }
+
+
+def measure(label, num_orders, build):
+    rng = random.Random(42)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    gc.collect()
+    tracemalloc.start()
+    store = {}
+    for n in range(num_orders):
+        doc = make_doc(n, rng, start)
+        store[doc["order_id"]] = build(doc)
+        del doc
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    per_order = current / num_orders
+    print(f"{label:>14} {current / 1e6:>10.1f} MB {per_order:>10.0f} B/order")
+    del store
+    gc.collect()
+    return per_order
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"{args.orders} orders (includes the order_id -> value index)")
+    before = measure("dict docs", args.orders, lambda doc: doc)
+    after = measure("OrderRecord", args.orders, OrderRecord.from_doc)
+    print(f"{'saving':>14} {(1 - after / before) * 100:>10.1f} %")
+
+
+if __name__ == "__main__":
+    main()
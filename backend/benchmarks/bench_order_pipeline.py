@@ -0,0 +1,88 @@
+"""
+Order Pipeline Benchmark
+Throughput of the staged order pipeline (validation → enrichment →
+calculation, shaped like the server's: a cheap check, an I/O wait, and a
+short CPU step) as the enrichment stage's concurrency grows, with the
+other stages left narrow. The per-stage table shows which stage is the
+bottleneck at each setting: the stage orders queue in front of.
+
+Run with: python backend/benchmarks/bench_order_pipeline.py --orders 2000 --enrichment 1,4,16,64,256
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from order_pipeline import OrderPipeline, Stage  # noqa: E402
+
+
+def make_stages(enrichment, io_ms, cpu_ms, calculation):
+    async def validate(order):
+        if not order["items"]:
+            raise ValueError("no items")
+
+    async def enrich(order):
+        await asyncio.sleep(random.uniform(0.5, 1.5) * io_ms / 1000)
+
+    async def calculate(order):
+        deadline = time.perf_counter() + cpu_ms / 1000
+        while time.perf_counter() < deadline:
+            pass
+        order["total"] = sum(item["price"] for item in order["items"])
+
+    return [
+        Stage("validation", validate, concurrency=4),
+        Stage("enrichment", enrich, concurrency=enrichment),
+        Stage("calculation", calculate, concurrency=calculation),
+    ]
+
+
+async def run(num_orders, enrichment, io_ms, cpu_ms, calculation, submitters):
+    pipeline = OrderPipeline(make_stages(enrichment, io_ms, cpu_ms, calculation))
+    pipeline.start()
+    orders = [{"order_id": f"ORD-{i:08d}", "items": [{"price": 10.0}]} for i in range(num_orders)]
+
+    # Like worker-pool workers, each submitter runs one order at a time
+    async def submit(chunk):
+        for order in chunk:
+            await pipeline.run([order])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(submit(orders[i::submitters]) for i in range(submitters)))
+    elapsed = time.perf_counter() - start
+    stats = pipeline.stats
+    await pipeline.stop()
+    return num_orders / elapsed, stats["stages"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--enrichment", default="1,4,16,64,256", help="enrichment concurrency settings")
+    parser.add_argument("--calculation", type=int, default=1)
+    parser.add_argument("--io-ms", type=float, default=20.0, help="mean enrichment wait per order")
+    parser.add_argument("--cpu-ms", type=float, default=0.2, help="calculation CPU time per order")
+    parser.add_argument("--submitters", type=int, default=256, help="orders in flight (worker pool size)")
+    args = parser.parse_args()
+
+    print(f"{args.orders:,} orders, {args.io_ms:g}ms enrichment I/O, {args.cpu_ms:g}ms calculation CPU, "
+          f"{args.submitters} submitters")
+    print(f"{'enrich':>7} {'orders/s':>10} {'speedup':>8}   per stage: queue wait p50 / handler p50 (ms)")
+    baseline = None
+    for enrichment in (int(n) for n in args.enrichment.split(",")):
+        throughput, stages = asyncio.run(run(args.orders, enrichment, args.io_ms, args.cpu_ms,
+                                             args.calculation, args.submitters))
+        baseline = baseline or throughput
+        per_stage = "  ".join(
+            f"{s['name'][:5]} {s['wait']['all']['p50_ms']:7.2f}/{s['latency']['all']['p50_ms']:6.2f}"
+            for s in stages)
+        print(f"{enrichment:>7} {throughput:>10,.0f} {throughput / baseline:>7.1f}x   {per_stage}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Order Search Benchmark
+Query latency of InMemoryDB.search_orders against a full scan of the
+stored orders, for stores of growing size. Each query shape keeps its
+result size fixed as the store grows (a customer's history, one rare
+status, a one-minute window), so indexed latency should stay flat while
+the scan grows with the store.
+
+Run with: python backend/benchmarks/bench_order_search.py --sizes 10000 100000 1000000
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from storage import InMemoryDB  # noqa: E402
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+ORDERS_PER_CUSTOMER = 10
+ORDERS_PER_MINUTE = 50
+FAILED_PER_STORE = 100
+
+
+def populate(db, num_orders):
+    rng = random.Random(42)
+    failed = set(rng.sample(range(num_orders), FAILED_PER_STORE))
+    for n in range(num_orders):
+        db._set_order_fields(f"ORD-{n:012X}", {
+            "customer_id": f"CUST-{rng.randrange(num_orders // ORDERS_PER_CUSTOMER)}",
+            "customer_name": "Customer",
+            "status": "failed" if n in failed else "completed",
+            "total": 100.0,
+            "created_at": (START + timedelta(seconds=n * 60 / ORDERS_PER_MINUTE)).isoformat(),
+        })
+
+
+def scan(db, customer_id=None, status=None, created_from=None, created_to=None, limit=50):
+    """Baseline: filter every record, then sort the matches."""
+    matches = [
+        r for r in db.orders.values()
+        if (customer_id is None or r.customer_id == customer_id)
+        and (status is None or r.status == status)
+        and (created_from is None or r.created_at_epoch >= created_from)
+        and (created_to is None or r.created_at_epoch <= created_to)
+    ]
+    matches.sort(key=lambda r: (r.created_at_epoch, r.order_id), reverse=True)
+    return [r.to_doc() for r in matches[:limit]]
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+async def run_size(num_orders, repeat):
+    db = InMemoryDB()
+    populate(db, num_orders)
+    window_from = (START + timedelta(hours=1)).timestamp()
+    queries = {
+        "customer": {"customer_id": "CUST-7"},
+        "status": {"status": "failed"},
+        "window": {"created_from": window_from, "created_to": window_from + 59.999},
+        "cust+window": {"customer_id": "CUST-7", "created_from": START.timestamp(),
+                        "created_to": START.timestamp() + 86400},
+    }
+    for name, query in queries.items():
+        indexed_docs, _ = await db.search_orders(50, **query)
+        assert indexed_docs == scan(db, **query), name
+
+        async def indexed_many():
+            start = time.perf_counter()
+            for _ in range(repeat):
+                await db.search_orders(50, **query)
+            return (time.perf_counter() - start) / repeat * 1e6
+
+        indexed_us = await indexed_many()
+        scan_us = timed(lambda: scan(db, **query), max(1, repeat // 100))
+        print(f"{num_orders:>9} {name:>12} {len(indexed_docs):>7} {indexed_us:>12.1f} {scan_us:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{'orders':>9} {'query':>12} {'results':>7} {'indexed us':>12} {'scan us':>12}")
+    for size in args.sizes:
+        asyncio.run(run_size(size, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Persistence Benchmark
+1. Ingest throughput of InMemoryDB with persistence off, on with group
+   commit + fsync, and on without fsync.
+2. Startup recovery time as the WAL tail grows.
+
+Run with: python backend/benchmarks/bench_persistence.py
+"""
+
+import argparse
+import asyncio
+import itertools
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from persistence import Persistence  # noqa: E402
+from storage import InMemoryDB  # noqa: E402
+
+
+def make_order(order_id):
+    return {
+        "order_id": order_id,
+        "customer_id": "CUST-1",
+        "customer_name": "Bench Customer",
+        "items": [{"product_id": "PROD-1", "name": "Widget", "quantity": 2, "price": 19.99}],
+        "subtotal": 39.98,
+        "tax": 4.0,
+        "total": 43.98,
+        "status": "pending",
+        "idempotency_key": f"key-{order_id}",
+        "created_at": "2026-01-01T00:00:00+00:00",
+        "updated_at": "2026-01-01T00:00:00+00:00",
+        "processed": False,
+    }
+
+
+async def ingest(db, num_orders, clients):
+    ids = itertools.count()
+
+    async def client():
+        while True:
+            n = next(ids)
+            if n >= num_orders:
+                return
+            order_id = f"ORD-{n:012d}"
+            await db.insert_one("idempotency_keys", {"key": f"key-{order_id}", "order_id": order_id})
+            await db.insert_one("orders_queue", make_order(order_id))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return num_orders / (time.perf_counter() - start)
+
+
+async def ingest_with(directory, num_orders, clients, fsync, group_commit_ms):
+    db = InMemoryDB()
+    if directory is not None:
+        persistence = Persistence(directory, group_commit_ms=group_commit_ms, fsync=fsync)
+        persistence.recover(db)
+        db.persistence = persistence
+    rate = await ingest(db, num_orders, clients)
+    if db.persistence is not None:
+        await db.persistence.wal.close()
+    return rate
+
+
+def bench_ingest(args):
+    print(f"Ingest: {args.orders} orders, {args.clients} concurrent clients")
+    print(f"{'mode':>24} {'orders/s':>10}")
+    modes = [
+        ("persistence off", False, None),
+        ("WAL, group commit+fsync", True, True),
+        ("WAL, no fsync", True, False),
+    ]
+    for name, enabled, fsync in modes:
+        with tempfile.TemporaryDirectory() as tmp:
+            rate = asyncio.run(ingest_with(
+                tmp if enabled else None, args.orders, args.clients, fsync, args.group_commit_ms))
+        print(f"{name:>24} {rate:>10.0f}")
+
+
+def bench_recovery(args):
+    print()
+    print("Recovery time vs WAL size (no snapshot)")
+    print(f"{'records':>10} {'WAL MB':>8} {'recovery ms':>12} {'records/s':>12}")
+    for num_orders in args.recovery_orders:
+        with tempfile.TemporaryDirectory() as tmp:
+            asyncio.run(ingest_with(tmp, num_orders, 100, False, args.group_commit_ms))
+            wal_bytes = sum(p.stat().st_size for p in Path(tmp).glob("wal-*.log"))
+            stats = Persistence(tmp).recover(InMemoryDB())
+            records = stats["replayed_records"]
+            print(
+                f"{records:>10} {wal_bytes / 1e6:>8.1f} {stats['recovery_ms']:>12.1f} "
+                f"{records / (stats['recovery_ms'] / 1000):>12.0f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--orders", type=int, default=20_000)
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--group-commit-ms", type=float, default=2.0)
+    parser.add_argument("--recovery-orders", type=int, nargs="+", default=[10_000, 50_000, 200_000])
+    args = parser.parse_args()
+    bench_ingest(args)
+    bench_recovery(args)
+
+
+if __name__ == "__main__":
+    main()
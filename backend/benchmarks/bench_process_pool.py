@@ -0,0 +1,89 @@
+"""
+Order Process Pool Benchmark
+Throughput of order processing with a CPU-heavy step, run on the event
+loop (0 processes) and in 1, 2, 4 and 8 shard processes. Orders are
+claimed by the worker pool and completed in the store by the benchmark
+process, as in the server; only the CPU step moves to the shards. The
+speedup is bounded by the cores available (os.cpu_count() is printed).
+
+Run with: python backend/benchmarks/bench_process_pool.py --orders 2000 --processes 0,1,2,4,8
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from process_pool import ShardedProcessPool  # noqa: E402
+from storage import InMemoryDB  # noqa: E402
+from worker_pool import WorkerPool  # noqa: E402
+
+
+def cpu_heavy(order):
+    """Pure-Python stand-in for an expensive calculation (holds the GIL)."""
+    acc = 0.0
+    for i in range(order["work"]):
+        acc += (i % 7) * 1.0001 / (i % 13 + 1)
+    return {"order_id": order["order_id"], "status": "completed", "score": acc}
+
+
+async def run(num_orders, processes, work, batch_size):
+    db = InMemoryDB()
+    for i in range(num_orders):
+        await db.insert_one("orders_queue", {"order_id": f"ORD-{i:08d}", "customer_id": f"CUST-{i % 100}",
+                                             "work": work, "processed": False})
+
+    shards = ShardedProcessPool(cpu_heavy, processes, shard_key="customer_id") if processes else None
+    done = 0
+
+    async def process(orders, worker_id):
+        nonlocal done
+        results = await shards.run(orders) if shards else [cpu_heavy(order) for order in orders]
+        for order, result in zip(orders, results):
+            order.update(result)
+        await db.complete_orders([(order, {"order_id": order["order_id"]}, []) for order in orders], worker_id)
+        done += len(orders)
+
+    if shards:
+        shards.start()
+    # Enough workers to keep every shard fed
+    pool = WorkerPool(db, process, size=max(2 * processes, 1), batch_size=batch_size, idle_poll_sec=0.01)
+    start = time.perf_counter()
+    pool.start()
+    while done < num_orders:
+        await asyncio.sleep(0.005)
+    elapsed = time.perf_counter() - start
+    await pool.stop()
+    if shards:
+        await shards.stop()
+    return num_orders / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--processes", default="0,1,2,4,8")
+    parser.add_argument("--work", type=int, default=20_000, help="loop iterations per order (~1-2ms)")
+    parser.add_argument("--batch-size", type=int, default=10)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    cpu_heavy({"order_id": "x", "work": args.work})
+    step_ms = (time.perf_counter() - start) * 1000
+    print(f"{args.orders:,} orders, {step_ms:.2f}ms CPU step, batch {args.batch_size}, "
+          f"{os.cpu_count()} CPUs")
+    print(f"{'processes':>10} {'orders/s':>10} {'speedup':>8}")
+    baseline = None
+    for processes in (int(n) for n in args.processes.split(",")):
+        throughput = asyncio.run(run(args.orders, processes, args.work, args.batch_size))
+        baseline = baseline or throughput
+        label = processes if processes else "loop"
+        print(f"{label:>10} {throughput:>10,.0f} {throughput / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
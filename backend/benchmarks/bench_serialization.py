@@ -0,0 +1,131 @@
+"""
+Order Serialization Benchmark
+Orders per second through every encode an order goes through, for the
+previous path versus the codec path the server uses now:
+
+  response   GET /api/orders/{id}: Order(**doc) validation + FastAPI
+             serialization + json.dumps, versus order_view + codec.dumps
+  kafka      outbox / producer payload: json.dumps(default=str), versus
+             codec.dumps_str
+  consume    consumer deserializer: json.loads, versus codec.loads
+  websocket  two status broadcasts to --connections clients: send_json
+             (one json.dumps per client), versus one codec.dumps_str
+  total      all of the above per order
+
+Run with: python backend/benchmarks/bench_serialization.py --orders 20000 --connections 10
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import codec  # noqa: E402
+from server import Order, OrderCreate, build_order_doc, generate_order_id, order_view  # noqa: E402
+
+PRODUCTS = [(f"PROD-{i:03d}", f"Product {i}") for i in range(100)]
+
+
+def make_docs(num_orders):
+    rng = random.Random(42)
+    now = datetime.now(timezone.utc)
+    docs = []
+    for n in range(num_orders):
+        order_input = OrderCreate(
+            customer_id=f"CUST-{rng.randrange(100_000)}",
+            customer_name=f"Customer {rng.randrange(100_000)}",
+            items=[
+                {"product_id": pid, "name": name, "quantity": rng.randint(1, 5),
+                 "price": round(rng.uniform(10, 500), 2)}
+                for pid, name in rng.sample(PRODUCTS, rng.randint(1, 3))
+            ],
+            idempotency_key=f"key-{n:012x}",
+        )
+        doc = build_order_doc(order_input, generate_order_id(), order_input.idempotency_key, now)
+        doc.update(status="completed", processing_time_ms=rng.uniform(50, 200))
+        docs.append(doc)
+    return docs
+
+
+def legacy_response(doc):
+    # FastAPI with response_model: validate the returned Order, dump it in
+    # JSON mode, then JSONResponse.render
+    order = Order.model_validate(Order(**doc))
+    return json.dumps(order.model_dump(mode="json"), ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def codec_response(doc):
+    return codec.dumps(order_view(doc))
+
+
+def legacy_kafka(doc):
+    return json.dumps(doc, default=str).encode("utf-8")
+
+
+def codec_kafka(doc):
+    return codec.dumps_str(doc)
+
+
+def status_messages(doc):
+    return ({"type": "order_update", "order_id": doc["order_id"], "status": "processing"},
+            {"type": "order_update", "order_id": doc["order_id"], "status": doc["status"],
+             "processing_time_ms": doc["processing_time_ms"]})
+
+
+def legacy_websocket(doc, connections):
+    for message in status_messages(doc):
+        for _ in range(connections):
+            json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+def codec_websocket(doc, connections):
+    for message in status_messages(doc):
+        codec.dumps_str(message)
+
+
+def rate(fn, items):
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return len(items) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--orders", type=int, default=20_000)
+    parser.add_argument("--connections", type=int, default=10)
+    args = parser.parse_args()
+
+    docs = make_docs(args.orders)
+    legacy_payloads = [legacy_kafka(doc) for doc in docs]
+    codec_payloads = [codec_kafka(doc) for doc in docs]
+    assert json.loads(legacy_response(docs[0])).keys() == codec.loads(codec_response(docs[0])).keys()
+
+    stages = {
+        "response": (legacy_response, codec_response, docs),
+        "kafka": (legacy_kafka, codec_kafka, docs),
+        "consume": (json.loads, codec.loads, None),
+        "websocket": (lambda d: legacy_websocket(d, args.connections),
+                      lambda d: codec_websocket(d, args.connections), docs),
+    }
+
+    print(f"codec backend: {codec.BACKEND}, {args.orders} orders, {args.connections} WebSocket clients")
+    print(f"{'stage':>10} {'legacy/s':>12} {'codec/s':>12} {'speedup':>8}")
+    legacy_total = codec_total = 0.0
+    for name, (legacy_fn, codec_fn, items) in stages.items():
+        legacy_rate = rate(legacy_fn, items if items is not None else legacy_payloads)
+        codec_rate = rate(codec_fn, items if items is not None else codec_payloads)
+        legacy_total += 1 / legacy_rate
+        codec_total += 1 / codec_rate
+        print(f"{name:>10} {legacy_rate:>12,.0f} {codec_rate:>12,.0f} {codec_rate / legacy_rate:>7.1f}x")
+    print(f"{'total':>10} {1 / legacy_total:>12,.0f} {1 / codec_total:>12,.0f} {legacy_total / codec_total:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
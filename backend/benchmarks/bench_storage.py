@@ -0,0 +1,98 @@
+"""
+Storage Backend Benchmark
+Runs the same order workload against the in-memory and SQLite backends:
+concurrent ingest, worker-style claim + complete, point lookups and
+status counts.
+
+Run with: python backend/benchmarks/bench_storage.py
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from storage import InMemoryDB, SQLiteDB  # noqa: E402
+
+
+def make_order(n):
+    return {
+        "order_id": f"ORD-{n:012d}",
+        "customer_id": f"CUST-{n % 1000}",
+        "customer_name": "Bench Customer",
+        "items": [{"product_id": "PROD-1", "name": "Widget", "quantity": 2, "price": 19.99}],
+        "subtotal": 39.98,
+        "tax": 4.0,
+        "total": 43.98,
+        "status": "pending",
+        "idempotency_key": f"key-{n}",
+        "created_at": "2026-01-01T00:00:00+00:00",
+        "updated_at": "2026-01-01T00:00:00+00:00",
+        "processed": False,
+    }
+
+
+async def timed(label, ops, coro_factory, concurrency):
+    queue = list(range(ops))
+
+    async def runner():
+        while queue:
+            await coro_factory(queue.pop())
+
+    start = time.perf_counter()
+    await asyncio.gather(*(runner() for _ in range(concurrency)))
+    rate = ops / (time.perf_counter() - start)
+    print(f"  {label:<28} {rate:>10.0f} ops/s")
+
+
+async def run(db, num_orders, concurrency):
+    await db.open()
+    await db.ensure_indexes()
+    print(f"[{db.name}]")
+
+    async def ingest(n):
+        doc = make_order(n)
+        await db.insert_one("idempotency_keys", {"key": doc["idempotency_key"], "order_id": doc["order_id"]})
+        await db.insert_one("orders_queue", doc)
+
+    async def complete(n):
+        doc = await db.find_one("orders_queue", {"processed": False})
+        if doc is None:
+            return
+        order_id = doc["order_id"]
+        await db.update_one("orders_queue", {"order_id": order_id}, {"$set": {"processed": True}})
+        await db.update_one("orders", {"order_id": order_id},
+                            {"$set": {**doc, "status": "completed", "processing_time_ms": 12.5}}, upsert=True)
+
+    async def lookup(n):
+        await db.find_one("orders", {"order_id": f"ORD-{random.randrange(num_orders):012d}"})
+
+    async def count(n):
+        await db.count_documents("orders", {"status": "completed"})
+
+    await timed("ingest", num_orders, ingest, concurrency)
+    # A single worker, as in the order processor (claims are not atomic)
+    await timed("claim + complete (1 worker)", num_orders, complete, 1)
+    await timed("find_one orders by id", num_orders, lookup, concurrency)
+    await timed("count_documents by status", 200, count, concurrency)
+    await db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--orders", type=int, default=10_000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    asyncio.run(run(InMemoryDB(), args.orders, args.concurrency))
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(SQLiteDB(str(Path(tmp) / "bench.db")), args.orders, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Kafka Wire Format Benchmark
+Bytes per message and encode / decode throughput on each of the five
+topics, for JSON (the default) versus the compact schema format with a
+msgpack body and with a JSON-array body (used when msgpack is not
+installed). `gzip/msg` is the size per message when a batch of --batch
+messages is gzip-compressed together, roughly what the broker stores
+with KAFKA_COMPRESSION=gzip.
+
+Run with: python backend/benchmarks/bench_wire_format.py --messages 20000
+"""
+
+import argparse
+import gzip
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import wire_format  # noqa: E402
+from wire_format import COMPACT, JSON, WireFormat, decode  # noqa: E402
+
+PRODUCTS = [(f"PROD-{i:03d}", f"Product {i}") for i in range(100)]
+
+
+def make_messages(topic, count, rng):
+    now = datetime.now(timezone.utc).isoformat()
+    messages = []
+    for n in range(count):
+        order_id = f"ORD-{rng.getrandbits(48):012X}"
+        items = [{"product_id": pid, "name": name, "quantity": rng.randint(1, 5),
+                  "price": round(rng.uniform(10, 500), 2)}
+                 for pid, name in rng.sample(PRODUCTS, rng.randint(1, 3))]
+        timing = {"processing_time_ms": round(rng.uniform(5, 200), 2), "timestamp": now}
+        if topic == "orders":
+            subtotal = sum(i["quantity"] * i["price"] for i in items)
+            message = {"order_id": order_id, "customer_id": f"CUST-{rng.randrange(100_000)}",
+                       "customer_name": f"Customer {rng.randrange(100_000)}", "items": items,
+                       "subtotal": subtotal, "tax": subtotal * 0.1, "total": subtotal * 1.1,
+                       "status": "pending", "idempotency_key": f"key-{n:012x}", "created_at": now,
+                       "updated_at": now, "processing_time_ms": None, "processed": False}
+        elif topic == "order-events":
+            message = {"event_id": f"EVT-{rng.getrandbits(48):012X}", "order_id": order_id,
+                       "event_type": "order_completed", "timestamp": now,
+                       "data": {"status": "completed", "processing_time_ms": timing["processing_time_ms"]}}
+        elif topic == "inventory-events":
+            message = {"service": "inventory-service", "order_id": order_id, "event_type": "inventory_reserved",
+                       "success": True, **timing,
+                       "items": [{"product_id": i["product_id"], "quantity": i["quantity"], "status": "reserved",
+                                  "warehouse": f"WH-{rng.randint(1, 5)}"} for i in items]}
+        elif topic == "payment-events":
+            message = {"service": "payment-service", "order_id": order_id, "event_type": "payment_completed",
+                       "success": True, "amount": round(rng.uniform(10, 1500), 2),
+                       "payment_method": rng.choice(["credit_card", "debit_card", "digital_wallet"]),
+                       "transaction_id": f"TXN-{rng.randint(100000, 999999)}", **timing}
+        else:
+            message = {"service": "notification-service", "order_id": order_id,
+                       "event_type": "notifications_sent", "success": True, **timing,
+                       "notifications": [{"channel": "email", "type": "order_confirmation",
+                                          "recipient": "customer@email.com", "success": True,
+                                          "subject": f"Order {order_id} Confirmed"}]}
+        messages.append(message)
+    return messages
+
+
+def measure(topic, messages, wire, batch):
+    start = time.perf_counter()
+    encoded = [wire.encode(topic, m)[0] for m in messages]
+    encode_rate = len(messages) / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for data in encoded:
+        decode(data)
+    decode_rate = len(messages) / (time.perf_counter() - start)
+    avg_bytes = sum(map(len, encoded)) / len(encoded)
+    batches = [b"".join(encoded[i:i + batch]) for i in range(0, len(encoded), batch)]
+    gzip_bytes = sum(len(gzip.compress(b)) for b in batches) / len(encoded)
+    return avg_bytes, gzip_bytes, encode_rate, decode_rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--batch", type=int, default=100)
+    args = parser.parse_args()
+
+    formats = [("json", WireFormat(JSON))]
+    if wire_format.msgpack is not None:
+        formats.append(("msgpack", WireFormat(COMPACT)))
+    else:
+        print("msgpack not installed; only the JSON-array compact body is measured")
+
+    rng = random.Random(42)
+    print(f"{'topic':>20} {'format':>10} {'bytes/msg':>10} {'gzip/msg':>9} {'encode/s':>11} {'decode/s':>11}")
+    for topic in wire_format.SCHEMAS:
+        messages = make_messages(topic, args.messages, rng)
+        rows = [(name, measure(topic, messages, wire, args.batch)) for name, wire in formats]
+        msgpack = wire_format.msgpack
+        wire_format.msgpack = None
+        try:
+            rows.append(("json-array", measure(topic, messages, WireFormat(COMPACT), args.batch)))
+        finally:
+            wire_format.msgpack = msgpack
+        for name, (avg_bytes, gzip_bytes, encode_rate, decode_rate) in rows:
+            print(f"{topic:>20} {name:>10} {avg_bytes:>10.1f} {gzip_bytes:>9.1f} "
+                  f"{encode_rate:>11,.0f} {decode_rate:>11,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Order Worker Pool Benchmark
+Throughput of the order worker pool as the number of workers grows. Each
+order goes through the server's processing shape (simulated work, then
+the order, its queue flag, its event and outbox row written by one
+`complete_orders` call per claimed batch), and every run checks that each
+order was processed exactly once. Then throughput by claim batch size
+with no simulated work, i.e. the per-order overhead on a deep queue; and
+pickup latency (ingest to claim) on an idle pool for orders trickling in,
+with ingest notifying the workers versus the old 0.5s polling.
+
+Run with: python backend/benchmarks/bench_worker_pool.py --orders 2000 --workers 1,2,4,8,16,32,64
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from storage import InMemoryDB, SQLiteDB  # noqa: E402
+from storage.outbox import outbox_message  # noqa: E402
+from worker_pool import WorkerPool  # noqa: E402
+
+
+def make_processor(db, processed, work_ms):
+    async def work():
+        if work_ms:
+            await asyncio.sleep(random.uniform(0.5, 1.5) * work_ms / 1000)
+
+    async def process(orders, worker_id):
+        await asyncio.gather(*(work() for _ in orders))
+        completions = []
+        for order in orders:
+            order["status"] = "completed"
+            order["processing_time_ms"] = work_ms
+            event = {"order_id": order["order_id"], "event_type": "order_completed"}
+            completions.append((order, event, [outbox_message("order-events", order["order_id"], event)]))
+        await db.complete_orders(completions, worker_id)
+        processed.update(order["order_id"] for order in orders)
+    return process
+
+
+async def run(backend, directory, num_orders, workers, work_ms, batch_size=1):
+    if backend == "sqlite":
+        db = SQLiteDB(str(Path(directory) / f"pool-{workers}-{batch_size}.db"))
+    else:
+        db = InMemoryDB()
+    await db.open()
+    await db.ensure_indexes()
+    for i in range(num_orders):
+        await db.insert_one("orders_queue", {"order_id": f"ORD-{i:08d}", "customer_id": f"CUST-{i % 50}",
+                                             "status": "pending", "processed": False})
+
+    processed = Counter()
+    pool = WorkerPool(db, make_processor(db, processed, work_ms), size=workers, batch_size=batch_size,
+                      idle_poll_sec=0.01)
+    start = time.perf_counter()
+    pool.start()
+    while sum(processed.values()) < num_orders:
+        await asyncio.sleep(0.005)
+    elapsed = time.perf_counter() - start
+    stats = pool.stats
+    await pool.stop()
+    await db.close()
+
+    assert len(processed) == num_orders and set(processed.values()) == {1}, "an order was processed twice"
+    utilization = sum(w["utilization"] for w in stats["workers"].values()) / max(workers, 1)
+    return num_orders / elapsed, utilization
+
+
+async def pickup(num_orders, notify):
+    db = InMemoryDB()
+    waits = []
+
+    async def process(orders, worker_id):
+        for order in orders:
+            waits.append((time.perf_counter() - order["queued_at"]) * 1000)
+            await db.update_one("orders_queue", {"order_id": order["order_id"]}, {"$set": {"processed": True}})
+
+    pool = WorkerPool(db, process, size=4, idle_poll_sec=30 if notify else 0.5)
+    pool.start()
+    for i in range(num_orders):
+        await asyncio.sleep(random.uniform(0.01, 0.05))
+        await db.insert_one("orders_queue", {"order_id": f"ORD-{i:08d}", "processed": False,
+                                             "queued_at": time.perf_counter()})
+        if notify:
+            pool.notify()
+    while len(waits) < num_orders:
+        await asyncio.sleep(0.01)
+    await pool.stop()
+    waits.sort()
+    return waits[len(waits) // 2], waits[int(len(waits) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--workers", default="1,2,4,8,16,32,64")
+    parser.add_argument("--work-ms", type=float, default=10.0,
+                        help="mean simulated work per order (the server uses ~125ms)")
+    parser.add_argument("--batch-sizes", default="1,10,50,100")
+    parser.add_argument("--batch-workers", type=int, default=4)
+    parser.add_argument("--pickup-orders", type=int, default=100)
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    args = parser.parse_args()
+
+    print(f"{args.orders:,} orders, {args.work_ms:g}ms mean work, {args.backend} store")
+    print(f"{'workers':>8} {'orders/s':>10} {'speedup':>8} {'utilization':>12}")
+    baseline = None
+    with tempfile.TemporaryDirectory() as directory:
+        for workers in (int(n) for n in args.workers.split(",")):
+            throughput, utilization = asyncio.run(run(args.backend, directory, args.orders, workers, args.work_ms))
+            baseline = baseline or throughput
+            print(f"{workers:>8} {throughput:>10,.0f} {throughput / baseline:>7.1f}x {utilization:>11.0%}")
+
+        print(f"\nno simulated work, {args.batch_workers} workers")
+        print(f"{'batch':>8} {'orders/s':>10} {'speedup':>8} {'us/order':>9}")
+        baseline = None
+        for batch_size in (int(n) for n in args.batch_sizes.split(",")):
+            throughput, _ = asyncio.run(run(args.backend, directory, args.orders, args.batch_workers, 0, batch_size))
+            baseline = baseline or throughput
+            print(f"{batch_size:>8} {throughput:>10,.0f} {throughput / baseline:>7.1f}x {1e6 / throughput:>9.1f}")
+
+    print(f"\npickup latency, {args.pickup_orders} orders trickling into an idle pool")
+    for name, notify in (("0.5s poll", False), ("notify", True)):
+        p50, p99 = asyncio.run(pickup(args.pickup_orders, notify))
+        print(f"{name:>10}  p50 {p50:8.3f}ms  p99 {p99:8.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+JSON Codec for SwiftCart Order Manager
+One encode/decode pair for API responses, Kafka payloads, outbox rows and
+WebSocket messages. Uses orjson when it is installed and falls back to the
+standard library otherwise; both produce compact JSON, and values JSON
+cannot represent are encoded with str().
+"""
+
+import json
+from typing import Any
+
+try:
+    import orjson
+    BACKEND = 'orjson'
+except ImportError:
+    orjson = None
+    BACKEND = 'json'
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(value: Any) -> bytes:
+        return orjson.dumps(value, default=str, option=_OPTIONS)
+
+    def dumps_str(value: Any) -> str:
+        return orjson.dumps(value, default=str, option=_OPTIONS).decode('utf-8')
+
+    loads = orjson.loads
+else:
+    _encoder = json.JSONEncoder(separators=(',', ':'), default=str, ensure_ascii=False)
+
+    def dumps(value: Any) -> bytes:
+        return _encoder.encode(value).encode('utf-8')
+
+    def dumps_str(value: Any) -> str:
+        return _encoder.encode(value)
+
+    loads = json.loads
+
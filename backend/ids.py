@@ -0,0 +1,122 @@
+"""
+Time-Sortable IDs for SwiftCart Order Manager
+Order and event IDs that sort by creation time: after the prefix come a
+millisecond timestamp, a per-process node and a per-millisecond counter,
+each as fixed-width Crockford base32, so string order is time order.
+
+    ORD-01JC8Z6X4M 3R7TQA 0004
+        timestamp  node   counter
+
+The node is 30 random bits drawn when the process starts (and again in a
+forked child), or ORDER_ID_NODE when set. The variable pins the node of
+the top-level process only: child processes (forked or spawned, like the
+shard processes) inherit the environment, so they draw a random node
+rather than repeat the parent's. The counter allows 2^20 IDs per
+millisecond per node and borrows the next millisecond if exhausted or if
+the clock steps back, so IDs from one process are strictly increasing.
+"""
+
+import multiprocessing
+import os
+import secrets
+import threading
+import time
+import weakref
+from typing import Optional
+
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+TIME_CHARS = 10   # 50 bits of milliseconds
+NODE_CHARS = 6    # 30 bits
+SEQ_CHARS = 4     # 20 bits
+ID_CHARS = TIME_CHARS + NODE_CHARS + SEQ_CHARS
+NODE_BITS = NODE_CHARS * 5
+SEQ_MAX = (1 << SEQ_CHARS * 5) - 1
+
+# Two base32 characters (10 bits) per entry, for encoding the counter
+_PAIRS = [a + b for a in ALPHABET for b in ALPHABET]
+_DECODE = {c: i for i, c in enumerate(ALPHABET)}
+
+
+def encode_base32(value: int, width: int) -> str:
+    chars = []
+    for _ in range(width):
+        chars.append(ALPHABET[value & 31])
+        value >>= 5
+    return ''.join(reversed(chars))
+
+
+def decode_base32(text: str) -> int:
+    value = 0
+    for char in text:
+        value = (value << 5) | _DECODE[char]
+    return value
+
+
+class SortableIdGenerator:
+    """
+    Callable returning the next ID for `prefix` (e.g. "ORD-"). The
+    timestamp and node part is re-encoded once per millisecond, so most
+    calls only append the counter.
+    """
+
+    _instances = weakref.WeakSet()
+
+    def __init__(self, prefix: str, node: Optional[int] = None):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._reset(node)
+        SortableIdGenerator._instances.add(self)
+
+    def _reset(self, node: Optional[int] = None):
+        if node is None:
+            env_node = os.environ.get('ORDER_ID_NODE')
+            if env_node and multiprocessing.parent_process() is None:
+                node = int(env_node)
+            else:
+                node = secrets.randbits(NODE_BITS)
+        if not 0 <= node < 1 << NODE_BITS:
+            raise ValueError(f"ID node must be in [0, 2^{NODE_BITS})")
+        self.node = node
+        self._node_chars = encode_base32(node, NODE_CHARS)
+        self._ms = -1
+        self._seq = 0
+        self._head = ''
+
+    def _advance(self, ms: int):
+        self._ms = ms
+        self._seq = 0
+        self._head = self.prefix + encode_base32(ms, TIME_CHARS) + self._node_chars
+
+    def __call__(self) -> str:
+        ms = time.time_ns() // 1_000_000
+        with self._lock:
+            if ms > self._ms:
+                self._advance(ms)
+            elif self._seq < SEQ_MAX:
+                self._seq += 1
+            else:
+                self._advance(self._ms + 1)
+            seq = self._seq
+            head = self._head
+        return head + _PAIRS[seq >> 10] + _PAIRS[seq & 1023]
+
+    @classmethod
+    def _after_fork(cls):
+        # A forked child must not reuse its parent's node (even an explicit one)
+        for generator in list(cls._instances):
+            generator._lock = threading.Lock()
+            generator._reset(secrets.randbits(NODE_BITS))
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=SortableIdGenerator._after_fork)
+
+
+def id_timestamp(value: str, prefix: str) -> float:
+    """Epoch seconds at which a sortable ID was generated."""
+    return decode_base32(value[len(prefix):len(prefix) + TIME_CHARS]) / 1000
+
+
+generate_order_id = SortableIdGenerator('ORD-')
+generate_event_id = SortableIdGenerator('EVT-')
+
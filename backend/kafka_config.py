@@ -4,11 +4,17 @@ Provides producer and consumer factories with graceful fallback
 when Kafka is unavailable (system continues to work without Kafka).
 """
 
-import json
+import asyncio
 import logging
 import os
+import queue
 import threading
+import time
 from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import codec
+from wire_format import WireFormat, decode as decode_message, parse_topic_setting
 
 logger = logging.getLogger(__name__)
 
@@ -34,10 +40,155 @@ except ImportError:
     KafkaError = Exception
 
 
+class CircuitBreaker:
+    """
+    Trips after `failure_threshold` consecutive delivery failures (slow
+    deliveries count as failures) and rejects publishes for
+    `reset_timeout_sec`. Then one probe publish is let through: success
+    closes the breaker, failure opens it again. Thread-safe, since Kafka
+    delivery callbacks run on the producer's I/O thread.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout_sec: float = 10.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_sec = reset_timeout_sec
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.trips = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout_sec:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.trips += 1
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    @property
+    def stats(self):
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "trips": self.trips,
+        }
+
+
+class TopicDeliveryMetrics:
+    """Per-topic delivery counters and latency, updated from any thread."""
+
+    def __init__(self):
+        self.sent = 0
+        self.delivered = 0
+        self.failed = 0
+        self.rejected = 0  # breaker open, buffer full or not connected
+        self.bytes_sent = 0
+        self.total_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+        self._lock = threading.Lock()
+
+    def record_sent(self, count: int = 1, nbytes: int = 0):
+        with self._lock:
+            self.sent += count
+            self.bytes_sent += nbytes
+
+    def record_rejected(self, count: int = 1):
+        with self._lock:
+            self.rejected += count
+
+    def record_delivery(self, latency_ms: float, ok: bool):
+        with self._lock:
+            if ok:
+                self.delivered += 1
+                self.total_latency_ms += latency_ms
+                self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+            else:
+                self.failed += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "sent": self.sent,
+                "delivered": self.delivered,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "in_flight": self.sent - self.delivered - self.failed,
+                "avg_bytes": self.bytes_sent / self.sent if self.sent else 0.0,
+                "avg_latency_ms": self.total_latency_ms / self.delivered if self.delivered else 0.0,
+                "max_latency_ms": self.max_latency_ms,
+            }
+
+
+class _DeliveryBatch:
+    """The records of one buffered publish, tracked until all are settled."""
+
+    def __init__(self, producer: 'KafkaOrderProducer', topic: str, count: int,
+                 enqueued_at: float, on_done=None):
+        self.producer = producer
+        self.topic = topic
+        self.remaining = count
+        self.enqueued_at = enqueued_at
+        self.on_done = on_done
+        self.ok = True
+        self._lock = threading.Lock()
+
+    def delivered(self, _metadata=None):
+        self._settle(True)
+
+    def failed(self, error):
+        logger.error(f"Failed to deliver to '{self.topic}': {error}")
+        self._settle(False)
+
+    def _settle(self, ok: bool):
+        self.producer._record_delivery(self.topic, self.enqueued_at, ok)
+        with self._lock:
+            self.ok = self.ok and ok
+            self.remaining -= 1
+            finished = self.remaining == 0
+        if finished and self.on_done is not None:
+            self.on_done(self.ok)
+
+
 class KafkaOrderProducer:
     """
     Singleton Kafka producer for publishing order events.
     Falls back gracefully if Kafka is unavailable.
+
+    The event loop publishes through `publish_nowait` (fire-and-forget) or
+    `publish_async` / `publish_batch_async` (awaits delivery). These
+    serialize the value immediately and hand it to a bounded send buffer
+    drained by a sender thread, so a slow broker never blocks the loop.
+    Delivery callbacks feed per-topic metrics and the circuit breaker;
+    when the buffer is full or the breaker is open the call returns False
+    at once and the caller takes its fallback path. `publish` keeps the
+    blocking behaviour for the consumer threads in services/.
     """
     _instance = None
     _lock = threading.Lock()
@@ -48,8 +199,31 @@ class KafkaOrderProducer:
                 cls._instance = super().__new__(cls)
                 cls._instance._producer = None
                 cls._instance._connected = False
+                cls._instance._init_delivery()
             return cls._instance
 
+    def _init_delivery(self):
+        self.send_buffer_size = int(os.environ.get('KAFKA_SEND_BUFFER', 10_000))
+        self.publish_timeout_sec = float(os.environ.get('KAFKA_PUBLISH_TIMEOUT_SEC', 5))
+        self.slow_delivery_ms = float(os.environ.get('KAFKA_SLOW_DELIVERY_MS', 1000))
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.environ.get('KAFKA_BREAKER_FAILURES', 5)),
+            reset_timeout_sec=float(os.environ.get('KAFKA_BREAKER_RESET_SEC', 10)),
+        )
+        self.topic_metrics: Dict[str, TopicDeliveryMetrics] = {}
+        self._metrics_lock = threading.Lock()
+        self._buffer: queue.Queue = queue.Queue(maxsize=self.send_buffer_size)
+        self._sender: Optional[threading.Thread] = None
+        # Tells the sender to exit once the buffer is empty, for when a full
+        # buffer leaves no room for the stop marker
+        self._stopping = threading.Event()
+        # KAFKA_WIRE_FORMAT / KAFKA_COMPRESSION take a default plus
+        # per-topic overrides, e.g. "json,orders=compact" or "lz4,orders=zstd"
+        self.wire = WireFormat.from_env()
+        self.compression, self.topic_compression = parse_topic_setting(
+            os.environ.get('KAFKA_COMPRESSION', 'none'), 'none')
+        self._producers: Dict[str, 'KafkaProducer'] = {}
+
     def connect(self):
         """Attempt to connect to Kafka broker."""
         if not KAFKA_AVAILABLE:
@@ -57,15 +231,18 @@ class KafkaOrderProducer:
             return False
 
         try:
-            self._producer = KafkaProducer(
-                bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
-                value_serializer=lambda v: json.dumps(v, default=str).encode('utf-8'),
-                key_serializer=lambda k: k.encode('utf-8') if k else None,
-                acks='all',
-                retries=3,
-                max_block_ms=5000,
-            )
+            self._producer = self._create_producer(self.compression)
+            self._producers = {self.compression: self._producer}
+            for compression in set(self.topic_compression.values()) - {self.compression}:
+                try:
+                    self._producers[compression] = self._create_producer(compression)
+                except Exception as e:
+                    # e.g. the codec's library is missing; those topics use the default
+                    logger.warning(f"⚠️ Kafka compression '{compression}' unavailable ({e})")
             self._connected = True
+            self._stopping.clear()
+            self._sender = threading.Thread(target=self._send_loop, name='kafka-sender', daemon=True)
+            self._sender.start()
             logger.info(f"✅ Kafka producer connected to {KAFKA_BOOTSTRAP_SERVERS}")
             return True
         except (NoBrokersAvailable, KafkaError, Exception) as e:
@@ -73,33 +250,208 @@ class KafkaOrderProducer:
             self._connected = False
             return False
 
-    def publish(self, topic: str, value: dict, key: str = None):
+    @staticmethod
+    def _create_producer(compression: str):
+        # Compression is a producer-wide setting, so topics with their own
+        # codec get a producer of their own
+        return KafkaProducer(
+            bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
+            # Values arrive encoded by the wire format
+            value_serializer=lambda v: v if isinstance(v, bytes) else codec.dumps(v),
+            key_serializer=lambda k: k.encode('utf-8') if k else None,
+            compression_type=None if compression == 'none' else compression,
+            acks='all',
+            retries=3,
+            max_block_ms=5000,
+        )
+
+    def _producer_for(self, topic: str):
+        return self._producers.get(self.topic_compression.get(topic, self.compression), self._producer)
+
+    def metrics_for(self, topic: str) -> TopicDeliveryMetrics:
+        metrics = self.topic_metrics.get(topic)
+        if metrics is None:
+            with self._metrics_lock:
+                metrics = self.topic_metrics.setdefault(topic, TopicDeliveryMetrics())
+        return metrics
+
+    @staticmethod
+    def _encode_headers(headers):
+        return [(k, str(v).encode('utf-8')) for k, v in headers.items()] if headers else []
+
+    def _record_delivery(self, topic: str, started: float, ok: bool):
+        latency_ms = (time.monotonic() - started) * 1000
+        self.metrics_for(topic).record_delivery(latency_ms, ok)
+        if ok and latency_ms <= self.slow_delivery_ms:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def publish(self, topic: str, value: dict, key: str = None, headers: dict = None):
         """
-        Publish a message to a Kafka topic.
+        Publish a message to a Kafka topic, blocking until it is delivered.
+        For threads off the event loop; async code uses `publish_nowait`
+        or `publish_async`.
+        `headers` carries small metadata (e.g. event_type) alongside the
+        value so callers need not copy the value to annotate it.
         Returns True if published, False if Kafka unavailable (fallback).
         """
         if not self._connected or not self._producer:
             logger.debug(f"Kafka fallback: would publish to '{topic}': {value.get('order_id', 'N/A')}")
             return False
 
+        metrics = self.metrics_for(topic)
+        if not self.breaker.allow():
+            metrics.record_rejected()
+            return False
+
+        started = time.monotonic()
+        encoded, wire_headers = self.wire.encode(topic, value)
+        metrics.record_sent(1, len(encoded))
         try:
-            future = self._producer.send(topic, value=value, key=key)
+            future = self._producer_for(topic).send(topic, value=encoded, key=key,
+                                                    headers=self._encode_headers(headers) + wire_headers)
             future.get(timeout=5)  # Block until sent
+            self._record_delivery(topic, started, True)
             logger.info(f"📤 Published to '{topic}': {value.get('order_id', 'N/A')}")
             return True
         except Exception as e:
+            self._record_delivery(topic, started, False)
             logger.error(f"Failed to publish to '{topic}': {e}")
             return False
 
+    # ─── Non-blocking publishing (event loop side) ───────────
+
+    def _enqueue(self, topic: str, records: list, on_done=None) -> bool:
+        """
+        Buffer encoded (key, value bytes, headers) records as one unit;
+        False means take the fallback path.
+        """
+        if not self._connected or not self._producer:
+            return False
+        metrics = self.metrics_for(topic)
+        if not self.breaker.allow():
+            metrics.record_rejected(len(records))
+            return False
+        try:
+            self._buffer.put_nowait((topic, records, on_done, time.monotonic()))
+        except queue.Full:
+            metrics.record_rejected(len(records))
+            return False
+        metrics.record_sent(len(records), sum(len(value) for _, value, _ in records))
+        return True
+
+    def _encode(self, topic: str, records: list, headers: dict = None) -> list:
+        record_headers = self._encode_headers(headers)
+        encoded = []
+        for key, value in records:
+            data, wire_headers = self.wire.encode(topic, value)
+            encoded.append((key, data, record_headers + wire_headers))
+        return encoded
+
+    def publish_nowait(self, topic: str, value: dict, key: str = None, headers: dict = None) -> bool:
+        """
+        Fire-and-forget publish. Returns True once the record is buffered
+        for sending; delivery outcomes show up in the topic's metrics.
+        """
+        return self._enqueue(topic, self._encode(topic, [(key, value)], headers))
+
+    async def publish_async(self, topic: str, value: dict, key: str = None, headers: dict = None) -> bool:
+        """Publish and await delivery without blocking the event loop."""
+        return await self.publish_batch_async(topic, [(key, value)], headers)
+
+    async def publish_batch_async(self, topic: str, records: list, headers: dict = None) -> bool:
+        """
+        Publish (key, value) records as one buffered unit, which the sender
+        thread hands to the producer back to back so they share producer
+        batches. Resolves True only if every record is delivered within
+        KAFKA_PUBLISH_TIMEOUT_SEC.
+        """
+        return await self.publish_encoded_async(topic, self._encode(topic, records, headers))
+
+    async def publish_encoded_async(self, topic: str, records: list) -> bool:
+        """
+        `publish_batch_async` for records that are already encoded:
+        (key, value, headers dict or list or None), e.g. outbox rows.
+        Values are wire-encoded bytes from `_encode`, or JSON (str or
+        bytes) that is converted to the topic's wire format here.
+        """
+        encoded = []
+        for key, value, headers in records:
+            if isinstance(headers, list):
+                encoded.append((key, value, headers))
+                continue
+            data, wire_headers = self.wire.transcode(topic, value)
+            encoded.append((key, data, self._encode_headers(headers) + wire_headers))
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+
+        def on_done(ok):
+            loop.call_soon_threadsafe(lambda: done.done() or done.set_result(ok))
+
+        if not self._enqueue(topic, encoded, on_done):
+            return False
+        try:
+            return await asyncio.wait_for(done, self.publish_timeout_sec)
+        except asyncio.TimeoutError:
+            logger.warning(f"Timed out waiting for delivery to '{topic}'")
+            self.breaker.record_failure()
+            return False
+
+    def _send_loop(self):
+        """Sender thread: drain the buffer into the producer."""
+        while True:
+            try:
+                item = self._buffer.get(timeout=0.5)
+            except queue.Empty:
+                if self._stopping.is_set():
+                    return
+                continue
+            if item is None:
+                return
+            topic, records, on_done, enqueued_at = item
+            batch = _DeliveryBatch(self, topic, len(records), enqueued_at, on_done)
+            producer = self._producer_for(topic)
+            for key, value, headers in records:
+                try:
+                    future = producer.send(topic, value=value, key=key, headers=headers)
+                    future.add_callback(batch.delivered)
+                    future.add_errback(batch.failed)
+                except Exception as e:
+                    batch.failed(e)
+
+    @property
+    def stats(self):
+        return {
+            "breaker": self.breaker.stats,
+            "send_buffer": {"size": self._buffer.qsize(), "capacity": self.send_buffer_size},
+            "wire_format": self.wire.stats,
+            "compression": {"default": self.compression, "topics": self.topic_compression},
+            "topics": {topic: m.snapshot() for topic, m in list(self.topic_metrics.items())},
+        }
+
     def flush(self):
         """Flush pending messages."""
-        if self._producer:
-            self._producer.flush()
+        for producer in self._producers.values():
+            producer.flush()
 
     def close(self):
         """Close the producer connection."""
+        if self._sender is not None:
+            # Drain what is already buffered before closing the producer, for
+            # at most the publish timeout. Never block on a full buffer (e.g.
+            # the broker is down): the stop event ends the sender instead.
+            self._stopping.set()
+            try:
+                self._buffer.put_nowait(None)
+            except queue.Full:
+                pass
+            self._sender.join(timeout=self.publish_timeout_sec)
+            self._sender = None
         if self._producer:
-            self._producer.close()
+            for producer in self._producers.values():
+                producer.close()
+            self._producers = {}
             self._connected = False
             logger.info("Kafka producer closed")
 
@@ -122,7 +474,7 @@ def create_consumer(group_id: str, topics: list, auto_offset_reset: str = 'earli
             *topics,
             bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
             group_id=group_id,
-            value_deserializer=lambda x: json.loads(x.decode('utf-8')),
+            value_deserializer=decode_message,
             auto_offset_reset=auto_offset_reset,
             enable_auto_commit=True,
             auto_commit_interval_ms=1000,
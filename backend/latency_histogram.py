@@ -0,0 +1,161 @@
+"""
+Streaming Latency Histogram for SwiftCart Order Manager
+Fixed-memory, mergeable histogram with logarithmic buckets (DDSketch
+style): every recorded value lands in a bucket whose representative
+value is within `relative_accuracy` of it, so percentiles are accurate
+to ~1% without keeping the raw samples.
+"""
+
+import math
+import time
+from collections import deque
+from typing import Dict, Iterable, Optional
+
+
+class LatencyHistogram:
+    """
+    Log-bucketed latency histogram.
+    Bucket keys are bounded by [min_value, max_value], so memory stays
+    fixed (about a thousand buckets at 1% accuracy) however many values
+    are recorded. Histograms with the same accuracy can be merged.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01,
+                 min_value: float = 0.01, max_value: float = 3_600_000.0):
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.min_value = min_value
+        self.max_value = max_value
+        self._min_key = self._key(min_value)
+        self._max_key = self._key(max_value)
+        self._buckets: Dict[int, int] = {}
+        self._zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def _key(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, key: int) -> float:
+        return 2 * self._gamma ** key / (self._gamma + 1)
+
+    def record(self, value: float, count: int = 1):
+        """Add `count` observations of `value` (milliseconds)."""
+        if value <= 0:
+            self._zero_count += count
+        else:
+            key = min(max(self._key(value), self._min_key), self._max_key)
+            self._buckets[key] = self._buckets.get(key, 0) + count
+        self.count += count
+        self.sum += value * count
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: 'LatencyHistogram'):
+        """Fold another histogram (same accuracy) into this one."""
+        if other._gamma != self._gamma:
+            raise ValueError("Cannot merge histograms with different accuracy")
+        for key, count in other._buckets.items():
+            self._buckets[key] = self._buckets.get(key, 0) + count
+        self._zero_count += other._zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p: float) -> float:
+        """Value at percentile `p` (0-100), e.g. 99.9 for p99.9."""
+        if not self.count:
+            return 0.0
+        rank = p / 100 * (self.count - 1)
+        seen = self._zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self._buckets):
+            seen += self._buckets[key]
+            if seen > rank:
+                return min(self._value(key), self.max)
+        return self.max
+
+    def percentiles(self, ps: Iterable[float]) -> Dict[float, float]:
+        """Several percentiles in one pass over the buckets."""
+        ps = sorted(ps)
+        result = {p: 0.0 for p in ps}
+        if not self.count:
+            return result
+        ranks = [(p, p / 100 * (self.count - 1)) for p in ps]
+        i = 0
+        seen = self._zero_count
+        while i < len(ranks) and seen > ranks[i][1]:
+            i += 1
+        for key in sorted(self._buckets):
+            seen += self._buckets[key]
+            while i < len(ranks) and seen > ranks[i][1]:
+                result[ranks[i][0]] = min(self._value(key), self.max)
+                i += 1
+            if i == len(ranks):
+                break
+        for p, _ in ranks[i:]:
+            result[p] = self.max
+        return result
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def summary(self) -> Dict[str, float]:
+        pct = self.percentiles((50, 90, 95, 99, 99.9))
+        return {
+            "count": self.count,
+            "mean_ms": self.mean,
+            "p50_ms": pct[50],
+            "p90_ms": pct[90],
+            "p95_ms": pct[95],
+            "p99_ms": pct[99],
+            "p999_ms": pct[99.9],
+            "max_ms": self.max,
+        }
+
+
+class WindowedLatencyHistogram:
+    """
+    All-time histogram plus a ring of per-interval histograms.
+    A window query merges the intervals it covers, so the cost depends
+    on the window length and bucket count, never on the number of
+    recorded values.
+    """
+
+    def __init__(self, interval_sec: int = 10, max_window_sec: int = 900,
+                 relative_accuracy: float = 0.01):
+        self.interval_sec = interval_sec
+        self.max_window_sec = max_window_sec
+        self.relative_accuracy = relative_accuracy
+        self.total = LatencyHistogram(relative_accuracy)
+        # (interval start, histogram), oldest first
+        self._intervals: deque = deque()
+
+    def _current(self, now: float) -> LatencyHistogram:
+        start = int(now // self.interval_sec) * self.interval_sec
+        if not self._intervals or self._intervals[-1][0] != start:
+            self._intervals.append((start, LatencyHistogram(self.relative_accuracy)))
+            horizon = start - self.max_window_sec
+            while self._intervals and self._intervals[0][0] < horizon:
+                self._intervals.popleft()
+        return self._intervals[-1][1]
+
+    def record(self, value: float, now: Optional[float] = None):
+        now = now if now is not None else time.time()
+        self.total.record(value)
+        self._current(now).record(value)
+
+    def window(self, seconds: int, now: Optional[float] = None) -> LatencyHistogram:
+        """Histogram of values recorded in the last `seconds` seconds."""
+        now = now if now is not None else time.time()
+        merged = LatencyHistogram(self.relative_accuracy)
+        oldest = now - seconds
+        for start, hist in reversed(self._intervals):
+            if start + self.interval_sec <= oldest:
+                break
+            merged.merge(hist)
+        return merged
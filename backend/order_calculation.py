@@ -0,0 +1,26 @@
+"""
+Order Calculation for SwiftCart Order Manager
+The CPU-bound step of order processing: re-derives an order's totals from
+its items and decides its outcome. It is a plain function of the order
+dict with no access to the store, so it runs unchanged on the event loop
+or in a shard process (see process_pool).
+"""
+
+import random
+from typing import Any, Dict
+
+TAX_RATE = 0.1
+FAILURE_RATE = 0.05  # simulated inventory/payment failures
+
+
+def calculate_order(order: Dict[str, Any]) -> Dict[str, Any]:
+    """Totals and final status for `order`, as fields to set on it."""
+    subtotal = sum(item["quantity"] * item["price"] for item in order.get("items") or ())
+    tax = subtotal * TAX_RATE
+    return {
+        "order_id": order["order_id"],
+        "status": "completed" if random.random() > FAILURE_RATE else "failed",
+        "subtotal": subtotal,
+        "tax": tax,
+        "total": subtotal + tax,
+    }
@@ -0,0 +1,163 @@
+"""
+Order Metrics Aggregator for SwiftCart Order Manager
+Maintains order counters incrementally as orders change state, so the
+metrics endpoint reads precomputed values instead of scanning the store.
+"""
+
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, Optional
+
+from latency_histogram import WindowedLatencyHistogram
+
+# Sliding windows reported alongside the all-time latency percentiles
+LATENCY_WINDOWS = {"1m": 60, "5m": 300, "15m": 900}
+
+
+class CompletionRing:
+    """
+    Per-second ring buffer of completions over a fixed window.
+    Each slot remembers which epoch second it counts, so slots left over
+    from a previous lap are ignored (and reset on the next write).
+    """
+
+    def __init__(self, window_sec: int = 60):
+        self.window_sec = window_sec
+        self._counts = [0] * window_sec
+        self._seconds = [-1] * window_sec
+        self._started = time.time()
+
+    def record(self, now: Optional[float] = None, count: int = 1):
+        second = int(now if now is not None else time.time())
+        slot = second % self.window_sec
+        if self._seconds[slot] != second:
+            self._seconds[slot] = second
+            self._counts[slot] = 0
+        self._counts[slot] += count
+
+    def total(self, now: Optional[float] = None) -> int:
+        """Completions recorded within the last `window_sec` seconds."""
+        second = int(now if now is not None else time.time())
+        oldest = second - self.window_sec
+        return sum(
+            count for count, sec in zip(self._counts, self._seconds)
+            if oldest < sec <= second
+        )
+
+    def rate(self, now: Optional[float] = None) -> float:
+        """Completions per second, averaged over the window (or uptime if shorter)."""
+        now = now if now is not None else time.time()
+        span = min(self.window_sec, max(now - self._started, 1.0))
+        return self.total(now) / span
+
+
+class OrderMetrics:
+    """
+    Incrementally maintained order metrics.
+    Ingest calls `order_created` (and `duplicate_hit` / `request_coalesced`
+    for repeated idempotency keys); the order processor calls
+    `order_claimed` with the time an order spent queued before a worker
+    took it, and `order_finished` once it reaches a terminal status, which
+    also records its processing time into the streaming latency histogram.
+    A dead-lettered order finishes as `dead_lettered`; requeueing it calls
+    `order_requeued` to make it pending again.
+    All updates happen on the event loop, so no locking is needed.
+    """
+
+    def __init__(self, throughput_window_sec: int = 60):
+        self.status_counts: Counter = Counter()
+        self.queue_depth = 0
+        self.total_orders = 0
+        self.duplicate_hits = 0
+        self.coalesced_requests = 0
+        self.latency = WindowedLatencyHistogram(max_window_sec=max(LATENCY_WINDOWS.values()))
+        self.queue_wait = WindowedLatencyHistogram(max_window_sec=max(LATENCY_WINDOWS.values()))
+        self._completions = CompletionRing(throughput_window_sec)
+
+    def order_created(self, count: int = 1):
+        """Record newly ingested (pending) orders."""
+        self.status_counts['pending'] += count
+        self.queue_depth += count
+
+    def duplicate_hit(self, count: int = 1):
+        """Record submissions answered with an existing order."""
+        self.duplicate_hits += count
+
+    def request_coalesced(self):
+        """Record a submission that joined an identical one in flight."""
+        self.coalesced_requests += 1
+
+    def order_claimed(self, queue_wait_ms: float, now: Optional[float] = None):
+        """Record the ingest-to-claim wait of an order a worker picked up."""
+        self.queue_wait.record(max(queue_wait_ms, 0.0), now)
+
+    def order_finished(self, status: str, processing_time_ms: Optional[float] = None,
+                       now: Optional[float] = None):
+        """Record a pending order reaching a terminal status."""
+        self.status_counts['pending'] -= 1
+        self.status_counts[status] += 1
+        self.queue_depth = max(self.queue_depth - 1, 0)
+        self.total_orders += 1
+        if processing_time_ms is not None:
+            self.latency.record(processing_time_ms, now)
+        self._completions.record(now)
+
+    def order_requeued(self, status: str):
+        """Record a finished order going back to the queue."""
+        self.status_counts[status] -= 1
+        self.status_counts['pending'] += 1
+        self.queue_depth += 1
+        self.total_orders -= 1
+
+    def restore(self, orders: Iterable[Dict[str, Any]], queue_depth: int):
+        """Rebuild counters from recovered orders (e.g. after a restart)."""
+        self.__init__(self._completions.window_sec)
+        for order in orders:
+            self.status_counts[order.get('status')] += 1
+            self.total_orders += 1
+            if order.get('processing_time_ms') is not None:
+                self.latency.total.record(order['processing_time_ms'])
+        self.status_counts['pending'] += queue_depth
+        self.queue_depth = queue_depth
+
+    @property
+    def avg_processing_time_ms(self) -> float:
+        return self.latency.total.mean
+
+    def throughput_per_sec(self, now: Optional[float] = None) -> float:
+        return self._completions.rate(now)
+
+    def latency_windows(self, now: Optional[float] = None) -> Dict[str, Dict[str, float]]:
+        return {
+            name: self.latency.window(seconds, now).summary()
+            for name, seconds in LATENCY_WINDOWS.items()
+        }
+
+    def queue_wait_windows(self, now: Optional[float] = None) -> Dict[str, Dict[str, float]]:
+        return {
+            "all": self.queue_wait.total.summary(),
+            **{name: self.queue_wait.window(seconds, now).summary()
+               for name, seconds in LATENCY_WINDOWS.items()},
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        pct = self.latency.total.percentiles((50, 90, 95, 99, 99.9))
+        return {
+            "total_orders": self.total_orders,
+            "completed_orders": self.status_counts['completed'],
+            "failed_orders": self.status_counts['failed'],
+            "avg_processing_time_ms": self.avg_processing_time_ms,
+            "queue_depth": self.queue_depth,
+            "throughput_per_sec": self.throughput_per_sec(),
+            "p50_latency_ms": pct[50],
+            "p90_latency_ms": pct[90],
+            "p95_latency_ms": pct[95],
+            "p99_latency_ms": pct[99],
+            "p999_latency_ms": pct[99.9],
+            "max_latency_ms": self.latency.total.max,
+            "latency_windows": self.latency_windows(),
+            "queue_wait": self.queue_wait_windows(),
+            "duplicate_hits": self.duplicate_hits,
+            "coalesced_requests": self.coalesced_requests,
+            "dead_lettered_orders": self.status_counts['dead_lettered'],
+        }
@@ -0,0 +1,296 @@
+"""
+Staged Order Pipeline for SwiftCart Order Manager
+Runs order processing as a chain of stages (validation → enrichment →
+calculation in the server). Each stage is a pluggable async callable with
+its own bounded input queue and its own number of runner tasks, so a slow
+I/O-bound stage can fan out wide while a CPU-bound one stays narrow. A
+full queue blocks the stage feeding it, so backpressure reaches the
+workers submitting orders instead of orders piling up in memory. A stage
+with a `batch_size` hands its handler every ready order in its queue (up
+to that many) at once, in arrival order, so a step with a per-call cost
+(e.g. a round trip to the shard processes) pays it once per batch.
+
+Stages with different latencies reorder orders. An `ordered` stage
+undoes that for orders sharing a pipeline `key` (the server's shard
+key): they enter its queue in the order they entered the pipeline. An
+order that overtakes an earlier one with its key is parked until that
+one has been queued, or has failed, and is queued right after it.
+
+Per stage, the pipeline reports queue depth, orders in flight,
+throughput and the latency of both the wait in its queue and the handler
+itself, which shows which stage is the bottleneck under load.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from latency_histogram import WindowedLatencyHistogram
+from order_metrics import CompletionRing
+
+logger = logging.getLogger(__name__)
+
+MAX_STAGE_CONCURRENCY = 1024
+MAX_STAGE_BATCH_SIZE = 1000
+
+StageHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+BatchStageHandler = Callable[[List[Dict[str, Any]]], Awaitable[None]]
+
+
+class Stage:
+    """
+    One pipeline stage: `handler` is awaited with each order and updates
+    it in place; raising fails the order (the rest of the pipeline is
+    skipped). `concurrency` runners take orders from a queue bounded at
+    `queue_size`. With `batch_size` above 1, `handler` is instead awaited
+    with a list of up to that many orders, taken in queue order without
+    waiting for more to arrive; raising fails every order of the list.
+    An `ordered` stage takes orders with the same pipeline key in the
+    order they entered the pipeline.
+    """
+
+    def __init__(self, name: str, handler: Union[StageHandler, BatchStageHandler], concurrency: int = 1,
+                 queue_size: int = 100, batch_size: int = 1, ordered: bool = False):
+        if not 1 <= concurrency <= MAX_STAGE_CONCURRENCY:
+            raise ValueError(f"Stage concurrency must be between 1 and {MAX_STAGE_CONCURRENCY}")
+        if queue_size < 1:
+            raise ValueError("Stage queue size must be at least 1")
+        if not 1 <= batch_size <= MAX_STAGE_BATCH_SIZE:
+            raise ValueError(f"Stage batch size must be between 1 and {MAX_STAGE_BATCH_SIZE}")
+        self.name = name
+        self.handler = handler
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.ordered = ordered
+        self.queue: Optional[asyncio.Queue] = None
+        self.in_flight = 0
+        self.processed = 0
+        self.failed = 0
+        self.batches = 0
+        self.wait = WindowedLatencyHistogram(max_window_sec=60)
+        self.latency = WindowedLatencyHistogram(max_window_sec=60)
+        self.completions = CompletionRing(60)
+
+    @classmethod
+    def from_env(cls, name: str, handler: Union[StageHandler, BatchStageHandler], concurrency: int = 1,
+                 batch_size: int = 1, ordered: bool = False):
+        """
+        A stage sized by ORDER_STAGE_<NAME>_CONCURRENCY, ORDER_STAGE_QUEUE_SIZE
+        and, for a stage whose handler takes batches, ORDER_STAGE_<NAME>_BATCH_SIZE.
+        """
+        if batch_size > 1:
+            batch_size = int(os.environ.get(f'ORDER_STAGE_{name.upper()}_BATCH_SIZE', batch_size))
+        return cls(
+            name, handler,
+            concurrency=int(os.environ.get(f'ORDER_STAGE_{name.upper()}_CONCURRENCY', concurrency)),
+            queue_size=int(os.environ.get('ORDER_STAGE_QUEUE_SIZE', 100)),
+            batch_size=batch_size,
+            ordered=ordered,
+        )
+
+    def stats(self, now: Optional[float] = None) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "concurrency": self.concurrency,
+            "queue_size": self.queue_size,
+            "batch_size": self.batch_size,
+            "ordered": self.ordered,
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "in_flight": self.in_flight,
+            "processed": self.processed,
+            "failed": self.failed,
+            "batches": self.batches,
+            "throughput_per_sec": self.completions.rate(now),
+            "wait": {"all": self.wait.total.summary(), "1m": self.wait.window(60, now).summary()},
+            "latency": {"all": self.latency.total.summary(), "1m": self.latency.window(60, now).summary()},
+        }
+
+
+class OrderPipeline:
+    """
+    `run` feeds orders into the first stage and returns once every order
+    has passed the last one or failed; it then raises the first failure
+    among them (the worker pool retries or dead-letters the failing
+    order). Orders of one `run` move through the stages independently of
+    each other. An order's place among those with the same `key` is
+    taken when `run` starts, before it first awaits.
+    """
+
+    def __init__(self, stages: List[Stage], key: Optional[Callable[[Dict[str, Any]], str]] = None):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        if len({stage.name for stage in stages}) != len(stages):
+            raise ValueError("Pipeline stage names must be unique")
+        if key is None and any(stage.ordered for stage in stages):
+            raise ValueError("Ordered stages need a pipeline key")
+        self.stages = stages
+        self.key = key
+        self._tasks: List[asyncio.Task] = []
+        # Per ordered stage: key -> future of the last order given a place,
+        # settled once that order has been queued for the stage or dropped out
+        self._tails: Dict[int, Dict[str, asyncio.Future]] = {
+            position: {} for position, stage in enumerate(stages) if stage.ordered}
+        self._parked: Set[asyncio.Task] = set()
+        self.running = False
+
+    def start(self):
+        for stage in self.stages:
+            stage.queue = asyncio.Queue(stage.queue_size)
+        for position, stage in enumerate(self.stages):
+            for runner in range(stage.concurrency):
+                self._tasks.append(asyncio.create_task(self._run_stage(position),
+                                                       name=f'stage-{stage.name}-{runner}'))
+        self.running = True
+        logger.info("Order pipeline started: " + " → ".join(
+            f"{stage.name} (x{stage.concurrency}"
+            + (f", batches of {stage.batch_size})" if stage.batch_size > 1 else ")") for stage in self.stages))
+
+    @staticmethod
+    async def _take(stage: Stage) -> List[Tuple[Dict[str, Any], asyncio.Future, float, Dict]]:
+        """Wait for a queued order, then take any others ready, up to the stage's batch size."""
+        items = []
+        while not items or (len(items) < stage.batch_size and not stage.queue.empty()):
+            item = await stage.queue.get() if not items else stage.queue.get_nowait()
+            # Skip orders whose submitter gave up (e.g. its worker was cancelled)
+            if not item[1].done():
+                items.append(item)
+        return items
+
+    async def _run_stage(self, position: int):
+        stage = self.stages[position]
+        following = self.stages[position + 1] if position + 1 < len(self.stages) else None
+        while True:
+            items = await self._take(stage)
+            start = time.perf_counter()
+            for _, _, queued_at, _ in items:
+                stage.wait.record((start - queued_at) * 1000)
+            stage.in_flight += len(items)
+            try:
+                if stage.batch_size > 1:
+                    await stage.handler([order for order, _, _, _ in items])
+                else:
+                    await stage.handler(items[0][0])
+            except Exception as e:
+                stage.failed += len(items)
+                for _, done, _, _ in items:
+                    if not done.done():
+                        done.set_exception(e)
+                continue
+            finally:
+                stage.in_flight -= len(items)
+                stage.batches += 1
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                for _ in items:
+                    stage.latency.record(elapsed_ms)
+            stage.processed += len(items)
+            stage.completions.record(count=len(items))
+            for order, done, _, places in items:
+                if following is None:
+                    if not done.done():
+                        done.set_result(order)
+                else:
+                    await self._forward(position + 1, (order, done, time.perf_counter(), places))
+
+    def _take_places(self, order: Dict[str, Any], done: asyncio.Future) -> Dict[int, Tuple]:
+        """
+        Give `order` a place behind the last order with its key, for each
+        ordered stage: (predecessor's future, its own future).
+        """
+        places = {}
+        if not self._tails:
+            return places
+        key = self.key(order)
+        for position, tails in self._tails.items():
+            previous = tails.get(key)
+            queued = done.get_loop().create_future()
+            tails[key] = queued
+            queued.add_done_callback(
+                lambda f, tails=tails, key=key: tails.pop(key) if tails.get(key) is f else None)
+            places[position] = (previous, queued)
+            # An order that fails or is given up before reaching the stage
+            # must not hold back the orders behind it
+            done.add_done_callback(lambda _, previous=previous, queued=queued: self._settle(previous, queued))
+        return places
+
+    @staticmethod
+    def _settle(previous: Optional[asyncio.Future], queued: asyncio.Future):
+        """Settle `queued` once `previous` is, keeping the key's order."""
+        if queued.done():
+            return
+        if previous is None or previous.done():
+            queued.set_result(None)
+        else:
+            previous.add_done_callback(lambda _: queued.done() or queued.set_result(None))
+
+    async def _forward(self, position: int, item: Tuple):
+        """Queue `item` for stage `position`; for an ordered stage, after the order ahead of it."""
+        stage = self.stages[position]
+        place = item[3].get(position)
+        if place is None:
+            # Blocks while the stage's queue is full
+            await stage.queue.put(item)
+            return
+        previous, queued = place
+        if previous is not None and not previous.done():
+            # Overtook an earlier order with the same key: park it rather
+            # than hold up this runner
+            previous.add_done_callback(lambda _: self._unpark(stage, item, queued))
+            return
+        await stage.queue.put(item)
+        if not queued.done():
+            queued.set_result(None)
+
+    def _unpark(self, stage: Stage, item: Tuple, queued: asyncio.Future):
+        async def put():
+            await stage.queue.put(item)
+            if not queued.done():
+                queued.set_result(None)
+        task = asyncio.ensure_future(put())
+        self._parked.add(task)
+        task.add_done_callback(self._parked.discard)
+
+    async def run(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Pass `orders` through every stage; returns them, in order."""
+        loop = asyncio.get_running_loop()
+        waits: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        # Every order takes its place before the first await
+        items = []
+        for order in orders:
+            done = loop.create_future()
+            waits.append((order, done))
+            items.append((order, done, self._take_places(order, done)))
+        try:
+            for order, done, places in items:
+                await self._forward(0, (order, done, time.perf_counter(), places))
+            # Let every order settle before failing, so none is still in a
+            # stage when the caller retries the batch
+            results = await asyncio.gather(*(done for _, done in waits), return_exceptions=True)
+        finally:
+            # Orders still queued are skipped once their future is settled
+            for _, done in waits:
+                if not done.done():
+                    done.cancel()
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
+
+    async def stop(self):
+        self.running = False
+        tasks = self._tasks + list(self._parked)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "in_flight": sum(stage.queue.qsize() + stage.in_flight for stage in self.stages
+                             if stage.queue is not None),
+            "stages": [stage.stats(now) for stage in self.stages],
+        }
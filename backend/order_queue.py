@@ -0,0 +1,214 @@
+"""
+Order Queue Store for SwiftCart Order Manager
+Backs the `orders_queue` collection with an order_id hash index and a
+FIFO of unprocessed entries, so lookups, claiming pending orders and
+marking an order processed stay O(1) as the queue grows.
+"""
+
+import heapq
+import math
+import time
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+class OrderQueue:
+    """
+    Indexed order queue.
+    `_entries` maps order_id -> queue document (insertion ordered);
+    `_pending` holds order_ids awaiting processing in arrival order.
+    Entries marked processed are dropped from the FIFO lazily, when they
+    reach its head, so marking never has to search the deque. They are
+    also remembered in `_processed` (oldest first) so retention can
+    remove them without scanning the index.
+
+    `claim` leases pending entries to a worker: they leave the FIFO and
+    are recorded in `_claims` until marked processed, released, or the
+    lease expires, after which the next `claim` returns them to the back
+    of the FIFO. A claim counts an attempt in the document's `attempts`.
+    A release may delay the entry (`_delayed`, a heap by ready time) for
+    a retry backoff. Claims and delays live outside the documents, so they
+    are never persisted and a restart returns every unprocessed entry to
+    the queue.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._pending: deque = deque()
+        self._pending_count = 0
+        self._processed: deque = deque()
+        self._claims: Dict[str, Tuple[str, float]] = {}  # order_id -> (worker id, lease expiry)
+        self._leases: List[Tuple[float, str]] = []  # heap; stale once the claim changes
+        self._delayed: Dict[str, float] = {}  # order_id -> epoch time it may be claimed again
+        self._delayed_heap: List[Tuple[float, str]] = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self._entries.values())
+
+    @property
+    def pending_count(self) -> int:
+        return self._pending_count
+
+    @property
+    def claimed_count(self) -> int:
+        return len(self._claims)
+
+    @property
+    def delayed_count(self) -> int:
+        return len(self._delayed)
+
+    @property
+    def processed_count(self) -> int:
+        return len(self._entries) - self._pending_count
+
+    def append(self, doc: Dict[str, Any]):
+        """Add a queue document, indexing it by order_id."""
+        order_id = doc['order_id']
+        previous = self._entries.get(order_id)
+        if previous is not None and not previous.get('processed'):
+            self._pending_count -= 1
+        self._claims.pop(order_id, None)
+        self._delayed.pop(order_id, None)
+        self._entries[order_id] = doc
+        if not doc.get('processed'):
+            self._pending.append(order_id)
+            self._pending_count += 1
+        else:
+            self._processed.append((time.time(), order_id))
+
+    def get(self, order_id: str) -> Optional[Dict[str, Any]]:
+        """Look up a queue document by order_id."""
+        return self._entries.get(order_id)
+
+    def next_pending(self) -> Optional[Dict[str, Any]]:
+        """Return the oldest unprocessed document without removing it."""
+        while self._pending:
+            order_id = self._pending[0]
+            doc = self._entries.get(order_id)
+            if (doc is not None and not doc.get('processed') and order_id not in self._claims
+                    and order_id not in self._delayed):
+                return doc
+            # Stale head: already processed, claimed, delayed, replaced or removed
+            self._pending.popleft()
+        return None
+
+    def _requeue_due(self, now: float):
+        """Return expired leases and finished retry delays to the FIFO."""
+        while self._leases and self._leases[0][0] <= now:
+            expiry, order_id = heapq.heappop(self._leases)
+            claim = self._claims.get(order_id)
+            if claim is not None and claim[1] == expiry:
+                del self._claims[order_id]
+                self._pending.append(order_id)
+        while self._delayed_heap and self._delayed_heap[0][0] <= now:
+            ready_at, order_id = heapq.heappop(self._delayed_heap)
+            if self._delayed.get(order_id) == ready_at:
+                del self._delayed[order_id]
+                self._pending.append(order_id)
+
+    def claim(self, worker: str, limit: int = 1, lease_sec: float = math.inf,
+              now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Lease up to `limit` of the oldest claimable pending entries to `worker`."""
+        now = now if now is not None else time.time()
+        self._requeue_due(now)
+        claimed = []
+        while self._pending and len(claimed) < limit:
+            order_id = self._pending.popleft()
+            doc = self._entries.get(order_id)
+            if (doc is None or doc.get('processed') or order_id in self._claims
+                    or order_id in self._delayed):
+                continue
+            expiry = now + lease_sec
+            self._claims[order_id] = (worker, expiry)
+            if expiry != math.inf:
+                heapq.heappush(self._leases, (expiry, order_id))
+            doc['attempts'] = doc.get('attempts', 0) + 1
+            claimed.append(doc)
+        return claimed
+
+    def claimed_by(self, order_id: str) -> Optional[str]:
+        claim = self._claims.get(order_id)
+        return claim[0] if claim is not None else None
+
+    def renew(self, order_id: str, worker: str, lease_sec: float = math.inf,
+              now: Optional[float] = None) -> bool:
+        """
+        Extend `worker`'s claim to `lease_sec` from now. A no-op (False)
+        unless `worker` holds the current claim.
+        """
+        if self.claimed_by(order_id) != worker:
+            return False
+        expiry = (now if now is not None else time.time()) + lease_sec
+        self._claims[order_id] = (worker, expiry)
+        if expiry != math.inf:
+            heapq.heappush(self._leases, (expiry, order_id))
+        return True
+
+    def release(self, order_id: str, worker: str, delay_sec: float = 0.0,
+                now: Optional[float] = None) -> bool:
+        """
+        Give up `worker`'s claim. An unprocessed entry goes to the back of
+        the FIFO, after `delay_sec` if given. A no-op (False) unless
+        `worker` holds the current claim, so a worker whose lease expired
+        cannot release an entry another worker has since claimed.
+        """
+        if self.claimed_by(order_id) != worker:
+            return False
+        del self._claims[order_id]
+        doc = self._entries.get(order_id)
+        if doc is not None and not doc.get('processed'):
+            if delay_sec > 0:
+                ready_at = (now if now is not None else time.time()) + delay_sec
+                self._delayed[order_id] = ready_at
+                heapq.heappush(self._delayed_heap, (ready_at, order_id))
+            else:
+                self._pending.append(order_id)
+        return True
+
+    def update(self, order_id: str, fields: Dict[str, Any]) -> bool:
+        """Apply a `$set` to a queue document. Returns False if absent."""
+        doc = self._entries.get(order_id)
+        if doc is None:
+            return False
+        was_processed = bool(doc.get('processed'))
+        doc.update(fields)
+        is_processed = bool(doc.get('processed'))
+        if is_processed and not was_processed:
+            self._pending_count -= 1
+            self._processed.append((time.time(), order_id))
+            self._claims.pop(order_id, None)
+            self._delayed.pop(order_id, None)
+        elif was_processed and not is_processed:
+            self._pending.append(order_id)
+            self._pending_count += 1
+        return True
+
+    def mark_processed(self, order_id: str) -> bool:
+        """Flag an entry as processed."""
+        return self.update(order_id, {'processed': True})
+
+    def remove_processed(self, older_than: float, limit: int) -> List[str]:
+        """
+        Drop up to `limit` entries that were marked processed before the
+        epoch time `older_than`. Returns the order_ids removed.
+        """
+        removed = []
+        while self._processed and len(removed) < limit:
+            processed_at, order_id = self._processed[0]
+            if processed_at > older_than:
+                break
+            self._processed.popleft()
+            if self.remove(order_id):
+                removed.append(order_id)
+        return removed
+
+    def remove(self, order_id: str) -> bool:
+        """Drop a processed entry (its `_processed` record goes stale)."""
+        doc = self._entries.get(order_id)
+        if doc is None or not doc.get('processed'):
+            return False
+        del self._entries[order_id]
+        return True
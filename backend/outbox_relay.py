@@ -0,0 +1,128 @@
+"""
+Outbox Relay for SwiftCart Order Manager
+Background task that drains the storage outbox to Kafka. Pending rows are
+read in sequence order, grouped by topic into producer batches and marked
+delivered once the broker acknowledges them. Failed batches stay pending
+and are retried with exponential backoff, so a broker outage becomes a
+backlog that drains when it recovers.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxRelay:
+    """
+    `fallback` is called with each row when Kafka is not connected at all
+    (fallback mode); those rows are then marked delivered, as the direct
+    publish path did before the outbox existed.
+    """
+
+    def __init__(self, db, producer, fallback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 batch_size: int = 500, poll_interval_sec: float = 0.05,
+                 backoff_base_sec: float = 0.5, backoff_max_sec: float = 30.0):
+        self.db = db
+        self.producer = producer
+        self.fallback = fallback
+        self.batch_size = batch_size
+        self.poll_interval_sec = poll_interval_sec
+        self.backoff_base_sec = backoff_base_sec
+        self.backoff_max_sec = backoff_max_sec
+        self.running = False
+        self.delivered = 0
+        self.fallback_delivered = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.consecutive_failures = 0
+        self.last_relay_ms = 0.0
+
+    @classmethod
+    def from_env(cls, db, producer, fallback=None):
+        return cls(
+            db, producer, fallback,
+            batch_size=int(os.environ.get('OUTBOX_BATCH_SIZE', 500)),
+            poll_interval_sec=float(os.environ.get('OUTBOX_POLL_INTERVAL_SEC', 0.05)),
+            backoff_base_sec=float(os.environ.get('OUTBOX_BACKOFF_BASE_SEC', 0.5)),
+            backoff_max_sec=float(os.environ.get('OUTBOX_BACKOFF_MAX_SEC', 30)),
+        )
+
+    async def relay_once(self) -> Tuple[int, bool]:
+        """Deliver one batch of pending rows; returns (rows handled, any failed)."""
+        rows = await self.db.outbox_pending(self.batch_size)
+        if not rows:
+            return 0, False
+        start = time.perf_counter()
+
+        if not self.producer.is_connected:
+            if self.fallback is not None:
+                for row in rows:
+                    self.fallback(row)
+            await self.db.outbox_mark_delivered([row['seq'] for row in rows])
+            self.fallback_delivered += len(rows)
+            return len(rows), False
+
+        by_topic: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            by_topic.setdefault(row['topic'], []).append(row)
+
+        delivered, failed = [], []
+        for topic, topic_rows in by_topic.items():
+            ok = await self.producer.publish_encoded_async(
+                topic, [(row['key'], row['value'], row['headers']) for row in topic_rows])
+            (delivered if ok else failed).extend(row['seq'] for row in topic_rows)
+            self.batches += 1
+
+        if delivered:
+            await self.db.outbox_mark_delivered(delivered)
+            self.delivered += len(delivered)
+        if failed:
+            await self.db.outbox_mark_failed(failed)
+            self.failed_batches += 1
+        self.last_relay_ms = (time.perf_counter() - start) * 1000
+        return len(rows), bool(failed)
+
+    def backoff_delay(self) -> float:
+        """Exponential backoff with jitter for the current failure streak."""
+        delay = min(self.backoff_max_sec, self.backoff_base_sec * 2 ** (self.consecutive_failures - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def run(self):
+        self.running = True
+        logger.info("Outbox relay started")
+        while self.running:
+            try:
+                handled, failed = await self.relay_once()
+            except Exception as e:
+                logger.error(f"Outbox relay error: {e}")
+                handled, failed = 0, True
+
+            if failed:
+                self.consecutive_failures += 1
+                delay = self.backoff_delay()
+                logger.warning(f"Outbox delivery failed ({self.consecutive_failures} in a row), "
+                               f"retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+            else:
+                self.consecutive_failures = 0
+                if handled < self.batch_size:
+                    await asyncio.sleep(self.poll_interval_sec)
+
+    def stop(self):
+        self.running = False
+
+    async def stats(self) -> Dict[str, Any]:
+        return {
+            **await self.db.outbox_stats(),
+            "delivered": self.delivered,
+            "fallback_delivered": self.fallback_delivered,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "consecutive_failures": self.consecutive_failures,
+            "last_relay_ms": self.last_relay_ms,
+        }
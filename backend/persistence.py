@@ -0,0 +1,282 @@
+"""
+Write-Ahead Log & Snapshot Persistence for SwiftCart Order Manager
+Optional durability for InMemoryDB. Every write is appended to a JSON-lines
+WAL; appends arriving within a few milliseconds share one write + fsync
+(group commit). Periodic snapshots capture the whole store and let older
+WAL segments be deleted. Startup recovery loads the last snapshot and
+replays the WAL tail written after it.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = 'snapshot.json'
+SEGMENT_PREFIX = 'wal-'
+SEGMENT_SUFFIX = '.log'
+
+
+def _segment_name(first_seq: int) -> str:
+    return f"{SEGMENT_PREFIX}{first_seq:016d}{SEGMENT_SUFFIX}"
+
+
+def _segment_first_seq(path: Path) -> int:
+    return int(path.name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+
+
+class WriteAheadLog:
+    """
+    Append-only, segmented write-ahead log with group commit.
+    `append` assigns a sequence number synchronously (so log order matches
+    the order writes were applied in memory) and returns a future that
+    resolves once the record is on disk. File I/O runs on a single
+    background thread, which also keeps flushes and rotations in order.
+    """
+
+    def __init__(self, directory: Path, group_commit_ms: float = 2.0, fsync: bool = True):
+        self.directory = Path(directory)
+        self.group_commit_sec = group_commit_ms / 1000
+        self.fsync = fsync
+        self.seq = 0
+        self.records_written = 0
+        self.flushes = 0
+        self._file = None
+        self._buffer: List[str] = []
+        self._waiters: List[asyncio.Future] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix='wal-io')
+
+    def segments(self) -> List[Path]:
+        return sorted(self.directory.glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"), key=_segment_first_seq)
+
+    def open(self, last_seq: int):
+        """Start a fresh segment after recovery has replayed up to `last_seq`."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.seq = last_seq
+        self._open_segment(self.directory / _segment_name(last_seq + 1))
+
+    def _open_segment(self, path: Path):
+        if self._file:
+            self._file.close()
+        self._file = open(path, 'ab')
+
+    def append(self, collection: str, op: str, payload: Dict[str, Any]) -> asyncio.Future:
+        self.seq += 1
+        self._buffer.append(json.dumps(
+            {'seq': self.seq, 'c': collection, 'op': op, 'd': payload},
+            separators=(',', ':'), default=str,
+        ))
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        if self._flush_task is None:
+            self._flush_task = loop.create_task(self._flush_after_window())
+        return waiter
+
+    async def _flush_after_window(self):
+        # Let concurrent writers join this group before hitting the disk
+        await asyncio.sleep(self.group_commit_sec)
+        self._flush_task = None
+        await self.flush()
+
+    def _submit_flush(self):
+        """Hand the buffered records to the I/O thread (synchronously)."""
+        lines, waiters = self._buffer, self._waiters
+        self._buffer, self._waiters = [], []
+        if not lines:
+            return None
+        data = ('\n'.join(lines) + '\n').encode('utf-8')
+        written = asyncio.get_running_loop().run_in_executor(self._io, self._write, data)
+        return written, len(lines), waiters
+
+    async def _complete(self, written, count, waiters):
+        try:
+            await written
+        except Exception as e:
+            logger.error(f"WAL flush failed: {e}")
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+            return
+        self.records_written += count
+        self.flushes += 1
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def flush(self):
+        pending = self._submit_flush()
+        if pending:
+            await self._complete(*pending)
+
+    def _write(self, data: bytes):
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    async def rotate(self) -> int:
+        """
+        Flush and switch to a new segment. Returns the last sequence number
+        in the closed segments; everything after it goes to the new one.
+        The buffered records and the switch are queued on the I/O thread
+        before yielding, so no later record can land in an old segment.
+        """
+        boundary = self.seq
+        path = self.directory / _segment_name(boundary + 1)
+        pending = self._submit_flush()
+        switched = asyncio.get_running_loop().run_in_executor(self._io, self._open_segment, path)
+        if pending:
+            await self._complete(*pending)
+        await switched
+        return boundary
+
+    async def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+        await self.flush()
+        if self._file:
+            await asyncio.get_running_loop().run_in_executor(self._io, self._file.close)
+        self._io.shutdown(wait=True)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "seq": self.seq,
+            "records_written": self.records_written,
+            "flushes": self.flushes,
+            "records_per_flush": self.records_written / self.flushes if self.flushes else 0.0,
+            "segments": len(self.segments()),
+        }
+
+
+class Persistence:
+    """
+    WAL + snapshot persistence for an InMemoryDB.
+    The database calls `log` from its `_persist` hook; the application
+    calls `recover` once at startup and `snapshot` periodically.
+    """
+
+    def __init__(self, directory, group_commit_ms: float = 2.0, fsync: bool = True,
+                 snapshot_interval_sec: float = 300, snapshot_wal_records: int = 100_000):
+        self.directory = Path(directory)
+        self.wal = WriteAheadLog(self.directory, group_commit_ms, fsync)
+        self.snapshot_interval_sec = snapshot_interval_sec
+        self.snapshot_wal_records = snapshot_wal_records
+        self.snapshot_seq = 0
+        self.last_snapshot_at = time.time()
+        self.last_snapshot_ms = 0.0
+        self.last_recovery: Dict[str, Any] = {}
+
+    @classmethod
+    def from_env(cls) -> Optional['Persistence']:
+        """Build from environment variables; None when PERSISTENCE_DIR is unset."""
+        directory = os.environ.get('PERSISTENCE_DIR')
+        if not directory:
+            return None
+        return cls(
+            directory,
+            group_commit_ms=float(os.environ.get('WAL_GROUP_COMMIT_MS', 2.0)),
+            fsync=os.environ.get('WAL_FSYNC', 'true').lower() != 'false',
+            snapshot_interval_sec=float(os.environ.get('SNAPSHOT_INTERVAL_SEC', 300)),
+            snapshot_wal_records=int(os.environ.get('SNAPSHOT_WAL_RECORDS', 100_000)),
+        )
+
+    def log(self, collection: str, op: str, payload: Dict[str, Any]) -> asyncio.Future:
+        return self.wal.append(collection, op, payload)
+
+    def recover(self, db) -> Dict[str, Any]:
+        """Load the last snapshot and replay the WAL tail into `db`."""
+        start = time.perf_counter()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        snapshot_path = self.directory / SNAPSHOT_FILE
+        if snapshot_path.exists():
+            with open(snapshot_path, 'rb') as f:
+                snapshot = json.load(f)
+            self.snapshot_seq = snapshot['seq']
+            db.load_state(snapshot['state'])
+
+        last_seq = self.snapshot_seq
+        replayed = 0
+        for segment in self.wal.segments():
+            with open(segment, 'rb') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Torn write at the tail of the last segment
+                        logger.warning(f"Ignoring truncated WAL record in {segment.name}")
+                        break
+                    if record['seq'] <= last_seq:
+                        continue
+                    db.apply_record(record['c'], record['op'], record['d'])
+                    last_seq = record['seq']
+                    replayed += 1
+
+        self.wal.open(last_seq)
+        self.last_recovery = {
+            "snapshot_seq": self.snapshot_seq,
+            "replayed_records": replayed,
+            "recovery_ms": (time.perf_counter() - start) * 1000,
+        }
+        logger.info(f"Recovered store from {self.directory}: {self.last_recovery}")
+        return self.last_recovery
+
+    def snapshot_due(self) -> bool:
+        if self.wal.seq == self.snapshot_seq:
+            return False
+        return (self.wal.seq - self.snapshot_seq >= self.snapshot_wal_records or
+                time.time() - self.last_snapshot_at >= self.snapshot_interval_sec)
+
+    async def snapshot(self, db):
+        """
+        Write a snapshot and delete the WAL segments it covers.
+        The state is copied on the event loop (one shallow copy per
+        document, no encoding) so it is consistent with the WAL boundary;
+        encoding and disk I/O happen on the WAL thread.
+        """
+        start = time.perf_counter()
+        state = db.export_state()
+        boundary = await self.wal.rotate()
+        await asyncio.get_running_loop().run_in_executor(
+            self.wal._io, self._write_snapshot, boundary, state)
+        self.snapshot_seq = boundary
+        self.last_snapshot_at = time.time()
+        self.last_snapshot_ms = (time.perf_counter() - start) * 1000
+        logger.info(f"Snapshot at seq {boundary} written in {self.last_snapshot_ms:.1f}ms")
+
+    def _write_snapshot(self, seq: int, state: Dict[str, Any]):
+        tmp_path = self.directory / (SNAPSHOT_FILE + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'seq': seq, 'state': state}, f, separators=(',', ':'), default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.directory / SNAPSHOT_FILE)
+        # Segments are named by their first seq; all but the active one
+        # now hold only records covered by the snapshot
+        for segment in self.wal.segments():
+            if _segment_first_seq(segment) <= seq:
+                segment.unlink()
+
+    async def close(self, db=None):
+        if db is not None and self.wal.seq != self.snapshot_seq:
+            await self.snapshot(db)
+        await self.wal.close()
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "directory": str(self.directory),
+            "wal": self.wal.stats,
+            "snapshot_seq": self.snapshot_seq,
+            "last_snapshot_ms": self.last_snapshot_ms,
+            "last_recovery": self.last_recovery,
+        }
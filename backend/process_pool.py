@@ -0,0 +1,249 @@
+"""
+Sharded Process Pool for SwiftCart Order Manager
+Runs a CPU-bound order step in N worker processes so order processing is
+not limited to the API process's single core. Each process owns one
+shard: an order goes to shard crc32(shard key) % N, where the key is its
+order_id or customer_id, so all orders with the same key are handled by
+the same process. A shard works through its input queue in arrival
+order, and `run` queues a call's orders before it first awaits, so
+orders with the same key are handled in the order `run` was called for
+them. The server's pipeline calls it from an `ordered` stage keyed by
+`key_of`, which restores the order in which the workers claimed the
+orders after the stages in front of it have reordered them.
+
+The API process keeps claiming, storage writes and WebSocket broadcasts:
+it sends a shard one message per batch of orders and awaits the results,
+which come back on a shared result queue. A reader thread resolves the
+waiting futures on the event loop. If a shard process dies, its in-flight
+batches fail (the worker pool then releases those orders back to the
+queue) and the process is restarted on the next submission.
+"""
+
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SHARD_KEYS = ('order_id', 'customer_id')
+# How often the result reader checks for shard processes that have died
+LIVENESS_CHECK_SEC = 1.0
+
+Handler = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+
+def shard_for(key: str, shards: int) -> int:
+    """Stable shard of `key` (the same in every process and across restarts)."""
+    return zlib.crc32(key.encode('utf-8')) % shards
+
+
+def _shard_main(handler: Handler, inbox, results):
+    """Shard process loop: run `handler` over each batch, in arrival order."""
+    while True:
+        message = inbox.get()
+        if message is None:
+            break
+        ticket, orders = message
+        start = time.perf_counter()
+        try:
+            value, ok = [handler(order) for order in orders], True
+        except Exception as e:
+            value, ok = f"{type(e).__name__}: {e}", False
+        results.put((ticket, ok, value, time.perf_counter() - start))
+
+
+class ShardStats:
+    """Counters of one shard."""
+
+    def __init__(self):
+        self.batches = 0
+        self.orders = 0
+        self.failed = 0
+        self.restarts = 0
+        self.busy_sec = 0.0
+
+
+class ShardedProcessPool:
+    """
+    `handler` must be a module-level function (processes are spawned, so
+    it is imported by name in each child) taking an order dict and
+    returning a picklable result.
+    """
+
+    def __init__(self, handler: Handler, processes: int = 2, shard_key: str = 'order_id',
+                 start_method: str = 'spawn'):
+        if processes < 1:
+            raise ValueError("A process pool needs at least one process")
+        if shard_key not in SHARD_KEYS:
+            raise ValueError(f"Unknown shard key '{shard_key}' (expected one of {SHARD_KEYS})")
+        self.handler = handler
+        self.processes = processes
+        self.shard_key = shard_key
+        self._context = multiprocessing.get_context(start_method)
+        self._inboxes = []
+        self._procs: List[Optional[multiprocessing.Process]] = []
+        self._results = None
+        self._reader: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tickets = itertools.count()
+        # ticket -> (shard, future)
+        self._in_flight: Dict[int, Tuple[int, asyncio.Future]] = {}
+        self._lock = threading.Lock()
+        self.shards = [ShardStats() for _ in range(processes)]
+        self.running = False
+
+    @classmethod
+    def from_env(cls, handler: Handler) -> Optional['ShardedProcessPool']:
+        """The configured pool, or None when ORDER_PROCESSES is unset or 0."""
+        processes = int(os.environ.get('ORDER_PROCESSES', 0))
+        if processes <= 0:
+            return None
+        return cls(handler, processes, shard_key=os.environ.get('ORDER_SHARD_KEY', 'order_id'))
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._results = self._context.Queue()
+        self._inboxes = [self._context.Queue() for _ in range(self.processes)]
+        self._procs = [None] * self.processes
+        for shard in range(self.processes):
+            self._spawn(shard)
+        self.running = True
+        self._reader = threading.Thread(target=self._read_results, name='shard-results', daemon=True)
+        self._reader.start()
+        logger.info(f"Order process pool started with {self.processes} shards by {self.shard_key}")
+
+    def _spawn(self, shard: int):
+        proc = self._context.Process(target=_shard_main, args=(self.handler, self._inboxes[shard], self._results),
+                                     name=f'order-shard-{shard}', daemon=True)
+        proc.start()
+        self._procs[shard] = proc
+
+    def _read_results(self):
+        next_check = time.monotonic() + LIVENESS_CHECK_SEC
+        while True:
+            # On a timer rather than only when results stop arriving: other
+            # shards may keep the queue busy while one has died
+            if time.monotonic() >= next_check:
+                self._check_processes()
+                next_check = time.monotonic() + LIVENESS_CHECK_SEC
+            try:
+                message = self._results.get(timeout=LIVENESS_CHECK_SEC)
+            except queue.Empty:
+                if not self.running:
+                    return
+                continue
+            if message is None:
+                return
+            ticket, ok, value, busy_sec = message
+            with self._lock:
+                entry = self._in_flight.pop(ticket, None)
+            if entry is not None:
+                self._loop.call_soon_threadsafe(self._resolve, entry, ok, value, busy_sec)
+
+    def _resolve(self, entry, ok: bool, value, busy_sec: float = 0.0):
+        shard, future = entry
+        stats = self.shards[shard]
+        stats.busy_sec += busy_sec
+        if not ok:
+            stats.failed += 1
+        if future.done():
+            return
+        if ok:
+            future.set_result(value)
+        else:
+            future.set_exception(RuntimeError(f"Order shard {shard} failed: {value}"))
+
+    def _check_processes(self):
+        """Fail the in-flight batches of shard processes that have died."""
+        for shard, proc in enumerate(self._procs):
+            if proc is None or proc.is_alive():
+                continue
+            with self._lock:
+                lost = [ticket for ticket, (s, _) in self._in_flight.items() if s == shard]
+                entries = [self._in_flight.pop(ticket) for ticket in lost]
+            for entry in entries:
+                self._loop.call_soon_threadsafe(self._resolve, entry, False, f"process exited ({proc.exitcode})")
+
+    def key_of(self, order: Dict[str, Any]) -> str:
+        return str(order.get(self.shard_key) or order['order_id'])
+
+    def shard_of(self, order: Dict[str, Any]) -> int:
+        return shard_for(self.key_of(order), self.processes)
+
+    async def run(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """`handler` results for `orders`, in order; each shard gets one message."""
+        by_shard: Dict[int, List[int]] = {}
+        for i, order in enumerate(orders):
+            by_shard.setdefault(self.shard_of(order), []).append(i)
+
+        waits = []
+        for shard, positions in by_shard.items():
+            proc = self._procs[shard]
+            if not proc.is_alive():
+                logger.warning(f"Order shard {shard} exited ({proc.exitcode}); restarting")
+                self._check_processes()
+                # The old inbox may be unusable (the process can die holding its lock)
+                self._inboxes[shard] = self._context.Queue()
+                self._spawn(shard)
+                self.shards[shard].restarts += 1
+            ticket = next(self._tickets)
+            future = self._loop.create_future()
+            with self._lock:
+                self._in_flight[ticket] = (shard, future)
+            self._inboxes[shard].put((ticket, [orders[i] for i in positions]))
+            self.shards[shard].batches += 1
+            self.shards[shard].orders += len(positions)
+            waits.append((positions, future))
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(orders)
+        for positions, future in waits:
+            for i, result in zip(positions, await future):
+                results[i] = result
+        return results
+
+    async def stop(self):
+        self.running = False
+        for inbox in self._inboxes:
+            inbox.put(None)
+        loop = asyncio.get_running_loop()
+        for proc in self._procs:
+            if proc is not None:
+                await loop.run_in_executor(None, proc.join, 5)
+                if proc.is_alive():
+                    proc.terminate()
+        if self._results is not None:
+            self._results.put(None)
+        if self._reader is not None:
+            await loop.run_in_executor(None, self._reader.join, 5)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        in_flight = [0] * self.processes
+        with self._lock:
+            for shard, _ in self._in_flight.values():
+                in_flight[shard] += 1
+        return {
+            "enabled": True,
+            "processes": self.processes,
+            "shard_key": self.shard_key,
+            "shards": [
+                {
+                    "pid": proc.pid if proc is not None else None,
+                    "alive": proc is not None and proc.is_alive(),
+                    "in_flight_batches": in_flight[shard],
+                    "batches": stats.batches,
+                    "orders": stats.orders,
+                    "failed_batches": stats.failed,
+                    "restarts": stats.restarts,
+                    "busy_sec": round(stats.busy_sec, 3),
+                }
+                for shard, (proc, stats) in enumerate(zip(self._procs, self.shards))
+            ],
+        }
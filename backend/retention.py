@@ -0,0 +1,44 @@
+"""
+Retention Settings for SwiftCart Order Manager
+Bounds the memory held by the in-memory store: idempotency keys expire
+after a TTL, processed queue entries are removed, and the order event
+log is trimmed by count and age. The compactor applies these in small
+batches so it never stalls the event loop.
+"""
+
+import os
+
+
+class RetentionPolicy:
+    """
+    Retention limits, read from the environment by `from_env`.
+    Set a limit to 0 to disable it.
+    """
+
+    def __init__(self,
+                 idempotency_ttl_sec: float = 86400,
+                 queue_retention_sec: float = 60,
+                 events_max_count: int = 100_000,
+                 events_max_age_sec: float = 3600,
+                 compaction_interval_sec: float = 1.0,
+                 compaction_batch: int = 500):
+        self.idempotency_ttl_sec = idempotency_ttl_sec
+        self.queue_retention_sec = queue_retention_sec
+        self.events_max_count = events_max_count
+        self.events_max_age_sec = events_max_age_sec
+        self.compaction_interval_sec = compaction_interval_sec
+        self.compaction_batch = compaction_batch
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            idempotency_ttl_sec=float(os.environ.get('IDEMPOTENCY_KEY_TTL_SEC', 86400)),
+            queue_retention_sec=float(os.environ.get('QUEUE_RETENTION_SEC', 60)),
+            events_max_count=int(os.environ.get('ORDER_EVENTS_MAX_COUNT', 100_000)),
+            events_max_age_sec=float(os.environ.get('ORDER_EVENTS_MAX_AGE_SEC', 3600)),
+            compaction_interval_sec=float(os.environ.get('COMPACTION_INTERVAL_SEC', 1.0)),
+            compaction_batch=int(os.environ.get('COMPACTION_BATCH', 500)),
+        )
+
+    def to_dict(self):
+        return dict(vars(self))
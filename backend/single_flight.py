@@ -0,0 +1,54 @@
+"""
+Single-Flight Request Coalescing for SwiftCart Order Manager
+Concurrent calls for the same key share one execution: the first caller
+starts the work, later callers await its result (or exception) instead
+of repeating it. Used to collapse retry storms of the same idempotency
+key into a single order ingest.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """
+    The shared work runs as its own task and is awaited through
+    `asyncio.shield`, so a caller that disconnects (and is cancelled)
+    does not cancel it for the callers still waiting.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self._inflight)
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run `fn` once for concurrent callers with the same `key`.
+        Returns (result, shared), where `shared` is True for callers that
+        joined a flight already in progress.
+        """
+        task = self._inflight.get(key)
+        shared = task is not None
+        if shared:
+            self.coalesced += 1
+        else:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task), shared
+
+    def _finish(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception retrieved even if every caller went away
+            task.exception()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._inflight), "leaders": self.leaders, "coalesced": self.coalesced}
@@ -0,0 +1,35 @@
+"""
+SwiftCart Storage Package
+Pluggable storage backends behind a common interface. The backend is
+selected with STORAGE_BACKEND (`memory`, the default, or `sqlite`).
+"""
+
+import os
+
+from .base import StorageBackend, decode_cursor, encode_cursor, order_sort_key
+from .memory import InMemoryDB
+from .sqlite import SQLiteDB
+
+__all__ = [
+    'StorageBackend',
+    'decode_cursor',
+    'encode_cursor',
+    'order_sort_key',
+    'InMemoryDB',
+    'SQLiteDB',
+    'create_storage',
+]
+
+
+def create_storage(backend: str = None) -> StorageBackend:
+    """Build the storage backend named by `backend` or STORAGE_BACKEND."""
+    backend = (backend or os.environ.get('STORAGE_BACKEND', 'memory')).lower()
+    if backend == 'memory':
+        return InMemoryDB(index_bucket_sec=float(os.environ.get('ORDER_INDEX_BUCKET_SEC', 60)))
+    if backend == 'sqlite':
+        return SQLiteDB(
+            path=os.environ.get('SQLITE_PATH', 'swiftcart.db'),
+            reader_threads=int(os.environ.get('SQLITE_READER_THREADS', 4)),
+            synchronous=os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        )
+    raise ValueError(f"Unknown storage backend '{backend}'")
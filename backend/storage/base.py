@@ -0,0 +1,244 @@
+"""
+Storage Backend Interface for SwiftCart Order Manager
+Every backend exposes the same Mongo-flavoured subset the order service
+uses, so the API and workers never depend on a concrete store.
+"""
+
+import base64
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+# Position of an order in the time-ordered index: (created_at epoch, order_id)
+OrderKey = Tuple[float, str]
+
+
+def order_sort_key(doc: Dict[str, Any]) -> OrderKey:
+    created_at = doc.get('created_at')
+    if isinstance(created_at, str):
+        created_at = datetime.fromisoformat(created_at)
+    epoch = created_at.timestamp() if isinstance(created_at, datetime) else 0.0
+    return (epoch, doc.get('order_id', ''))
+
+
+def encode_cursor(key: OrderKey) -> str:
+    """Opaque, URL-safe pagination cursor for an index position."""
+    raw = f"{key[0]!r}|{key[1]}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> OrderKey:
+    """Inverse of `encode_cursor`; raises ValueError on malformed input."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        epoch, order_id = raw.split('|', 1)
+        return (float(epoch), order_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def dead_letter_record(queue_doc: Dict[str, Any], error: str) -> Dict[str, Any]:
+    """The `dead_letters` record for a queue entry taken out of processing."""
+    return {
+        'order_id': queue_doc['order_id'],
+        'attempts': queue_doc.get('attempts', 0),
+        'error': error,
+        'dead_lettered_at': datetime.now(timezone.utc).isoformat(),
+        'order': {k: v for k, v in queue_doc.items() if k not in ('processed', 'attempts')},
+    }
+
+
+class StorageBackend(ABC):
+    """
+    Collections: `idempotency_keys`, `orders_queue`, `orders`, `order_events`,
+    plus the `outbox` of Kafka messages awaiting delivery and the
+    `dead_letters` of queue entries that exhausted their retries.
+    Queries are the simple equality filters the service issues
+    (order_id, key, status, processed); updates support `$set`.
+    """
+
+    name = "base"
+
+    async def open(self):
+        """Acquire resources (connections, threads). Called once at startup."""
+
+    async def close(self):
+        """Release resources. Called once at shutdown."""
+
+    async def ensure_indexes(self):
+        """Create the indexes the service's queries rely on."""
+
+    @abstractmethod
+    async def insert_one(self, collection: str, doc: Dict[str, Any],
+                         outbox: Optional[List[Dict[str, Any]]] = None):
+        """Insert `doc`; `outbox` rows are written atomically with it."""
+
+    async def ingest_orders(self, entries: List[Tuple[Dict[str, Any], Dict[str, Any], List[Dict[str, Any]]]]
+                            ) -> List[Optional[Dict[str, Any]]]:
+        """
+        Bulk idempotent ingest of (idempotency key doc, queue doc, outbox
+        rows) entries. Each entry whose key is new is inserted into
+        `idempotency_keys`, `orders_queue` and `outbox`; for a key that
+        already exists (including one used earlier in the same batch)
+        nothing is written. Returns, per entry, None if inserted or the
+        existing idempotency key doc.
+        Backends override this to do the whole batch in one step.
+        """
+        results = []
+        for key_doc, queue_doc, outbox_rows in entries:
+            existing = await self.find_one('idempotency_keys', {'key': key_doc['key']})
+            if existing is not None:
+                results.append(existing)
+                continue
+            await self.insert_one('idempotency_keys', key_doc)
+            await self.insert_one('orders_queue', queue_doc, outbox=outbox_rows)
+            results.append(None)
+        return results
+
+    @abstractmethod
+    async def complete_orders(self, entries: List[Tuple[Dict[str, Any], Dict[str, Any], List[Dict[str, Any]]]],
+                              worker_id: Optional[str] = None) -> List[str]:
+        """
+        Bulk completion of (order doc, event doc, outbox rows) entries, in
+        one step: each order is upserted into `orders`, its queue entry
+        marked processed (ending its claim) and its event inserted with
+        the outbox rows. With a `worker_id`, an entry whose queue entry
+        that worker no longer holds (the lease passed to another worker,
+        or the order was completed or dead-lettered) is skipped, writing
+        nothing. Returns the skipped order_ids.
+        """
+
+    @abstractmethod
+    async def find_one(self, collection: str, query: Dict[str, Any],
+                       projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def update_one(self, collection: str, query: Dict[str, Any],
+                         update: Dict[str, Any], upsert: bool = False):
+        ...
+
+    @abstractmethod
+    async def count_documents(self, collection: str, query: Optional[Dict[str, Any]] = None) -> int:
+        ...
+
+    @abstractmethod
+    async def aggregate(self, collection: str, pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def to_list(self, collection: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def find_orders_page(self, limit: int, after: Optional[OrderKey] = None,
+                               before: Optional[OrderKey] = None, status: Optional[str] = None,
+                               created_from: Optional[float] = None, created_to: Optional[float] = None,
+                               descending: bool = True) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        One page of `orders` in (created_at, order_id) order.
+        `after` continues past a key in the listing direction; `before`
+        returns the page preceding a key. `created_from`/`created_to` are
+        inclusive epoch bounds. Returns the page, in listing order, and
+        whether more results exist beyond it in the direction walked.
+        """
+
+    @abstractmethod
+    async def claim_orders(self, worker_id: str, limit: int = 1,
+                           lease_sec: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Atomically lease up to `limit` of the oldest claimable pending
+        `orders_queue` entries to `worker_id`. A claimed entry is handed
+        to no one else until it is marked processed or released, or its
+        lease of `lease_sec` (None: no expiry) runs out. Each claim counts
+        an attempt, returned in the entry's `attempts` field.
+        """
+
+    @abstractmethod
+    async def renew_leases(self, worker_id: str, order_ids: List[str],
+                           lease_sec: Optional[float] = None) -> List[str]:
+        """
+        Extend the claims `worker_id` holds on `order_ids` to `lease_sec`
+        from now (None: no expiry). Returns the order_ids renewed; the rest
+        were completed or have passed to another worker.
+        """
+
+    @abstractmethod
+    async def release_order(self, order_id: str, worker_id: str, delay_sec: float = 0.0) -> bool:
+        """
+        Return a queue entry claimed by `worker_id` to the pending queue,
+        claimable again after `delay_sec`. Returns False, changing nothing,
+        unless `worker_id` holds the entry's current claim.
+        """
+
+    @abstractmethod
+    async def dead_letter_order(self, order_id: str, worker_id: str, error: str) -> Optional[Dict[str, Any]]:
+        """
+        Take a queue entry claimed by `worker_id` out of processing (it is
+        marked processed) and record it in `dead_letters` with `error` and
+        its attempt count. Returns the dead-letter record, or None if
+        `worker_id` does not hold the entry's current claim.
+        """
+
+    @abstractmethod
+    async def find_dead_letters(self, limit: int) -> List[Dict[str, Any]]:
+        """Dead-letter records, oldest first."""
+
+    @abstractmethod
+    async def requeue_dead_letter(self, order_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Remove a dead-letter record and queue its order again as pending,
+        with a fresh attempt count. Returns the queue entry, or None.
+        """
+
+    @abstractmethod
+    async def search_orders(self, limit: int, customer_id: Optional[str] = None,
+                            status: Optional[str] = None, created_from: Optional[float] = None,
+                            created_to: Optional[float] = None, after: Optional[OrderKey] = None,
+                            descending: bool = True) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Orders matching every given filter, answered from the customer,
+        status and created_at indexes. Results come in (created_at,
+        order_id) order, continuing past `after` when given; returns the
+        page and whether more matches follow it.
+        """
+
+    # ─── Outbox ──────────────────────────────────────────────
+
+    @abstractmethod
+    async def outbox_pending(self, limit: int) -> List[Dict[str, Any]]:
+        """The oldest undelivered outbox rows, in `seq` order."""
+
+    @abstractmethod
+    async def outbox_mark_delivered(self, seqs: List[int]):
+        ...
+
+    @abstractmethod
+    async def outbox_mark_failed(self, seqs: List[int]):
+        """Count a failed delivery attempt; the rows stay pending."""
+
+    @abstractmethod
+    async def outbox_stats(self) -> Dict[str, Any]:
+        """Pending row count and the age of the oldest pending row."""
+
+    async def compact(self, policy, budget: int, now: Optional[float] = None) -> Dict[str, int]:
+        """Apply one bounded retention step; returns entries removed per collection."""
+        return {}
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+    async def sort(self, collection, field, direction=-1):
+        # Simplified sorting for testing
+        return self
+
+
+class InsertResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+
+
+class UpdateResult:
+    def __init__(self, modified_count):
+        self.modified_count = modified_count
@@ -0,0 +1,114 @@
+"""
+Secondary Order Indexes
+In-memory indexes from customer_id, status and created_at bucket to the
+set of matching order ids. Queries intersect the index sets, starting
+from the smallest, so their cost follows the size of the candidate sets
+rather than the number of stored orders.
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, List, Optional, Set, Tuple
+
+# (customer_id, status, created_at epoch) as indexed for one order
+IndexedFields = Tuple[Optional[str], Optional[str], float]
+
+_EMPTY: Set[str] = frozenset()
+
+
+class OrderIndexes:
+    """
+    `bucket_sec` sets the created_at bucket width. A time window reads
+    every bucket it overlaps, so buckets at the edges may hold orders
+    just outside the window; callers check exact bounds on the result.
+    """
+
+    def __init__(self, bucket_sec: float = 60):
+        self.bucket_sec = bucket_sec
+        self.by_customer: Dict[str, Set[str]] = {}
+        self.by_status: Dict[str, Set[str]] = {}
+        self.by_bucket: Dict[int, Set[str]] = {}
+        # Sorted ids of the non-empty buckets, for range lookups
+        self._bucket_ids: List[int] = []
+
+    def bucket(self, epoch: float) -> int:
+        return int(epoch // self.bucket_sec)
+
+    @staticmethod
+    def _add(index, value, order_id):
+        ids = index.get(value)
+        if ids is None:
+            ids = index[value] = set()
+        ids.add(order_id)
+        return len(ids) == 1
+
+    @staticmethod
+    def _discard(index, value, order_id):
+        ids = index.get(value)
+        if ids is None:
+            return False
+        ids.discard(order_id)
+        if not ids:
+            del index[value]
+            return True
+        return False
+
+    def reindex(self, order_id: str, old: Optional[IndexedFields], new: IndexedFields):
+        """Move an order between index entries; `old` is None for new orders."""
+        old_customer, old_status, old_epoch = old if old is not None else (None, None, None)
+        customer, status, epoch = new
+        if old is None or customer != old_customer:
+            if old_customer is not None:
+                self._discard(self.by_customer, old_customer, order_id)
+            if customer is not None:
+                self._add(self.by_customer, customer, order_id)
+        if old is None or status != old_status:
+            if old_status is not None:
+                self._discard(self.by_status, old_status, order_id)
+            if status is not None:
+                self._add(self.by_status, status, order_id)
+        bucket = self.bucket(epoch)
+        old_bucket = self.bucket(old_epoch) if old_epoch is not None else None
+        if bucket != old_bucket:
+            if old_bucket is not None and self._discard(self.by_bucket, old_bucket, order_id):
+                del self._bucket_ids[bisect_left(self._bucket_ids, old_bucket)]
+            if self._add(self.by_bucket, bucket, order_id):
+                insort(self._bucket_ids, bucket)
+
+    def window(self, created_from: Optional[float], created_to: Optional[float]) -> List[Set[str]]:
+        """The bucket sets overlapping [created_from, created_to]."""
+        lo = bisect_left(self._bucket_ids, self.bucket(created_from)) if created_from is not None else 0
+        hi = (bisect_right(self._bucket_ids, self.bucket(created_to)) if created_to is not None
+              else len(self._bucket_ids))
+        return [self.by_bucket[b] for b in self._bucket_ids[lo:hi]]
+
+    def match(self, customer_id: Optional[str] = None, status: Optional[str] = None,
+              created_from: Optional[float] = None, created_to: Optional[float] = None) -> Set[str]:
+        """
+        Ids of the orders matching the equality filters and (up to bucket
+        granularity) the time window. At least one filter must be given.
+        The window's buckets are only unioned when they hold fewer ids than
+        the smallest equality set; otherwise the caller's exact time check
+        on the (smaller) intersection is cheaper.
+        """
+        sets = []
+        if customer_id is not None:
+            sets.append(self.by_customer.get(customer_id, _EMPTY))
+        if status is not None:
+            sets.append(self.by_status.get(status, _EMPTY))
+        if created_from is not None or created_to is not None:
+            buckets = self.window(created_from, created_to)
+            if not sets or sum(map(len, buckets)) < min(map(len, sets)):
+                sets.append(set().union(*buckets))
+        if not sets:
+            raise ValueError("match() needs at least one filter")
+        sets.sort(key=len)
+        return sets[0].intersection(*sets[1:])
+
+    @property
+    def stats(self):
+        return {
+            "customers": len(self.by_customer),
+            "statuses": len(self.by_status),
+            "buckets": len(self.by_bucket),
+            "bucket_sec": self.bucket_sec,
+        }
@@ -0,0 +1,517 @@
+"""
+In-Memory Storage Backend
+Dict/deque-backed store used for development, tests and single-node
+deployments, with optional WAL + snapshot persistence.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict, deque
+from datetime import datetime
+
+from order_queue import OrderQueue
+
+from .base import InsertResult, StorageBackend, UpdateResult, dead_letter_record
+from .indexes import OrderIndexes
+from .outbox import Outbox
+from .records import OrderRecord
+
+
+class InMemoryDB(StorageBackend):
+    """
+    Locking model:
+      * every write takes one of `lock_stripes` locks chosen by hashing its
+        key (order_id, or the idempotency key), held across the in-memory
+        change and the `_persist` hook, so writes to the same key stay
+        ordered while unrelated keys never contend;
+      * shared containers (the queue FIFO, the event log) additionally
+        take their collection lock, but only around the synchronous
+        mutation itself;
+      * reads (find_one, counts, aggregates, listings) take no lock. Each
+        read completes without awaiting, so it always sees a consistent
+        state on the event loop and never waits behind a writer.
+    Stripe locks are always acquired before collection locks.
+
+    `indexes` maps customer_id, status and created_at bucket to order ids
+    and is kept in step with every order write, backing `search_orders`
+    and status counts.
+
+    `outbox` holds Kafka messages written in the same critical section as
+    the order write that produced them (the `outbox` argument of
+    `insert_one` / `ingest_orders`), for OutboxRelay to deliver.
+
+    Memory is bounded by `compact`, which a background task calls with
+    the configured RetentionPolicy.
+
+    With `persistence` attached, every write is logged to its WAL before
+    the write returns; `export_state`/`load_state`/`apply_record` are
+    used for snapshots and recovery.
+    """
+
+    name = "memory"
+
+    COLLECTIONS = ('idempotency_keys', 'orders_queue', 'orders', 'order_events', 'outbox', 'dead_letters')
+
+    def __init__(self, lock_stripes: int = 64, index_bucket_sec: float = 60):
+        self.idempotency_keys = {}
+        self.orders_queue = OrderQueue()
+        # order_id -> OrderRecord; documents are rebuilt only on the way out
+        self.orders = {}
+        # Sorted (created_at epoch, order_id) keys, plus each order's current key
+        self._orders_by_time = []
+        self._order_keys = {}
+        # status -> sorted (created_at epoch, order_id) keys of its orders
+        self._orders_by_status = {}
+        self.indexes = OrderIndexes(index_bucket_sec)
+        self.order_events = deque()
+        self.outbox = Outbox()
+        # order_id -> dead-letter record, oldest first
+        self.dead_letters = OrderedDict()
+        # (inserted_at, key, doc), oldest first, for TTL expiry. Each key doc
+        # carries its epoch `inserted_at`, so the WAL and snapshots keep the
+        # original time and recovery does not restart a key's TTL
+        self._idempotency_expiry = deque()
+        self._collection_locks = {name: asyncio.Lock() for name in self.COLLECTIONS}
+        self._stripe_locks = [asyncio.Lock() for _ in range(lock_stripes)]
+        self.persistence = None
+
+    def _collection_lock(self, collection):
+        return self._collection_locks[collection]
+
+    def _stripe_lock(self, key):
+        return self._stripe_locks[hash(key) % len(self._stripe_locks)]
+
+    async def _persist(self, collection, op, payload, outbox_rows=()):
+        """
+        Durability hook, awaited while the write's stripe lock is held.
+        Outbox rows written with the change are logged right after it,
+        in the same group commit.
+        """
+        if self.persistence is not None:
+            logged = [self.persistence.log(collection, op, payload)]
+            logged.extend(self.persistence.log('outbox', 'insert', row) for row in outbox_rows)
+            await asyncio.gather(*logged)
+
+    def _add_outbox(self, rows):
+        return [self.outbox.add(row) for row in rows] if rows else ()
+
+    def export_state(self):
+        """Shallow copy of every collection, consistent as of this call."""
+        return {
+            'idempotency_keys': [dict(doc) for doc in self.idempotency_keys.values()],
+            'orders_queue': [dict(doc) for doc in self.orders_queue],
+            'orders': [record.to_doc() for record in self.orders.values()],
+            'order_events': [dict(doc) for doc in self.order_events],
+            'outbox': [dict(row) for row in self.outbox if not row['delivered']],
+            'outbox_seq': self.outbox.seq,
+            'dead_letters': [dict(doc) for doc in self.dead_letters.values()],
+        }
+
+    def load_state(self, state):
+        """Replace the store's contents with an exported state."""
+        self.__init__(lock_stripes=len(self._stripe_locks), index_bucket_sec=self.indexes.bucket_sec)
+        for doc in state.get('idempotency_keys', []):
+            self.apply_record('idempotency_keys', 'insert', doc)
+        for doc in state.get('orders_queue', []):
+            self.apply_record('orders_queue', 'insert', doc)
+        for doc in state.get('orders', []):
+            self._set_order_fields(doc['order_id'], doc)
+        self.order_events.extend(state.get('order_events', []))
+        for row in state.get('outbox', []):
+            self.outbox.add(row)
+        self.outbox.seq = max(self.outbox.seq, state.get('outbox_seq', 0))
+        for doc in state.get('dead_letters', []):
+            self.apply_record('dead_letters', 'insert', doc)
+
+    def apply_record(self, collection, op, payload):
+        """Apply a logged write during recovery (no locking, no logging)."""
+        if collection == 'idempotency_keys':
+            if op == 'delete':
+                self.idempotency_keys.pop(payload['key'], None)
+            else:
+                self.idempotency_keys[payload['key']] = payload
+                self._idempotency_expiry.append((payload.get('inserted_at', time.time()), payload['key'], payload))
+        elif collection == 'orders_queue':
+            if op == 'insert':
+                self.orders_queue.append(payload)
+            elif op == 'delete':
+                self.orders_queue.remove(payload['order_id'])
+            else:
+                self.orders_queue.update(payload['order_id'], payload.get('$set', {}))
+        elif collection == 'orders':
+            self._set_order_fields(payload['order_id'], payload.get('$set', {}))
+        elif collection == 'order_events':
+            if op == 'delete':
+                for _ in range(min(payload['count'], len(self.order_events))):
+                    self.order_events.popleft()
+            else:
+                self.order_events.append(payload)
+        elif collection == 'outbox':
+            if op == 'insert':
+                self.outbox.add(payload)
+            elif op == 'delete':
+                self.outbox.remove_delivered(payload['count'])
+            else:
+                self.outbox.mark_delivered(payload['seqs'])
+        elif collection == 'dead_letters':
+            if op == 'insert':
+                self.dead_letters[payload['order_id']] = payload
+            else:
+                self.dead_letters.pop(payload['order_id'], None)
+
+    async def insert_one(self, collection, doc, outbox=None):
+        if collection == 'idempotency_keys':
+            async with self._stripe_lock(doc['key']):
+                doc = {**doc, 'inserted_at': time.time()}
+                self.idempotency_keys[doc['key']] = doc
+                self._idempotency_expiry.append((doc['inserted_at'], doc['key'], doc))
+                rows = self._add_outbox(outbox)
+                await self._persist(collection, 'insert', doc, rows)
+            return InsertResult(doc.get('_id', 'test-id'))
+        elif collection == 'orders_queue':
+            async with self._stripe_lock(doc['order_id']):
+                async with self._collection_lock(collection):
+                    self.orders_queue.append(doc)
+                    rows = self._add_outbox(outbox)
+                await self._persist(collection, 'insert', doc, rows)
+            return InsertResult('test-id')
+        elif collection == 'order_events':
+            async with self._stripe_lock(doc.get('order_id')):
+                async with self._collection_lock(collection):
+                    self.order_events.append(doc)
+                    rows = self._add_outbox(outbox)
+                await self._persist(collection, 'insert', doc, rows)
+            return InsertResult('test-id')
+
+    async def ingest_orders(self, entries):
+        """
+        Check and insert every key and queue entry under one acquisition of
+        the queue lock. The batch's WAL records are appended before the
+        lock is released, so log order matches apply order; the fsync is
+        awaited after.
+        """
+        results, logged = [], []
+        async with self._collection_lock('orders_queue'):
+            now = time.time()
+            for key_doc, queue_doc, outbox_rows in entries:
+                key = key_doc['key']
+                existing = self.idempotency_keys.get(key)
+                if existing is not None:
+                    results.append(existing)
+                    continue
+                key_doc = {**key_doc, 'inserted_at': now}
+                self.idempotency_keys[key] = key_doc
+                self._idempotency_expiry.append((now, key, key_doc))
+                self.orders_queue.append(queue_doc)
+                rows = self._add_outbox(outbox_rows)
+                results.append(None)
+                if self.persistence is not None:
+                    logged.append(self.persistence.log('idempotency_keys', 'insert', key_doc))
+                    logged.append(self.persistence.log('orders_queue', 'insert', queue_doc))
+                    logged.extend(self.persistence.log('outbox', 'insert', row) for row in rows)
+        if logged:
+            await asyncio.gather(*logged)
+        return results
+
+    async def complete_orders(self, entries, worker_id=None):
+        """
+        Record every completion under one acquisition of the queue and
+        event log locks, so no claim can change between checking an
+        entry's holder and marking it processed. As in `ingest_orders`,
+        the WAL records are appended before the locks are released and
+        the fsync is awaited after.
+        """
+        logged = []
+        skipped = []
+        async with self._collection_lock('orders_queue'), self._collection_lock('order_events'):
+            for order_doc, event_doc, outbox_rows in entries:
+                order_id = order_doc['order_id']
+                if worker_id is not None and self.orders_queue.claimed_by(order_id) != worker_id:
+                    skipped.append(order_id)
+                    continue
+                self._set_order_fields(order_id, order_doc)
+                self.orders_queue.update(order_id, {'processed': True})
+                self.order_events.append(event_doc)
+                rows = self._add_outbox(outbox_rows)
+                if self.persistence is not None:
+                    logged.append(self.persistence.log('orders', 'update', {'order_id': order_id, '$set': order_doc}))
+                    logged.append(self.persistence.log(
+                        'orders_queue', 'update', {'order_id': order_id, '$set': {'processed': True}}))
+                    logged.append(self.persistence.log('order_events', 'insert', event_doc))
+                    logged.extend(self.persistence.log('outbox', 'insert', row) for row in rows)
+        if logged:
+            await asyncio.gather(*logged)
+        return skipped
+
+    async def find_one(self, collection, query, projection=None):
+        if collection == 'idempotency_keys':
+            key = query.get('key')
+            return self.idempotency_keys.get(key)
+        elif collection == 'orders_queue':
+            if 'order_id' in query:
+                return self.orders_queue.get(query['order_id'])
+            if query.get('processed') is False:
+                # next_pending may drop stale FIFO entries, so it is a write
+                async with self._collection_lock(collection):
+                    return self.orders_queue.next_pending()
+            return None
+        elif collection == 'orders':
+            record = self.orders.get(query.get('order_id'))
+            return record.to_doc() if record is not None else None
+
+    async def claim_orders(self, worker_id, limit=1, lease_sec=None):
+        # Claims, delays and attempt counts are not logged: after a restart
+        # every unprocessed entry is pending again
+        async with self._collection_lock('orders_queue'):
+            return self.orders_queue.claim(worker_id, limit, lease_sec if lease_sec is not None else math.inf)
+
+    async def renew_leases(self, worker_id, order_ids, lease_sec=None):
+        async with self._collection_lock('orders_queue'):
+            return [order_id for order_id in order_ids
+                    if self.orders_queue.renew(order_id, worker_id,
+                                               lease_sec if lease_sec is not None else math.inf)]
+
+    async def release_order(self, order_id, worker_id, delay_sec=0.0):
+        async with self._collection_lock('orders_queue'):
+            return self.orders_queue.release(order_id, worker_id, delay_sec)
+
+    async def dead_letter_order(self, order_id, worker_id, error):
+        async with self._stripe_lock(order_id):
+            async with self._collection_lock('orders_queue'):
+                doc = self.orders_queue.get(order_id)
+                if doc is None or doc.get('processed') or self.orders_queue.claimed_by(order_id) != worker_id:
+                    return None
+                record = dead_letter_record(doc, error)
+                self.orders_queue.update(order_id, {'processed': True})
+                self.dead_letters[order_id] = record
+            if self.persistence is not None:
+                await asyncio.gather(
+                    self.persistence.log('orders_queue', 'update', {'order_id': order_id, '$set': {'processed': True}}),
+                    self.persistence.log('dead_letters', 'insert', record))
+        return record
+
+    async def find_dead_letters(self, limit):
+        return [dict(doc) for doc in itertools.islice(self.dead_letters.values(), limit)]
+
+    async def requeue_dead_letter(self, order_id):
+        async with self._stripe_lock(order_id):
+            async with self._collection_lock('orders_queue'):
+                record = self.dead_letters.pop(order_id, None)
+                if record is None:
+                    return None
+                doc = {**record['order'], 'status': 'pending', 'processed': False}
+                self.orders_queue.append(doc)
+            if self.persistence is not None:
+                await asyncio.gather(self.persistence.log('dead_letters', 'delete', {'order_id': order_id}),
+                                     self.persistence.log('orders_queue', 'insert', doc))
+        return doc
+
+    async def update_one(self, collection, query, update, upsert=False):
+        order_id = query.get('order_id')
+        if collection == 'orders':
+            async with self._stripe_lock(order_id):
+                if order_id in self.orders or upsert:
+                    self._set_order_fields(order_id, update.get('$set', {}))
+                    await self._persist(collection, 'update', {'order_id': order_id, **update})
+                    return UpdateResult(1)
+        elif collection == 'orders_queue':
+            async with self._stripe_lock(order_id):
+                async with self._collection_lock(collection):
+                    updated = self.orders_queue.update(order_id, update.get('$set', {}))
+                if updated:
+                    await self._persist(collection, 'update', {'order_id': order_id, **update})
+                    return UpdateResult(1)
+        return UpdateResult(0)
+
+    def _set_order_fields(self, order_id, fields):
+        """Create or update an order, keeping the indexes in step."""
+        record = self.orders.get(order_id)
+        if record is None:
+            record = self.orders[order_id] = OrderRecord(order_id)
+            old = None
+        else:
+            old = (record.customer_id, record.status, record.created_at_epoch)
+        record.update(fields)
+        self.indexes.reindex(order_id, old, (record.customer_id, record.status, record.created_at_epoch))
+        key = (record.created_at_epoch, order_id)
+        old_key = self._order_keys.get(order_id)
+        if key != old_key:
+            if old_key is not None:
+                del self._orders_by_time[bisect_left(self._orders_by_time, old_key)]
+            # Orders arrive roughly in created_at order, so this lands near the end
+            insort(self._orders_by_time, key)
+            self._order_keys[order_id] = key
+        old_status = old[1] if old is not None else None
+        if key != old_key or record.status != old_status:
+            if old_key is not None:
+                self._unindex_status(old_status, old_key)
+            insort(self._orders_by_status.setdefault(record.status, []), key)
+
+    def _unindex_status(self, status, key):
+        keys = self._orders_by_status[status]
+        del keys[bisect_left(keys, key)]
+        if not keys:
+            del self._orders_by_status[status]
+
+    async def find_orders_page(self, limit, after=None, before=None, status=None,
+                               created_from=None, created_to=None, descending=True):
+        # A status filter seeks in that status's own time index, so a rare
+        # status costs O(log n + page) like an unfiltered listing
+        index = self._orders_by_status.get(status, []) if status is not None else self._orders_by_time
+        lo = bisect_left(index, (created_from, '')) if created_from is not None else 0
+        hi = bisect_right(index, (created_to, '\uffff')) if created_to is not None else len(index)
+        cursor = before if before is not None else after
+        # Walk up the index for ascending listings, or for `before` pages of
+        # descending ones (and the mirror image otherwise)
+        upward = descending == (before is not None)
+        if upward:
+            start = max(bisect_right(index, cursor), lo) if cursor is not None else lo
+            positions = range(start, hi)
+        else:
+            start = min(bisect_left(index, cursor), hi) if cursor is not None else hi
+            positions = range(start - 1, lo - 1, -1)
+
+        page = []
+        has_more = False
+        for pos in positions:
+            if len(page) == limit:
+                has_more = True
+                break
+            page.append(self.orders[index[pos][1]].to_doc())
+        if before is not None:
+            page.reverse()
+        return page, has_more
+
+    async def search_orders(self, limit, customer_id=None, status=None, created_from=None,
+                            created_to=None, after=None, descending=True):
+        if customer_id is None and status is None and created_from is None and created_to is None:
+            return await self.find_orders_page(limit, after=after, descending=descending)
+        keys = []
+        for order_id in self.indexes.match(customer_id, status, created_from, created_to):
+            key = self._order_keys[order_id]
+            if created_from is not None and key[0] < created_from:
+                continue
+            if created_to is not None and key[0] > created_to:
+                continue
+            if after is not None and (key <= after if not descending else key >= after):
+                continue
+            keys.append(key)
+        # Only the page (plus one, to detect more) is sorted out of the matches
+        pick = heapq.nlargest if descending else heapq.nsmallest
+        page_keys = pick(limit + 1, keys)
+        page = [self.orders[order_id].to_doc() for _, order_id in page_keys[:limit]]
+        return page, len(page_keys) > limit
+
+    async def count_documents(self, collection, query=None):
+        if collection == 'orders':
+            if query:
+                return len(self.indexes.by_status.get(query.get('status'), ()))
+            return len(self.orders)
+        elif collection == 'orders_queue':
+            if query:
+                if query.get('processed'):
+                    return self.orders_queue.processed_count
+                return self.orders_queue.pending_count
+            return len(self.orders_queue)
+        elif collection == 'dead_letters':
+            return len(self.dead_letters)
+
+    async def aggregate(self, collection, pipeline):
+        if collection == 'orders':
+            # Simple aggregation for testing
+            if len(pipeline) >= 2 and pipeline[0].get('$match') and pipeline[1].get('$group'):
+                times = [r.processing_time_ms for r in self.orders.values() if r.processing_time_ms]
+                if times:
+                    return [{'avg': sum(times) / len(times), 'times': times}]
+        return []
+
+    async def to_list(self, collection, limit=None):
+        if collection == 'orders':
+            records = list(self.orders.values())
+            return [r.to_doc() for r in (records[-limit:] if limit else records)]
+        return []
+
+    async def outbox_pending(self, limit):
+        return self.outbox.pending(limit)
+
+    async def outbox_mark_delivered(self, seqs):
+        async with self._collection_lock('outbox'):
+            self.outbox.mark_delivered(seqs)
+        await self._persist('outbox', 'delivered', {'seqs': list(seqs)})
+
+    async def outbox_mark_failed(self, seqs):
+        # Attempt counts are diagnostics only and are not logged
+        self.outbox.mark_failed(seqs)
+
+    async def outbox_stats(self):
+        oldest = self.outbox.oldest_pending_at()
+        return {
+            "pending": self.outbox.pending_count,
+            "oldest_pending_age_sec": time.time() - oldest if oldest is not None else 0.0,
+        }
+
+    @property
+    def stats(self):
+        return {"backend": self.name, "indexes": self.indexes.stats}
+
+    async def compact(self, policy, budget, now=None):
+        """
+        Apply one bounded step of retention: remove at most `budget`
+        entries from each collection. Returns the number removed per
+        collection; the caller repeats while anything was removed. The
+        removals are logged as `delete` records, so replaying the WAL does
+        not bring removed entries back before the next snapshot.
+        """
+        now = now if now is not None else time.time()
+        removed = {'idempotency_keys': 0, 'orders_queue': 0, 'order_events': 0, 'outbox': 0}
+        logged = []
+
+        def log(collection, payload):
+            if self.persistence is not None:
+                logged.append(self.persistence.log(collection, 'delete', payload))
+
+        if policy.idempotency_ttl_sec:
+            async with self._collection_lock('idempotency_keys'):
+                cutoff = now - policy.idempotency_ttl_sec
+                expiry = self._idempotency_expiry
+                while expiry and removed['idempotency_keys'] < budget and expiry[0][0] <= cutoff:
+                    _, key, doc = expiry.popleft()
+                    # Skip keys that were re-inserted since
+                    if self.idempotency_keys.get(key) is doc:
+                        del self.idempotency_keys[key]
+                        removed['idempotency_keys'] += 1
+                        log('idempotency_keys', {'key': key})
+
+        if policy.queue_retention_sec:
+            async with self._collection_lock('orders_queue'):
+                order_ids = self.orders_queue.remove_processed(now - policy.queue_retention_sec, budget)
+                removed['orders_queue'] = len(order_ids)
+                for order_id in order_ids:
+                    log('orders_queue', {'order_id': order_id})
+
+        async with self._collection_lock('order_events'):
+            events = self.order_events
+            cutoff = now - policy.events_max_age_sec
+            while events and removed['order_events'] < budget:
+                over_cap = policy.events_max_count and len(events) > policy.events_max_count
+                expired = (policy.events_max_age_sec and
+                           datetime.fromisoformat(events[0]['timestamp']).timestamp() <= cutoff)
+                if not (over_cap or expired):
+                    break
+                events.popleft()
+                removed['order_events'] += 1
+            if removed['order_events']:
+                log('order_events', {'count': removed['order_events']})
+
+        async with self._collection_lock('outbox'):
+            removed['outbox'] = self.outbox.remove_delivered(budget)
+            if removed['outbox']:
+                log('outbox', {'count': removed['outbox']})
+
+        if logged:
+            await asyncio.gather(*logged)
+        return removed
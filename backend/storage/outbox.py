@@ -0,0 +1,113 @@
+"""
+Transactional Outbox
+Kafka messages recorded alongside the write that produced them, drained
+by OutboxRelay. Rows are delivered in sequence order and stay in the
+outbox until delivered, so a broker outage turns into a backlog rather
+than lost events.
+"""
+
+import time
+from collections import deque
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional
+
+import codec
+
+
+def outbox_message(topic: str, key: Optional[str], value: Dict[str, Any],
+                   headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    An outbox row for `value`, encoded now so later changes to the
+    (shared) document cannot alter the message.
+    """
+    return {
+        'topic': topic,
+        'key': key,
+        'value': codec.dumps_str(value),
+        'headers': headers,
+        'created_at': time.time(),
+        'attempts': 0,
+        'delivered': False,
+    }
+
+
+class Outbox:
+    """
+    In-memory outbox: rows by sequence number plus a FIFO of the
+    undelivered ones. Rows delivered out of order are skipped lazily;
+    delivered rows are dropped by `remove_delivered`.
+    """
+
+    def __init__(self):
+        self.seq = 0
+        self._rows: Dict[int, Dict[str, Any]] = {}
+        self._pending: deque = deque()
+        self._pending_count = 0
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self):
+        return iter(self._rows.values())
+
+    @property
+    def pending_count(self) -> int:
+        return self._pending_count
+
+    def add(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Append a row, assigning its sequence number (kept if already set)."""
+        if 'seq' not in row:
+            self.seq += 1
+            row['seq'] = self.seq
+        else:
+            self.seq = max(self.seq, row['seq'])
+        self._rows[row['seq']] = row
+        if not row.get('delivered'):
+            self._pending.append(row['seq'])
+            self._pending_count += 1
+        return row
+
+    def _trim(self):
+        pending, rows = self._pending, self._rows
+        while pending and (pending[0] not in rows or rows[pending[0]]['delivered']):
+            pending.popleft()
+
+    def pending(self, limit: int) -> List[Dict[str, Any]]:
+        """The oldest `limit` undelivered rows, in sequence order."""
+        self._trim()
+        rows = self._rows
+        undelivered = (rows[seq] for seq in self._pending if not rows[seq]['delivered'])
+        return list(islice(undelivered, limit))
+
+    def oldest_pending_at(self) -> Optional[float]:
+        self._trim()
+        return self._rows[self._pending[0]]['created_at'] if self._pending else None
+
+    def mark_delivered(self, seqs: Iterable[int]) -> int:
+        marked = 0
+        for seq in seqs:
+            row = self._rows.get(seq)
+            if row is not None and not row['delivered']:
+                row['delivered'] = True
+                marked += 1
+        self._pending_count -= marked
+        self._trim()
+        return marked
+
+    def mark_failed(self, seqs: Iterable[int]):
+        for seq in seqs:
+            row = self._rows.get(seq)
+            if row is not None:
+                row['attempts'] += 1
+
+    def remove_delivered(self, limit: int) -> int:
+        """Drop up to `limit` delivered rows from the head of the outbox."""
+        removed = 0
+        rows = self._rows
+        while rows and removed < limit:
+            seq = next(iter(rows))
+            if not rows[seq]['delivered']:
+                break
+            del rows[seq]
+            removed += 1
+        return removed
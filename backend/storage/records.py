@@ -0,0 +1,132 @@
+"""
+Compact Order Records
+Slotted in-memory representation of an order for the in-memory backend.
+Compared to a plain document dict it drops the per-order key table,
+stores timestamps as integer epoch microseconds instead of ISO strings,
+keeps line items as tuples and interns the strings that repeat across
+orders (status, product ids and names). Documents are rebuilt only when
+a record leaves the store.
+"""
+
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# (product_id, name, quantity, price)
+ItemTuple = Tuple[str, str, int, float]
+
+
+def to_epoch_us(value) -> Optional[int]:
+    """ISO string or datetime -> integer microseconds since the epoch."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    delta = value - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def from_epoch_us(value: Optional[int]) -> Optional[str]:
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value // 1_000_000, timezone.utc).replace(
+        microsecond=value % 1_000_000).isoformat()
+
+
+def _pack_item(item) -> ItemTuple:
+    if isinstance(item, tuple):
+        return item
+    if not isinstance(item, dict):
+        item = item.model_dump()
+    return (sys.intern(item['product_id']), sys.intern(item['name']),
+            item['quantity'], item['price'])
+
+
+class OrderRecord:
+    """
+    One stored order. Fields outside the Order schema are kept in
+    `extras`, which stays None for ordinary orders. The queue's
+    `processed` flag and `attempts` count are bookkeeping, not order
+    data, and are dropped.
+    """
+
+    __slots__ = (
+        'order_id', 'customer_id', 'customer_name', 'items',
+        'subtotal', 'tax', 'total', 'status', 'idempotency_key',
+        'created_at_us', 'updated_at_us', 'processing_time_ms', 'extras',
+    )
+
+    _TIMESTAMPS = {'created_at': 'created_at_us', 'updated_at': 'updated_at_us'}
+    _PLAIN = frozenset(('customer_id', 'customer_name', 'subtotal', 'tax', 'total',
+                        'idempotency_key', 'processing_time_ms'))
+    _SKIPPED = frozenset(('order_id', 'processed', 'attempts'))
+
+    def __init__(self, order_id: str):
+        self.order_id = order_id
+        self.customer_id = None
+        self.customer_name = None
+        self.items: Tuple[ItemTuple, ...] = ()
+        self.subtotal = None
+        self.tax = None
+        self.total = None
+        self.status = None
+        self.idempotency_key = None
+        self.created_at_us = None
+        self.updated_at_us = None
+        self.processing_time_ms = None
+        self.extras = None
+
+    @classmethod
+    def from_doc(cls, doc: Dict[str, Any]) -> 'OrderRecord':
+        record = cls(doc['order_id'])
+        record.update(doc)
+        return record
+
+    def update(self, fields: Dict[str, Any]):
+        """Apply a `$set` style update."""
+        for field, value in fields.items():
+            if field in self._PLAIN:
+                setattr(self, field, value)
+            elif field == 'status':
+                self.status = sys.intern(value) if isinstance(value, str) else value
+            elif field in self._TIMESTAMPS:
+                setattr(self, self._TIMESTAMPS[field], to_epoch_us(value))
+            elif field == 'items':
+                self.items = tuple(_pack_item(item) for item in value)
+            elif field in self._SKIPPED:
+                continue
+            else:
+                if self.extras is None:
+                    self.extras = {}
+                self.extras[field] = value
+
+    @property
+    def created_at_epoch(self) -> float:
+        return self.created_at_us / 1_000_000 if self.created_at_us is not None else 0.0
+
+    def to_doc(self) -> Dict[str, Any]:
+        """Rebuild the document form (ISO timestamps, item dicts)."""
+        doc = {
+            'order_id': self.order_id,
+            'customer_id': self.customer_id,
+            'customer_name': self.customer_name,
+            'items': [
+                {'product_id': p, 'name': n, 'quantity': q, 'price': pr}
+                for p, n, q, pr in self.items
+            ],
+            'subtotal': self.subtotal,
+            'tax': self.tax,
+            'total': self.total,
+            'status': self.status,
+            'idempotency_key': self.idempotency_key,
+            'created_at': from_epoch_us(self.created_at_us),
+            'updated_at': from_epoch_us(self.updated_at_us),
+            'processing_time_ms': self.processing_time_ms,
+        }
+        if self.extras:
+            doc.update(self.extras)
+        return doc
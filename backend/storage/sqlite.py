@@ -0,0 +1,665 @@
+"""
+SQLite Storage Backend
+Disk-backed, indexed store built on the standard library's sqlite3:
+  * WAL journal mode, so readers never block the writer;
+  * one writer thread that commits every write issued in the same event
+    loop tick as a single transaction (each write isolated by a savepoint);
+  * a small pool of reader threads, each with its own connection;
+  * constant SQL text everywhere, so sqlite3's per-connection statement
+    cache reuses the prepared statements.
+All blocking calls run in executors; the event loop never waits on disk.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .base import InsertResult, StorageBackend, UpdateResult, dead_letter_record, order_sort_key
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,
+    order_id TEXT,
+    inserted_at REAL NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS orders_queue (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id TEXT NOT NULL UNIQUE,
+    processed INTEGER NOT NULL DEFAULT 0,
+    processed_at REAL,
+    claimed_by TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL DEFAULT 0,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS orders (
+    order_id TEXT PRIMARY KEY,
+    status TEXT,
+    created_ts REAL NOT NULL DEFAULT 0,
+    processing_time_ms REAL,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS order_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id TEXT,
+    ts REAL,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    topic TEXT NOT NULL,
+    key TEXT,
+    value TEXT NOT NULL,
+    headers TEXT,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    delivered INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS dead_letters (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id TEXT NOT NULL UNIQUE,
+    doc TEXT NOT NULL
+);
+"""
+
+# Queue columns added after the first release, with their definitions
+QUEUE_COLUMNS = {
+    'claimed_by': "TEXT",
+    'lease_until': "REAL",
+    'attempts': "INTEGER NOT NULL DEFAULT 0",
+    'available_at': "REAL NOT NULL DEFAULT 0",
+}
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_idempotency_inserted_at ON idempotency_keys (inserted_at);
+CREATE INDEX IF NOT EXISTS idx_queue_pending ON orders_queue (processed, seq);
+CREATE INDEX IF NOT EXISTS idx_queue_processed_at ON orders_queue (processed_at) WHERE processed = 1;
+CREATE INDEX IF NOT EXISTS idx_orders_created ON orders (created_ts, order_id);
+CREATE INDEX IF NOT EXISTS idx_orders_status_created ON orders (status, created_ts, order_id);
+CREATE INDEX IF NOT EXISTS idx_orders_customer_created
+    ON orders (json_extract(doc, '$.customer_id'), created_ts, order_id);
+CREATE INDEX IF NOT EXISTS idx_orders_processing_time ON orders (processing_time_ms)
+    WHERE processing_time_ms IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_events_order_id ON order_events (order_id);
+CREATE INDEX IF NOT EXISTS idx_events_ts ON order_events (ts);
+CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox (seq) WHERE delivered = 0;
+"""
+
+
+def _dumps(doc: Dict[str, Any]) -> str:
+    return json.dumps(doc, separators=(',', ':'), default=str)
+
+
+def _epoch(value) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        return None
+
+
+class SQLiteDB(StorageBackend):
+    """
+    SQLite-backed store. Documents are kept as JSON text next to the
+    columns the service filters on, which carry the indexes.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str = "swiftcart.db", reader_threads: int = 4,
+                 synchronous: str = "NORMAL"):
+        self.path = path
+        self.synchronous = synchronous
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite-writer')
+        self._readers = ThreadPoolExecutor(max_workers=reader_threads, thread_name_prefix='sqlite-reader')
+        self._local = threading.local()
+        self._write_conn: Optional[sqlite3.Connection] = None
+        self._pending: List[Tuple[Callable, tuple, asyncio.Future]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.batched_writes = 0
+
+    # ─── Connections ─────────────────────────────────────────
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False,
+                               cached_statements=256)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def _reader_conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        self._write_conn = await loop.run_in_executor(self._writer, self._connect)
+        await loop.run_in_executor(self._writer, self._write_conn.executescript, SCHEMA)
+        await loop.run_in_executor(self._writer, self._migrate, self._write_conn)
+        logger.info(f"SQLite store opened at {self.path}")
+
+    @staticmethod
+    def _migrate(conn):
+        """Bring a database file created by an older version up to SCHEMA."""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(orders_queue)")}
+        for column, definition in QUEUE_COLUMNS.items():
+            if column not in columns:
+                conn.execute(f"ALTER TABLE orders_queue ADD COLUMN {column} {definition}")
+        # Claims belong to workers of a previous run; hand their orders out again
+        conn.execute("UPDATE orders_queue SET claimed_by = NULL, lease_until = NULL "
+                     "WHERE processed = 0 AND claimed_by IS NOT NULL")
+
+    async def ensure_indexes(self):
+        await asyncio.get_running_loop().run_in_executor(
+            self._writer, self._write_conn.executescript, INDEXES)
+
+    async def close(self):
+        await self._flush()
+        if self._write_conn is not None:
+            await asyncio.get_running_loop().run_in_executor(self._writer, self._write_conn.close)
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+
+    # ─── Batched writes ──────────────────────────────────────
+
+    async def _write(self, fn: Callable, *args):
+        """Queue a write; it commits with every other write from this loop tick."""
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+        self._pending.append((fn, args, done))
+        if self._flush_task is None:
+            self._flush_task = loop.create_task(self._flush_soon())
+        return await done
+
+    async def _flush_soon(self):
+        await asyncio.sleep(0)
+        self._flush_task = None
+        await self._flush()
+
+    async def _flush(self):
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        results = await asyncio.get_running_loop().run_in_executor(
+            self._writer, self._run_batch, [(fn, args) for fn, args, _ in batch])
+        self.batches += 1
+        self.batched_writes += len(batch)
+        for (_, _, done), (ok, value) in zip(batch, results):
+            if done.done():
+                continue
+            if ok:
+                done.set_result(value)
+            else:
+                done.set_exception(value)
+
+    def _run_batch(self, ops):
+        conn = self._write_conn
+        results = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for fn, args in ops:
+                conn.execute("SAVEPOINT op")
+                try:
+                    results.append((True, fn(conn, *args)))
+                    conn.execute("RELEASE op")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO op")
+                    conn.execute("RELEASE op")
+                    results.append((False, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            conn.execute("ROLLBACK")
+            return [(False, e)] * len(ops)
+        return results
+
+    async def _read(self, fn: Callable, *args):
+        def run():
+            return fn(self._reader_conn(), *args)
+        return await asyncio.get_running_loop().run_in_executor(self._readers, run)
+
+    # ─── Statement bodies (run on executor threads) ──────────
+
+    @staticmethod
+    def _insert_idempotency_key(conn, doc):
+        conn.execute(
+            "INSERT OR REPLACE INTO idempotency_keys (key, order_id, inserted_at, doc) VALUES (?, ?, ?, ?)",
+            (doc['key'], doc.get('order_id'), time.time(), _dumps(doc)))
+
+    @staticmethod
+    def _insert_queue(conn, doc):
+        processed = 1 if doc.get('processed') else 0
+        conn.execute(
+            "INSERT OR REPLACE INTO orders_queue (order_id, processed, processed_at, doc) VALUES (?, ?, ?, ?)",
+            (doc['order_id'], processed, time.time() if processed else None, _dumps(doc)))
+
+    @staticmethod
+    def _insert_outbox(conn, rows):
+        conn.executemany(
+            "INSERT INTO outbox (topic, key, value, headers, created_at) VALUES (?, ?, ?, ?, ?)",
+            [(row['topic'], row['key'], row['value'],
+              json.dumps(row['headers']) if row.get('headers') else None, row['created_at'])
+             for row in rows])
+
+    @staticmethod
+    def _insert_with_outbox(conn, insert, doc, rows):
+        insert(conn, doc)
+        if rows:
+            SQLiteDB._insert_outbox(conn, rows)
+
+    @staticmethod
+    def _ingest_orders(conn, entries):
+        results = []
+        for key_doc, queue_doc, outbox_rows in entries:
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO idempotency_keys (key, order_id, inserted_at, doc) VALUES (?, ?, ?, ?)",
+                (key_doc['key'], key_doc.get('order_id'), time.time(), _dumps(key_doc))).rowcount
+            if not inserted:
+                row = conn.execute("SELECT doc FROM idempotency_keys WHERE key = ?", (key_doc['key'],)).fetchone()
+                results.append(json.loads(row[0]))
+                continue
+            SQLiteDB._insert_queue(conn, queue_doc)
+            if outbox_rows:
+                SQLiteDB._insert_outbox(conn, outbox_rows)
+            results.append(None)
+        return results
+
+    @staticmethod
+    def _complete_orders(conn, entries, worker_id):
+        skipped = []
+        for order_doc, event_doc, outbox_rows in entries:
+            order_id = order_doc['order_id']
+            # Checked in the same transaction as the writes, on the single
+            # writer connection, so no claim can slip in between
+            if worker_id is not None and conn.execute(
+                    "SELECT 1 FROM orders_queue WHERE order_id = ? AND processed = 0 AND claimed_by = ?",
+                    (order_id, worker_id)).fetchone() is None:
+                skipped.append(order_id)
+                continue
+            SQLiteDB._update_order(conn, order_id, order_doc, True)
+            SQLiteDB._update_queue(conn, order_id, {'processed': True})
+            SQLiteDB._insert_event(conn, event_doc)
+            if outbox_rows:
+                SQLiteDB._insert_outbox(conn, outbox_rows)
+        return skipped
+
+    @staticmethod
+    def _insert_event(conn, doc):
+        conn.execute(
+            "INSERT INTO order_events (order_id, ts, doc) VALUES (?, ?, ?)",
+            (doc.get('order_id'), _epoch(doc.get('timestamp')) or time.time(), _dumps(doc)))
+
+    @staticmethod
+    def _update_queue(conn, order_id, fields):
+        row = conn.execute("SELECT doc, processed FROM orders_queue WHERE order_id = ?", (order_id,)).fetchone()
+        if row is None:
+            return 0
+        doc = json.loads(row[0])
+        doc.update(fields)
+        processed = 1 if doc.get('processed') else 0
+        conn.execute(
+            "UPDATE orders_queue SET processed = ?, "
+            "processed_at = CASE WHEN ? = 1 AND processed = 0 THEN ? ELSE processed_at END, "
+            "doc = ? WHERE order_id = ?",
+            (processed, processed, time.time(), _dumps(doc), order_id))
+        return 1
+
+    @staticmethod
+    def _claim_queue(conn, worker_id, limit, lease_sec):
+        now = time.time()
+        # An expired lease (lease_until is NULL when there is none) is claimable again
+        rows = conn.execute(
+            "UPDATE orders_queue SET claimed_by = ?, lease_until = ?, attempts = attempts + 1 WHERE seq IN "
+            "(SELECT seq FROM orders_queue WHERE processed = 0 AND available_at <= ? "
+            "AND (claimed_by IS NULL OR lease_until <= ?) ORDER BY seq LIMIT ?) "
+            "RETURNING seq, attempts, doc",
+            (worker_id, now + lease_sec if lease_sec is not None else None, now, now, limit)).fetchall()
+        claimed = []
+        for _, attempts, doc in sorted(rows):
+            doc = json.loads(doc)
+            doc['attempts'] = attempts
+            claimed.append(doc)
+        return claimed
+
+    @staticmethod
+    def _renew_leases(conn, worker_id, order_ids, lease_sec):
+        lease_until = time.time() + lease_sec if lease_sec is not None else None
+        changes = conn.total_changes
+        conn.executemany(
+            "UPDATE orders_queue SET lease_until = ? WHERE order_id = ? AND processed = 0 AND claimed_by = ?",
+            [(lease_until, order_id, worker_id) for order_id in order_ids])
+        if conn.total_changes - changes == len(order_ids):
+            return list(order_ids)
+        # Some were lost to another worker or completed: find which are still held
+        return [order_id for order_id in order_ids if conn.execute(
+            "SELECT 1 FROM orders_queue WHERE order_id = ? AND processed = 0 AND claimed_by = ?",
+            (order_id, worker_id)).fetchone() is not None]
+
+    @staticmethod
+    def _release_queue(conn, order_id, worker_id, delay_sec):
+        return conn.execute(
+            "UPDATE orders_queue SET claimed_by = NULL, lease_until = NULL, available_at = ? "
+            "WHERE order_id = ? AND processed = 0 AND claimed_by = ?",
+            (time.time() + delay_sec, order_id, worker_id)).rowcount > 0
+
+    @staticmethod
+    def _dead_letter(conn, order_id, worker_id, error):
+        row = conn.execute("SELECT doc, attempts FROM orders_queue "
+                           "WHERE order_id = ? AND processed = 0 AND claimed_by = ?",
+                           (order_id, worker_id)).fetchone()
+        if row is None:
+            return None
+        record = dead_letter_record({**json.loads(row[0]), 'attempts': row[1]}, error)
+        SQLiteDB._update_queue(conn, order_id, {'processed': True})
+        conn.execute("INSERT OR REPLACE INTO dead_letters (order_id, doc) VALUES (?, ?)",
+                     (order_id, _dumps(record)))
+        return record
+
+    @staticmethod
+    def _requeue_dead_letter(conn, order_id):
+        row = conn.execute("SELECT doc FROM dead_letters WHERE order_id = ?", (order_id,)).fetchone()
+        if row is None:
+            return None
+        conn.execute("DELETE FROM dead_letters WHERE order_id = ?", (order_id,))
+        # Replacing the queue row resets its attempts and moves it to the back
+        doc = {**json.loads(row[0])['order'], 'status': 'pending', 'processed': False}
+        SQLiteDB._insert_queue(conn, doc)
+        return doc
+
+    @staticmethod
+    def _update_order(conn, order_id, fields, upsert):
+        row = conn.execute("SELECT doc FROM orders WHERE order_id = ?", (order_id,)).fetchone()
+        if row is None and not upsert:
+            return 0
+        doc = json.loads(row[0]) if row is not None else {}
+        doc.update(fields)
+        doc.pop('processed', None)  # queue bookkeeping, not order data
+        doc.pop('attempts', None)
+        created_ts, _ = order_sort_key({'order_id': order_id, **doc})
+        conn.execute(
+            "INSERT OR REPLACE INTO orders (order_id, status, created_ts, processing_time_ms, doc) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (order_id, doc.get('status'), created_ts, doc.get('processing_time_ms'), _dumps(doc)))
+        return 1
+
+    @staticmethod
+    def _fetch_doc(conn, sql, params):
+        row = conn.execute(sql, params).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    @staticmethod
+    def _fetch_row(conn, sql, params):
+        return conn.execute(sql, params).fetchone()
+
+    @staticmethod
+    def _fetch_scalar(conn, sql, params):
+        return conn.execute(sql, params).fetchone()[0]
+
+    @staticmethod
+    def _fetch_docs(conn, sql, params):
+        return [json.loads(row[0]) for row in conn.execute(sql, params)]
+
+    @staticmethod
+    def _fetch_times(conn):
+        return [row[0] for row in conn.execute(
+            "SELECT processing_time_ms FROM orders WHERE processing_time_ms IS NOT NULL")]
+
+    # ─── StorageBackend API ──────────────────────────────────
+
+    async def insert_one(self, collection, doc, outbox=None):
+        # The outbox rows share the document's savepoint, so both or neither land
+        if collection == 'idempotency_keys':
+            await self._write(self._insert_with_outbox, self._insert_idempotency_key, doc, outbox)
+            return InsertResult(doc.get('_id', doc['key']))
+        elif collection == 'orders_queue':
+            await self._write(self._insert_with_outbox, self._insert_queue, doc, outbox)
+            return InsertResult(doc['order_id'])
+        elif collection == 'order_events':
+            await self._write(self._insert_with_outbox, self._insert_event, doc, outbox)
+            return InsertResult(doc.get('event_id'))
+
+    async def ingest_orders(self, entries):
+        # One queued write, so the whole batch commits in a single transaction
+        return await self._write(self._ingest_orders, entries)
+
+    async def complete_orders(self, entries, worker_id=None):
+        # One queued write, so the whole batch commits in a single transaction
+        return await self._write(self._complete_orders, entries, worker_id)
+
+    async def find_one(self, collection, query, projection=None):
+        if collection == 'idempotency_keys':
+            return await self._read(self._fetch_doc,
+                                    "SELECT doc FROM idempotency_keys WHERE key = ?", (query.get('key'),))
+        elif collection == 'orders_queue':
+            if 'order_id' in query:
+                return await self._read(self._fetch_doc,
+                                        "SELECT doc FROM orders_queue WHERE order_id = ?", (query['order_id'],))
+            if query.get('processed') is False:
+                now = time.time()
+                return await self._read(self._fetch_doc,
+                                        "SELECT doc FROM orders_queue WHERE processed = 0 AND available_at <= ? "
+                                        "AND (claimed_by IS NULL OR lease_until <= ?) ORDER BY seq LIMIT 1",
+                                        (now, now))
+            return None
+        elif collection == 'orders':
+            return await self._read(self._fetch_doc,
+                                    "SELECT doc FROM orders WHERE order_id = ?", (query.get('order_id'),))
+
+    async def claim_orders(self, worker_id, limit=1, lease_sec=None):
+        # Runs on the single writer connection, so concurrent claims never overlap
+        return await self._write(self._claim_queue, worker_id, limit, lease_sec)
+
+    async def renew_leases(self, worker_id, order_ids, lease_sec=None):
+        if not order_ids:
+            return []
+        return await self._write(self._renew_leases, worker_id, order_ids, lease_sec)
+
+    async def release_order(self, order_id, worker_id, delay_sec=0.0):
+        return await self._write(self._release_queue, order_id, worker_id, delay_sec)
+
+    async def dead_letter_order(self, order_id, worker_id, error):
+        return await self._write(self._dead_letter, order_id, worker_id, error)
+
+    async def find_dead_letters(self, limit):
+        return await self._read(self._fetch_docs, "SELECT doc FROM dead_letters ORDER BY seq LIMIT ?", (limit,))
+
+    async def requeue_dead_letter(self, order_id):
+        return await self._write(self._requeue_dead_letter, order_id)
+
+    async def update_one(self, collection, query, update, upsert=False):
+        order_id = query.get('order_id')
+        fields = update.get('$set', {})
+        if collection == 'orders':
+            return UpdateResult(await self._write(self._update_order, order_id, fields, upsert))
+        elif collection == 'orders_queue':
+            return UpdateResult(await self._write(self._update_queue, order_id, fields))
+        return UpdateResult(0)
+
+    async def count_documents(self, collection, query=None):
+        if collection == 'orders':
+            if query:
+                return await self._read(self._fetch_scalar,
+                                        "SELECT COUNT(*) FROM orders WHERE status = ?", (query.get('status'),))
+            return await self._read(self._fetch_scalar, "SELECT COUNT(*) FROM orders", ())
+        elif collection == 'orders_queue':
+            if query:
+                processed = 1 if query.get('processed') else 0
+                return await self._read(self._fetch_scalar,
+                                        "SELECT COUNT(*) FROM orders_queue WHERE processed = ?", (processed,))
+            return await self._read(self._fetch_scalar, "SELECT COUNT(*) FROM orders_queue", ())
+        elif collection == 'dead_letters':
+            return await self._read(self._fetch_scalar, "SELECT COUNT(*) FROM dead_letters", ())
+
+    async def aggregate(self, collection, pipeline):
+        if collection == 'orders':
+            # Same simplified $match/$group support as the in-memory store
+            if len(pipeline) >= 2 and pipeline[0].get('$match') and pipeline[1].get('$group'):
+                times = await self._read(self._fetch_times)
+                if times:
+                    return [{'avg': sum(times) / len(times), 'times': times}]
+        return []
+
+    async def to_list(self, collection, limit=None):
+        if collection == 'orders':
+            if limit:
+                return await self._read(
+                    self._fetch_docs,
+                    "SELECT doc FROM (SELECT rowid, doc FROM orders ORDER BY rowid DESC LIMIT ?) ORDER BY rowid",
+                    (limit,))
+            return await self._read(self._fetch_docs, "SELECT doc FROM orders ORDER BY rowid", ())
+        return []
+
+    async def find_orders_page(self, limit, after=None, before=None, status=None,
+                               created_from=None, created_to=None, descending=True):
+        cursor = before if before is not None else after
+        upward = descending == (before is not None)
+        # Built from a fixed set of fragments, so each shape is a cached statement
+        where, params = [], []
+        if status is not None:
+            where.append("status = ?")
+            params.append(status)
+        if created_from is not None:
+            where.append("created_ts >= ?")
+            params.append(created_from)
+        if created_to is not None:
+            where.append("created_ts <= ?")
+            params.append(created_to)
+        if cursor is not None:
+            where.append("(created_ts, order_id) > (?, ?)" if upward else "(created_ts, order_id) < (?, ?)")
+            params.extend(cursor)
+        direction = "ASC" if upward else "DESC"
+        sql = (
+            "SELECT doc FROM orders"
+            + (" WHERE " + " AND ".join(where) if where else "")
+            + f" ORDER BY created_ts {direction}, order_id {direction} LIMIT ?"
+        )
+        docs = await self._read(self._fetch_docs, sql, (*params, limit + 1))
+        has_more = len(docs) > limit
+        page = docs[:limit]
+        if before is not None:
+            page.reverse()
+        return page, has_more
+
+    async def search_orders(self, limit, customer_id=None, status=None, created_from=None,
+                            created_to=None, after=None, descending=True):
+        where, params = [], []
+        if customer_id is not None:
+            # Same expression as idx_orders_customer_created, so the index applies
+            where.append("json_extract(doc, '$.customer_id') = ?")
+            params.append(customer_id)
+        if status is not None:
+            where.append("status = ?")
+            params.append(status)
+        if created_from is not None:
+            where.append("created_ts >= ?")
+            params.append(created_from)
+        if created_to is not None:
+            where.append("created_ts <= ?")
+            params.append(created_to)
+        if after is not None:
+            where.append("(created_ts, order_id) < (?, ?)" if descending else "(created_ts, order_id) > (?, ?)")
+            params.extend(after)
+        direction = "DESC" if descending else "ASC"
+        sql = (
+            "SELECT doc FROM orders"
+            + (" WHERE " + " AND ".join(where) if where else "")
+            + f" ORDER BY created_ts {direction}, order_id {direction} LIMIT ?"
+        )
+        docs = await self._read(self._fetch_docs, sql, (*params, limit + 1))
+        return docs[:limit], len(docs) > limit
+
+    # ─── Outbox ──────────────────────────────────────────────
+
+    @staticmethod
+    def _fetch_outbox(conn, limit):
+        return [
+            {'seq': seq, 'topic': topic, 'key': key, 'value': value,
+             'headers': json.loads(headers) if headers else None,
+             'created_at': created_at, 'attempts': attempts, 'delivered': False}
+            for seq, topic, key, value, headers, created_at, attempts in conn.execute(
+                "SELECT seq, topic, key, value, headers, created_at, attempts FROM outbox "
+                "WHERE delivered = 0 ORDER BY seq LIMIT ?", (limit,))
+        ]
+
+    @staticmethod
+    def _mark_outbox(conn, sql, seqs):
+        conn.executemany(sql, [(seq,) for seq in seqs])
+
+    async def outbox_pending(self, limit):
+        return await self._read(self._fetch_outbox, limit)
+
+    async def outbox_mark_delivered(self, seqs):
+        await self._write(self._mark_outbox, "UPDATE outbox SET delivered = 1 WHERE seq = ?", seqs)
+
+    async def outbox_mark_failed(self, seqs):
+        await self._write(self._mark_outbox, "UPDATE outbox SET attempts = attempts + 1 WHERE seq = ?", seqs)
+
+    async def outbox_stats(self):
+        pending, oldest = await self._read(
+            self._fetch_row, "SELECT COUNT(*), MIN(created_at) FROM outbox WHERE delivered = 0", ())
+        return {
+            "pending": pending,
+            "oldest_pending_age_sec": time.time() - oldest if oldest is not None else 0.0,
+        }
+
+    # ─── Retention ───────────────────────────────────────────
+
+    @staticmethod
+    def _compact(conn, policy, budget, now):
+        removed = {'idempotency_keys': 0, 'orders_queue': 0, 'order_events': 0}
+        removed['outbox'] = conn.execute(
+            "DELETE FROM outbox WHERE seq IN (SELECT seq FROM outbox WHERE delivered = 1 LIMIT ?)",
+            (budget,)).rowcount
+        if policy.idempotency_ttl_sec:
+            removed['idempotency_keys'] = conn.execute(
+                "DELETE FROM idempotency_keys WHERE key IN "
+                "(SELECT key FROM idempotency_keys WHERE inserted_at <= ? LIMIT ?)",
+                (now - policy.idempotency_ttl_sec, budget)).rowcount
+        if policy.queue_retention_sec:
+            removed['orders_queue'] = conn.execute(
+                "DELETE FROM orders_queue WHERE seq IN "
+                "(SELECT seq FROM orders_queue WHERE processed = 1 AND processed_at <= ? LIMIT ?)",
+                (now - policy.queue_retention_sec, budget)).rowcount
+        if policy.events_max_age_sec:
+            removed['order_events'] += conn.execute(
+                "DELETE FROM order_events WHERE seq IN "
+                "(SELECT seq FROM order_events WHERE ts <= ? LIMIT ?)",
+                (now - policy.events_max_age_sec, budget)).rowcount
+        if policy.events_max_count:
+            # Events are only ever deleted from the head, so seq bounds give the count
+            low, high = conn.execute("SELECT MIN(seq), MAX(seq) FROM order_events").fetchone()
+            excess = (high - low + 1 - policy.events_max_count) if low is not None else 0
+            if excess > 0:
+                removed['order_events'] += conn.execute(
+                    "DELETE FROM order_events WHERE seq < ?",
+                    (low + min(excess, budget),)).rowcount
+        return removed
+
+    async def compact(self, policy, budget, now=None):
+        now = now if now is not None else time.time()
+        return await self._write(self._compact, policy, budget, now)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "path": self.path,
+            "write_batches": self.batches,
+            "writes_per_batch": self.batched_writes / self.batches if self.batches else 0.0,
+        }
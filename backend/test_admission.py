@@ -0,0 +1,70 @@
+"""
+Unit tests for ingest admission control
+Run with: pytest backend/test_admission.py -v
+"""
+
+from admission import AdmissionController, TokenBucket
+from order_metrics import OrderMetrics
+
+
+class TestAdmissionController:
+    """Test suite for AdmissionController"""
+
+    def test_customer_bucket_limits_one_customer(self):
+        """A customer over their burst is rejected; others are not"""
+        admission = AdmissionController(OrderMetrics(), customer_rate=1, customer_burst=2)
+        assert admission.admit({"A": 1}, now=0) is None
+        assert admission.admit({"A": 1}, now=0) is None
+        assert admission.admit({"A": 1}, now=0) == 1.0
+        assert admission.admit({"B": 1}, now=0) is None
+        assert admission.admit({"A": 1}, now=1.0) is None
+        assert admission.rejected["customer"] == 1
+
+    def test_global_bucket_and_all_or_nothing(self):
+        """A rejected request takes no tokens from any bucket"""
+        admission = AdmissionController(OrderMetrics(), global_rate=10, global_burst=5,
+                                        customer_rate=1, customer_burst=4)
+        assert admission.admit({"C": 4}, now=0) is None
+        assert abs(admission.admit({"A": 2, "B": 2}, now=0) - 0.3) < 1e-9
+        assert admission.admit({"A": 4}, now=0.3) is None
+        assert admission.rejected["global"] == 4
+        assert admission.admitted == 8
+
+    def test_queue_depth_limit(self):
+        """Orders are shed once the queue is at its depth limit"""
+        metrics = OrderMetrics()
+        admission = AdmissionController(metrics, max_queue_depth=3)
+        metrics.order_created(3)
+        assert admission.admit({"A": 1}, now=0) >= 1.0
+        metrics.order_finished("completed", 10.0)
+        assert admission.admit({"A": 1}, now=0) is None
+        assert admission.rejected["queue_full"] == 1
+
+    def test_pressure_slows_refill(self):
+        """A queue past its soft limit and slow processing shrink refill rates"""
+        metrics = OrderMetrics()
+        admission = AdmissionController(metrics, global_rate=100, max_queue_depth=100,
+                                        latency_target_ms=100, refresh_sec=0)
+        metrics.order_created(75)
+        admission.admit({"A": 1}, now=0)
+        assert admission.rate_factor == 0.5
+        for _ in range(50):
+            metrics.order_created()
+            metrics.order_finished("completed", 1000.0)
+        admission.admit({"A": 1}, now=1)
+        assert admission.rate_factor == 0.1  # floored at min_rate_factor
+
+    def test_large_request_waits_for_full_bucket(self):
+        """A count above capacity is admitted from a full bucket, leaving debt"""
+        bucket = TokenBucket(capacity=5, now=0)
+        assert bucket.wait_for(8, rate=1) == 0.0
+        bucket.tokens -= 8
+        bucket.refill(rate=1, now=2)
+        assert bucket.wait_for(1, rate=1) == 2.0
+
+    def test_customer_buckets_are_bounded(self):
+        """Only the most recently seen customers keep a bucket"""
+        admission = AdmissionController(OrderMetrics(), customer_rate=1, max_customers=2)
+        for customer in ("A", "B", "C"):
+            admission.admit({customer: 1}, now=0)
+        assert admission.stats["customer"]["tracked"] == 2
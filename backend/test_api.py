@@ -7,6 +7,7 @@ import pytest
 import requests
 import json
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 BASE_URL = "http://localhost:8001/api"
@@ -128,6 +129,61 @@ class TestSwiftCartAPI:
         assert isinstance(data, list)
         print(f"✅ List orders passed (found {len(data)} orders)")
 
+    def test_list_orders_pagination(self):
+        """Test keyset pagination over the orders listing"""
+        response = requests.get(f"{BASE_URL}/orders?limit=1")
+        assert response.status_code == 200
+        first_page = response.json()
+        assert len(first_page) <= 1
+
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor:
+            next_response = requests.get(f"{BASE_URL}/orders", params={"limit": 1, "after": cursor})
+            assert next_response.status_code == 200
+            second_page = next_response.json()
+            assert second_page and second_page[0]["order_id"] != first_page[0]["order_id"]
+            assert "X-Prev-Cursor" in next_response.headers
+
+        bad_cursor = requests.get(f"{BASE_URL}/orders", params={"after": "not-a-cursor"})
+        assert bad_cursor.status_code == 400
+        print("✅ List orders pagination passed")
+
+    def test_create_orders_batch(self):
+        """Test batch ingest with an in-batch duplicate"""
+        item = {"product_id": "PROD-B", "name": "Batch Product", "quantity": 2, "price": 5.00}
+        key = f"batch-key-{int(time.time() * 1000)}"
+        batch = {"orders": [
+            {"customer_id": "TEST-BATCH-001", "customer_name": "Batch Test", "items": [item], "idempotency_key": key},
+            {"customer_id": "TEST-BATCH-002", "customer_name": "Batch Test", "items": [item]},
+            {"customer_id": "TEST-BATCH-001", "customer_name": "Batch Test", "items": [item], "idempotency_key": key},
+        ]}
+        response = requests.post(f"{BASE_URL}/orders/batch", json=batch)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["created"] == 2 and data["duplicates"] == 1
+        results = data["results"]
+        assert [r["result"] for r in results] == ["created", "created", "duplicate"]
+        assert results[2]["order"]["order_id"] == results[0]["order"]["order_id"]
+        assert results[0]["order"]["total"] == 11.0
+        print("✅ Batch order creation passed")
+
+    def test_search_orders(self):
+        """Test indexed order search by customer"""
+        order_data = {
+            "customer_id": "TEST-SEARCH-001",
+            "customer_name": "Search Test",
+            "items": [{"product_id": "PROD-S", "name": "Search Product", "quantity": 1, "price": 10.00}]
+        }
+        created = requests.post(f"{BASE_URL}/orders", json=order_data).json()
+        time.sleep(1)  # let the worker move it into the orders store
+
+        response = requests.get(f"{BASE_URL}/orders/search", params={"customer_id": "TEST-SEARCH-001"})
+        assert response.status_code == 200
+        results = response.json()
+        assert created["order_id"] in [o["order_id"] for o in results]
+        assert all(o["customer_id"] == "TEST-SEARCH-001" for o in results)
+        print("✅ Search orders passed")
+
     def test_idempotency_prevention(self):
         """Test that duplicate idempotency keys are prevented"""
         order_data = {
@@ -157,6 +213,21 @@ class TestSwiftCartAPI:
         assert order2["order_id"] == order1["order_id"]  # Should return same order
         print("✅ Idempotency prevention passed")
 
+    def test_concurrent_duplicate_submissions(self):
+        """Test that a burst of retries with one key creates a single order"""
+        order_data = {
+            "customer_id": "TEST-IDEMP-002",
+            "customer_name": "Retry Storm Test",
+            "items": [{"product_id": "PROD-IDEMP", "name": "Idempotency Product", "quantity": 1, "price": 5.00}],
+            "idempotency_key": f"retry-storm-{int(time.time() * 1000)}"
+        }
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            responses = list(pool.map(lambda _: requests.post(f"{BASE_URL}/orders", json=order_data), range(10)))
+
+        assert all(r.status_code == 200 for r in responses)
+        assert len({r.json()["order_id"] for r in responses}) == 1
+        print("✅ Concurrent duplicate submissions passed")
+
     def test_metrics_after_orders(self):
         """Test metrics update after creating orders"""
         # Get initial metrics
@@ -190,6 +261,43 @@ class TestSwiftCartAPI:
         assert updated_metrics["total_orders"] >= initial_metrics["total_orders"]
         print("✅ Metrics update after orders passed")
 
+    def test_resize_worker_pool(self):
+        """Test resizing the order worker pool at runtime"""
+        initial = requests.get(f"{BASE_URL}/workers").json()["size"]
+
+        response = requests.put(f"{BASE_URL}/workers", json={"workers": initial + 2})
+        assert response.status_code == 200
+        assert response.json()["size"] == initial + 2
+
+        response = requests.put(f"{BASE_URL}/workers", json={"workers": -1})
+        assert response.status_code == 422
+
+        requests.put(f"{BASE_URL}/workers", json={"workers": initial})
+        print("✅ Worker pool resize passed")
+
+    def test_pipeline_stats(self):
+        """Test per-stage pipeline stats"""
+        response = requests.get(f"{BASE_URL}/pipeline")
+        assert response.status_code == 200
+        stages = response.json()["stages"]
+        assert [stage["name"] for stage in stages] == ["validation", "enrichment", "calculation"]
+        for stage in stages:
+            assert stage["concurrency"] >= 1
+            assert "queue_depth" in stage and "throughput_per_sec" in stage
+            assert "p99_ms" in stage["latency"]["all"]
+        print("✅ Pipeline stats passed")
+
+    def test_dead_letters(self):
+        """Test listing dead letters and requeueing an unknown one"""
+        response = requests.get(f"{BASE_URL}/dead-letters")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == len(data["dead_letters"]) or len(data["dead_letters"]) == 50
+
+        response = requests.post(f"{BASE_URL}/dead-letters/ORD-NONEXISTENT/requeue")
+        assert response.status_code == 404
+        print("✅ Dead letters passed")
+
     def test_websocket_connection(self):
         """Test WebSocket connection (basic connectivity)"""
         try:
@@ -240,8 +348,15 @@ if __name__ == "__main__":
         test_instance.test_create_order_success()
         test_instance.test_get_order_by_id()
         test_instance.test_list_orders()
+        test_instance.test_list_orders_pagination()
+        test_instance.test_create_orders_batch()
+        test_instance.test_search_orders()
         test_instance.test_idempotency_prevention()
+        test_instance.test_concurrent_duplicate_submissions()
         test_instance.test_metrics_after_orders()
+        test_instance.test_resize_worker_pool()
+        test_instance.test_pipeline_stats()
+        test_instance.test_dead_letters()
         test_instance.test_websocket_connection()
         test_instance.test_error_handling_404()
         test_instance.test_cors_headers()
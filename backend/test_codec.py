@@ -0,0 +1,70 @@
+"""
+Unit tests for the JSON codec
+Run with: pytest backend/test_codec.py -v
+"""
+
+import importlib.util
+import json
+import sys
+from datetime import datetime, timezone
+
+import codec
+
+DOC = {
+    "order_id": "ORD-1",
+    "items": [{"product_id": "p", "name": "Café", "quantity": 2, "price": 10.5}],
+    "total": 23.1,
+    "processing_time_ms": None,
+    "processed": False,
+}
+
+
+def load_fallback():
+    """A separate copy of the codec module, imported as if orjson were missing."""
+    spec = importlib.util.spec_from_file_location("codec_fallback", codec.__file__)
+    module = importlib.util.module_from_spec(spec)
+    saved = sys.modules.get("orjson")
+    sys.modules["orjson"] = None
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        if saved is None:
+            del sys.modules["orjson"]
+        else:
+            sys.modules["orjson"] = saved
+    return module
+
+class TestCodec:
+    """Test suite for the codec functions"""
+
+    def test_round_trip(self):
+        """Encoded documents decode back unchanged"""
+        assert codec.loads(codec.dumps(DOC)) == DOC
+        assert codec.loads(codec.dumps_str(DOC)) == DOC
+
+    def test_compact_output(self):
+        """Output is compact JSON that the stdlib reads"""
+        encoded = codec.dumps_str({"a": 1, "b": [1, 2]})
+        assert encoded == '{"a":1,"b":[1,2]}'
+        assert json.loads(encoded) == {"a": 1, "b": [1, 2]}
+
+    def test_unsupported_values_use_str(self):
+        """Values JSON has no type for are encoded as strings"""
+        class Money:
+            def __str__(self):
+                return "EUR 5"
+
+        assert codec.loads(codec.dumps({"amount": Money()})) == {"amount": "EUR 5"}
+
+    def test_fallback_matches(self):
+        """The stdlib fallback encodes documents the same way"""
+        fallback = load_fallback()
+        assert fallback.BACKEND == "json"
+        assert fallback.dumps(DOC) == codec.dumps(DOC)
+        assert fallback.loads(fallback.dumps(DOC)) == DOC
+
+    def test_datetimes_decode_as_iso_strings(self):
+        """Datetimes become ISO 8601 strings with either backend"""
+        now = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        for module in (codec, load_fallback()):
+            assert datetime.fromisoformat(module.loads(module.dumps({"at": now}))["at"]) == now
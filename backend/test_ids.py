@@ -0,0 +1,88 @@
+"""
+Unit tests for time-sortable IDs
+Run with: pytest backend/test_ids.py -v
+"""
+
+import multiprocessing
+from unittest.mock import patch
+
+import pytest
+
+from ids import SEQ_MAX, SortableIdGenerator, id_timestamp
+
+START_NS = 1767225600 * 10**9
+
+
+def generate_in_child(_):
+    from ids import generate_order_id
+    return [generate_order_id() for _ in range(2000)]
+
+
+def node_in_child(_):
+    from ids import generate_order_id
+    return generate_order_id.node
+
+
+class TestSortableIds:
+    """Test suite for SortableIdGenerator"""
+
+    def test_ids_sort_by_time(self):
+        """Later IDs compare greater and carry their timestamp"""
+        generate = SortableIdGenerator("ORD-", node=1)
+        with patch("ids.time.time_ns", return_value=START_NS):
+            first = generate()
+        with patch("ids.time.time_ns", return_value=START_NS + 5 * 10**6):
+            second = generate()
+        assert first < second
+        assert id_timestamp(first, "ORD-") == 1767225600.0
+        assert id_timestamp(second, "ORD-") == 1767225600.005
+
+    def test_monotonic_within_a_millisecond(self):
+        """IDs in the same millisecond are ordered by the counter"""
+        generate = SortableIdGenerator("EVT-", node=1)
+        with patch("ids.time.time_ns", return_value=START_NS):
+            ids = [generate() for _ in range(2000)]
+        assert ids == sorted(ids)
+        assert len(set(ids)) == 2000
+
+    def test_clock_step_back_and_counter_overflow(self):
+        """Neither a clock going backwards nor an exhausted counter breaks ordering"""
+        generate = SortableIdGenerator("ORD-", node=1)
+        with patch("ids.time.time_ns", return_value=START_NS + 10**6):
+            before = generate()
+        with patch("ids.time.time_ns", return_value=START_NS):
+            after = generate()
+            generate._seq = SEQ_MAX
+            borrowed = generate()
+        assert before < after < borrowed
+        assert id_timestamp(borrowed, "ORD-") == 1767225600.002
+
+    def test_nodes_keep_generators_apart(self):
+        """Two nodes never issue the same ID in the same millisecond"""
+        a, b = SortableIdGenerator("ORD-", node=1), SortableIdGenerator("ORD-", node=2)
+        with patch("ids.time.time_ns", return_value=START_NS):
+            assert {a() for _ in range(100)}.isdisjoint({b() for _ in range(100)})
+
+    def test_invalid_node(self):
+        """Nodes must fit in the node field"""
+        with pytest.raises(ValueError):
+            SortableIdGenerator("ORD-", node=1 << 30)
+
+    @pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+    def test_forked_processes_never_collide(self):
+        """Each forked process draws its own node"""
+        from ids import generate_order_id
+        generate_order_id()
+        with multiprocessing.get_context("fork").Pool(4) as pool:
+            batches = pool.map(generate_in_child, range(4))
+        ids = [order_id for batch in batches for order_id in batch]
+        assert len(set(ids)) == len(ids)
+        assert len({order_id[14:20] for order_id in ids}) == 4
+
+    def test_env_node_not_reused_by_spawned_processes(self, monkeypatch):
+        """ORDER_ID_NODE pins the parent's node; spawned children draw their own"""
+        monkeypatch.setenv("ORDER_ID_NODE", "12345")
+        assert SortableIdGenerator("ORD-").node == 12345
+        with multiprocessing.get_context("spawn").Pool(2) as pool:
+            nodes = pool.map(node_in_child, range(2), chunksize=1)
+        assert 12345 not in nodes
@@ -0,0 +1,105 @@
+"""
+Unit tests for Kafka delivery tracking and the circuit breaker
+Run with: pytest backend/test_kafka_delivery.py -v
+"""
+
+import queue
+import threading
+import time
+
+from kafka_config import CircuitBreaker, KafkaOrderProducer, TopicDeliveryMetrics, _DeliveryBatch
+
+
+class TestCircuitBreaker:
+    """Test suite for CircuitBreaker"""
+
+    def test_opens_after_consecutive_failures(self):
+        """The breaker rejects publishes once the failure threshold is hit"""
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout_sec=60)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow()
+        assert breaker.trips == 1
+
+    def test_half_open_allows_one_probe(self):
+        """After the reset timeout a single probe decides the next state"""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout_sec=0)
+        breaker.record_failure()
+        assert breaker.allow()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert not breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.allow()
+
+    def test_failed_probe_reopens(self):
+        """A failed probe sends the breaker straight back to open"""
+        breaker = CircuitBreaker(failure_threshold=5, reset_timeout_sec=0)
+        for _ in range(5):
+            breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.trips == 2
+
+
+class TestDeliveryTracking:
+    """Test suite for per-topic delivery metrics"""
+
+    def test_metrics_snapshot(self):
+        """In-flight is what was sent but not yet settled"""
+        metrics = TopicDeliveryMetrics()
+        metrics.record_sent(3, nbytes=300)
+        metrics.record_delivery(10.0, True)
+        metrics.record_delivery(30.0, True)
+        metrics.record_rejected()
+        snapshot = metrics.snapshot()
+        assert snapshot["in_flight"] == 1
+        assert snapshot["avg_latency_ms"] == 20.0
+        assert snapshot["max_latency_ms"] == 30.0
+        assert snapshot["rejected"] == 1
+        assert snapshot["avg_bytes"] == 100.0
+
+    def test_batch_reports_once_all_settled(self):
+        """A batch completes once, failing if any record failed"""
+        producer = KafkaOrderProducer()
+        outcomes = []
+        batch = _DeliveryBatch(producer, "test-topic", 2, enqueued_at=0.0, on_done=outcomes.append)
+        batch.delivered()
+        assert outcomes == []
+        batch.failed(RuntimeError("broker down"))
+        assert outcomes == [False]
+        assert producer.metrics_for("test-topic").snapshot()["failed"] == 1
+
+    def test_close_does_not_block_on_full_buffer(self):
+        """Shutdown returns within the publish timeout while the sender is stuck and the buffer is full"""
+        producer = KafkaOrderProducer()
+        release = threading.Event()
+
+        class StuckProducer:
+            def send(self, *args, **kwargs):
+                release.wait(5)  # e.g. waiting for metadata from a broker that is down
+                raise RuntimeError("broker down")
+
+        producer._buffer = queue.Queue(maxsize=2)
+        producer.publish_timeout_sec = 0.2
+        producer._producer_for = lambda topic: StuckProducer()
+        sender = producer._sender = threading.Thread(target=producer._send_loop, daemon=True)
+        sender.start()
+        for _ in range(3):  # one taken by the sender, two fill the buffer
+            producer._buffer.put(("test-topic", [(None, b"{}", [])], None, time.monotonic()))
+        try:
+            start = time.monotonic()
+            producer.close()
+            assert time.monotonic() - start < 1.0
+        finally:
+            release.set()
+            sender.join(2)
+            producer._init_delivery()
+        assert not sender.is_alive()
@@ -0,0 +1,54 @@
+"""
+Unit tests for the streaming latency histogram
+Run with: pytest backend/test_latency_histogram.py -v
+"""
+
+import random
+
+from latency_histogram import LatencyHistogram, WindowedLatencyHistogram
+
+
+class TestLatencyHistogram:
+    """Test suite for LatencyHistogram"""
+
+    def test_percentiles_within_relative_accuracy(self):
+        """Percentiles stay within 1% of the exact sorted values"""
+        rng = random.Random(7)
+        values = [rng.lognormvariate(4, 1) for _ in range(20000)]
+        hist = LatencyHistogram(relative_accuracy=0.01)
+        for value in values:
+            hist.record(value)
+
+        exact = sorted(values)
+        for p in (50, 90, 99, 99.9):
+            expected = exact[int(p / 100 * (len(exact) - 1))]
+            assert abs(hist.percentile(p) - expected) <= expected * 0.02
+        assert hist.max == exact[-1]
+
+    def test_merge_matches_single_histogram(self):
+        """Merging two halves gives the same answer as one histogram"""
+        left, right, whole = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+        for ms in range(1, 1001):
+            (left if ms % 2 else right).record(ms)
+            whole.record(ms)
+
+        left.merge(right)
+        assert left.count == whole.count
+        assert left.percentiles((50, 99)) == whole.percentiles((50, 99))
+
+    def test_empty_histogram(self):
+        """An empty histogram reports zeros"""
+        hist = LatencyHistogram()
+        assert hist.percentile(99) == 0.0
+        assert hist.summary()["count"] == 0
+
+    def test_sliding_window(self):
+        """Window queries only include recent intervals"""
+        hist = WindowedLatencyHistogram(interval_sec=10, max_window_sec=900)
+        hist.record(500.0, now=1000.0)
+        hist.record(10.0, now=1300.0)
+
+        assert hist.window(60, now=1305.0).count == 1
+        assert hist.window(60, now=1305.0).max == 10.0
+        assert hist.window(900, now=1305.0).count == 2
+        assert hist.total.count == 2
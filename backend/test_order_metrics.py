@@ -0,0 +1,92 @@
+"""
+Unit tests for the incremental order metrics aggregator
+Run with: pytest backend/test_order_metrics.py -v
+"""
+
+from order_metrics import CompletionRing, OrderMetrics
+
+
+class TestOrderMetrics:
+    """Test suite for OrderMetrics"""
+
+    def test_status_counters(self):
+        """Counters follow orders from ingest to a terminal status"""
+        metrics = OrderMetrics()
+        metrics.order_created()
+        metrics.order_created()
+        metrics.order_finished("completed", 100.0)
+
+        snapshot = metrics.snapshot()
+        assert snapshot["total_orders"] == 1
+        assert snapshot["completed_orders"] == 1
+        assert snapshot["failed_orders"] == 0
+        assert snapshot["queue_depth"] == 1
+        assert snapshot["avg_processing_time_ms"] == 100.0
+
+    def test_ring_drops_expired_seconds(self):
+        """Completions older than the window no longer count"""
+        ring = CompletionRing(window_sec=10)
+        ring.record(now=1000.0)
+        ring.record(now=1005.0, count=2)
+
+        assert ring.total(now=1009.0) == 3
+        assert ring.total(now=1012.0) == 2
+        assert ring.total(now=1020.0) == 0
+
+    def test_ring_reuses_slot_from_previous_lap(self):
+        """A slot written a full window later starts from zero"""
+        ring = CompletionRing(window_sec=10)
+        ring.record(now=1000.0, count=5)
+        ring.record(now=1010.0)
+
+        assert ring.total(now=1010.0) == 1
+
+    def test_latency_percentiles(self):
+        """Finished orders feed the streaming latency histogram"""
+        metrics = OrderMetrics()
+        for ms in range(1, 101):
+            metrics.order_created()
+            metrics.order_finished("completed", float(ms))
+
+        snapshot = metrics.snapshot()
+        assert abs(snapshot["p50_latency_ms"] - 50) <= 1
+        assert abs(snapshot["p99_latency_ms"] - 99) <= 1
+        assert snapshot["max_latency_ms"] == 100.0
+        assert snapshot["latency_windows"]["1m"]["count"] == 100
+
+    def test_dead_letter_and_requeue(self):
+        """A dead-lettered order is terminal until requeued as pending"""
+        metrics = OrderMetrics()
+        metrics.order_created(2)
+        metrics.order_finished("dead_lettered")
+        assert metrics.snapshot()["dead_lettered_orders"] == 1
+        assert metrics.queue_depth == 1
+
+        metrics.order_requeued("dead_lettered")
+        snapshot = metrics.snapshot()
+        assert snapshot["dead_lettered_orders"] == 0
+        assert (snapshot["queue_depth"], snapshot["total_orders"]) == (2, 0)
+        assert metrics.status_counts["pending"] == 2
+
+    def test_idempotency_counters(self):
+        """Duplicate hits and coalesced requests are reported separately"""
+        metrics = OrderMetrics()
+        metrics.duplicate_hit()
+        metrics.duplicate_hit(count=2)
+        metrics.request_coalesced()
+
+        snapshot = metrics.snapshot()
+        assert snapshot["duplicate_hits"] == 3
+        assert snapshot["coalesced_requests"] == 1
+
+    def test_queue_wait_reported_separately(self):
+        """Ingest-to-claim waits do not mix with processing latency"""
+        metrics = OrderMetrics()
+        for ms in (2.0, 4.0, -1.0):
+            metrics.order_claimed(ms)
+
+        snapshot = metrics.snapshot()
+        assert snapshot["queue_wait"]["all"]["count"] == 3
+        assert snapshot["queue_wait"]["all"]["max_ms"] == 4.0
+        assert snapshot["queue_wait"]["1m"]["count"] == 3
+        assert metrics.latency.total.count == 0
@@ -0,0 +1,175 @@
+"""
+Unit tests for the staged order pipeline
+Run with: pytest backend/test_order_pipeline.py -v
+"""
+
+import asyncio
+
+import pytest
+
+from order_pipeline import OrderPipeline, Stage
+
+
+def make_orders(count):
+    return [{"order_id": f"ORD-{i}", "trail": []} for i in range(count)]
+
+
+def tracing_stage(name, delay=0.0, concurrency=1, queue_size=100, fail=(), peak=None):
+    """Stage appending its name to each order's trail, optionally tracking peak concurrency."""
+    running = 0
+
+    async def handler(order):
+        nonlocal running
+        running += 1
+        if peak is not None:
+            peak[name] = max(peak.get(name, 0), running)
+        try:
+            await asyncio.sleep(delay)
+            if order["order_id"] in fail:
+                raise ValueError(f"{name} rejected {order['order_id']}")
+            order["trail"].append(name)
+        finally:
+            running -= 1
+    return Stage(name, handler, concurrency=concurrency, queue_size=queue_size)
+
+
+async def with_pipeline(stages, scenario, pipeline=None):
+    pipeline = pipeline or OrderPipeline(stages)
+    pipeline.start()
+    try:
+        return await scenario(pipeline)
+    finally:
+        await pipeline.stop()
+
+
+class TestOrderPipeline:
+    """Test suite for OrderPipeline"""
+
+    def test_orders_pass_every_stage_in_order(self):
+        """Each order goes through the stages in sequence; results keep input order"""
+        async def scenario(pipeline):
+            return await pipeline.run(make_orders(5)), pipeline.stats
+
+        stages = [tracing_stage("validation"), tracing_stage("enrichment", 0.01, concurrency=4),
+                  tracing_stage("calculation")]
+        orders, stats = asyncio.run(with_pipeline(stages, scenario))
+        assert [order["order_id"] for order in orders] == [f"ORD-{i}" for i in range(5)]
+        assert all(order["trail"] == ["validation", "enrichment", "calculation"] for order in orders)
+        assert [stage["processed"] for stage in stats["stages"]] == [5, 5, 5]
+        assert stats["in_flight"] == 0
+
+    def test_concurrency_is_per_stage(self):
+        """A wide stage fans out while a narrow one handles one order at a time"""
+        peak = {}
+
+        async def scenario(pipeline):
+            await pipeline.run(make_orders(20))
+
+        stages = [tracing_stage("enrichment", 0.02, concurrency=8, peak=peak),
+                  tracing_stage("calculation", 0.001, concurrency=1, peak=peak)]
+        asyncio.run(with_pipeline(stages, scenario))
+        assert peak == {"enrichment": 8, "calculation": 1}
+
+    def test_failure_fails_only_that_order(self):
+        """A failing order skips later stages; the rest of the batch completes first"""
+        async def scenario(pipeline):
+            orders = make_orders(4)
+            with pytest.raises(ValueError, match="ORD-2"):
+                await pipeline.run(orders)
+            return orders, pipeline.stats
+
+        stages = [tracing_stage("validation", fail={"ORD-2"}), tracing_stage("enrichment", 0.01, concurrency=4)]
+        orders, stats = asyncio.run(with_pipeline(stages, scenario))
+        assert [order["trail"] for order in orders] == [
+            ["validation", "enrichment"], ["validation", "enrichment"], [], ["validation", "enrichment"]]
+        assert [(s["processed"], s["failed"]) for s in stats["stages"]] == [(3, 1), (3, 0)]
+
+    def test_bounded_queue_and_stage_stats(self):
+        """A slow stage's queue fills to its bound; depth, wait and latency are reported per stage"""
+        async def scenario(pipeline):
+            run = asyncio.create_task(pipeline.run(make_orders(10)))
+            await asyncio.sleep(0.03)
+            during = pipeline.stats
+            await run
+            return during, pipeline.stats
+
+        stages = [tracing_stage("validation"), tracing_stage("calculation", 0.01, queue_size=3)]
+        during, after = asyncio.run(with_pipeline(stages, scenario))
+        assert during["stages"][1]["queue_depth"] == 3
+        assert during["in_flight"] > 3
+        calculation = after["stages"][1]
+        assert calculation["latency"]["all"]["count"] == 10
+        assert calculation["latency"]["all"]["p50_ms"] >= 9
+        assert calculation["wait"]["all"]["max_ms"] > calculation["latency"]["all"]["p50_ms"]
+        assert calculation["throughput_per_sec"] > 0
+
+    def test_batch_stage_takes_ready_orders_in_arrival_order(self):
+        """A batching stage gets the orders waiting in its queue together, in the order they arrived"""
+        calls = []
+
+        async def calculate(orders):
+            calls.append([order["order_id"] for order in orders])
+            await asyncio.sleep(0.01)
+            if "ORD-7" in calls[-1]:
+                raise ValueError("calculation failed")
+
+        async def scenario(pipeline):
+            orders = make_orders(10)
+            with pytest.raises(ValueError):
+                await pipeline.run(orders)
+            return pipeline.stats
+
+        stages = [tracing_stage("validation"), Stage("calculation", calculate, batch_size=4)]
+        stats = asyncio.run(with_pipeline(stages, scenario))
+        assert [order_id for call in calls for order_id in call] == [f"ORD-{i}" for i in range(10)]
+        assert len(calls) < 10 and max(len(call) for call in calls) <= 4
+        failed = next(call for call in calls if "ORD-7" in call)
+        calculation = stats["stages"][1]
+        assert (calculation["processed"], calculation["failed"]) == (10 - len(failed), len(failed))
+        assert calculation["batches"] == len(calls)
+
+    def test_ordered_stage_keeps_key_order_across_runs(self):
+        """Orders sharing a key reach an ordered stage in the order their runs started"""
+        reached = []
+
+        async def enrich(order):
+            # The first order of each key is the slowest to enrich
+            await asyncio.sleep(order["delay"])
+            if order["order_id"] == "A-fail":
+                raise ValueError("enrichment failed")
+
+        async def calculate(orders):
+            reached.extend(order["order_id"] for order in orders)
+
+        async def scenario(pipeline):
+            first = asyncio.create_task(pipeline.run([
+                {"order_id": "A-1", "customer_id": "A", "delay": 0.05},
+                {"order_id": "B-1", "customer_id": "B", "delay": 0.03}]))
+            failing = asyncio.create_task(pipeline.run([
+                {"order_id": "A-fail", "customer_id": "A", "delay": 0.04}]))
+            second = asyncio.create_task(pipeline.run([
+                {"order_id": "A-2", "customer_id": "A", "delay": 0.0},
+                {"order_id": "C-1", "customer_id": "C", "delay": 0.0}]))
+            await asyncio.gather(first, second)
+            with pytest.raises(ValueError):
+                await failing
+            return pipeline.stats["in_flight"]
+
+        stages = [Stage("enrichment", enrich, concurrency=8),
+                  Stage("calculation", calculate, batch_size=4, ordered=True)]
+        pipeline = OrderPipeline(stages, key=lambda order: order["customer_id"])
+        assert asyncio.run(with_pipeline([], scenario, pipeline)) == 0
+        # C-1 is not held back by other keys; A-2 waits for A-1 and the failed order
+        assert reached.index("C-1") < reached.index("A-1") < reached.index("A-2")
+        assert reached.index("B-1") < reached.index("A-1")
+        assert sorted(reached) == ["A-1", "A-2", "B-1", "C-1"]
+
+    def test_ordered_stage_needs_key(self):
+        """An ordered stage without a pipeline key is rejected"""
+        with pytest.raises(ValueError):
+            OrderPipeline([Stage("calculation", tracing_stage("x").handler, ordered=True)])
+
+    def test_stage_names_unique(self):
+        """Stages are addressed by name, so duplicates are rejected"""
+        with pytest.raises(ValueError):
+            OrderPipeline([tracing_stage("validation"), tracing_stage("validation")])
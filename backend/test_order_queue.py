@@ -0,0 +1,142 @@
+"""
+Unit tests for the indexed order queue store
+Run with: pytest backend/test_order_queue.py -v
+"""
+
+from order_queue import OrderQueue
+
+
+def make_doc(order_id, processed=False):
+    return {"order_id": order_id, "status": "pending", "processed": processed}
+
+
+class TestOrderQueue:
+    """Test suite for OrderQueue"""
+
+    def test_lookup_by_order_id(self):
+        """Entries are found through the order_id index"""
+        queue = OrderQueue()
+        queue.append(make_doc("ORD-1"))
+        queue.append(make_doc("ORD-2"))
+
+        assert queue.get("ORD-2")["order_id"] == "ORD-2"
+        assert queue.get("ORD-3") is None
+        assert len(queue) == 2
+
+    def test_next_pending_is_fifo(self):
+        """Pending entries are handed out in arrival order"""
+        queue = OrderQueue()
+        for i in range(3):
+            queue.append(make_doc(f"ORD-{i}"))
+
+        assert queue.next_pending()["order_id"] == "ORD-0"
+        queue.mark_processed("ORD-0")
+        assert queue.next_pending()["order_id"] == "ORD-1"
+
+    def test_mark_processed_out_of_order(self):
+        """Processing an entry behind the head skips it later"""
+        queue = OrderQueue()
+        for i in range(3):
+            queue.append(make_doc(f"ORD-{i}"))
+
+        queue.mark_processed("ORD-1")
+        queue.mark_processed("ORD-0")
+
+        assert queue.next_pending()["order_id"] == "ORD-2"
+        assert queue.pending_count == 1
+        assert queue.processed_count == 2
+
+    def test_requeue_after_processed(self):
+        """Clearing the processed flag puts the entry back in the FIFO"""
+        queue = OrderQueue()
+        queue.append(make_doc("ORD-1"))
+        queue.mark_processed("ORD-1")
+        assert queue.next_pending() is None
+
+        queue.update("ORD-1", {"processed": False})
+        assert queue.next_pending()["order_id"] == "ORD-1"
+        assert queue.pending_count == 1
+
+    def test_update_missing_entry(self):
+        """Updating an unknown order_id reports no match"""
+        queue = OrderQueue()
+        assert queue.update("ORD-404", {"processed": True}) is False
+
+    def test_remove_processed(self):
+        """Retention drops processed entries but keeps pending ones"""
+        queue = OrderQueue()
+        for i in range(3):
+            queue.append(make_doc(f"ORD-{i}"))
+        queue.mark_processed("ORD-0")
+        queue.mark_processed("ORD-2")
+
+        assert queue.remove_processed(older_than=0, limit=10) == []
+        assert queue.remove_processed(older_than=float("inf"), limit=1) == ["ORD-0"]
+        assert queue.get("ORD-0") is None
+        assert queue.remove_processed(older_than=float("inf"), limit=10) == ["ORD-2"]
+        assert len(queue) == 1
+        assert queue.next_pending()["order_id"] == "ORD-1"
+
+    def test_claim_hands_out_each_entry_once(self):
+        """Claimed entries leave the FIFO until released or processed"""
+        queue = OrderQueue()
+        for i in range(4):
+            queue.append(make_doc(f"ORD-{i}"))
+
+        first = queue.claim("worker-0", limit=2)
+        second = queue.claim("worker-1", limit=2)
+        assert [doc["order_id"] for doc in first] == ["ORD-0", "ORD-1"]
+        assert [doc["order_id"] for doc in second] == ["ORD-2", "ORD-3"]
+        assert queue.claim("worker-2") == []
+        assert queue.next_pending() is None
+        assert queue.claimed_by("ORD-2") == "worker-1"
+
+        queue.mark_processed("ORD-0")
+        assert queue.release("ORD-1", "worker-0") is True
+        assert queue.release("ORD-0", "worker-0") is False
+        assert queue.claimed_count == 2
+        assert queue.pending_count == 3
+        assert [doc["order_id"] for doc in queue.claim("worker-2", limit=5)] == ["ORD-1"]
+
+    def test_expired_lease_is_claimed_again(self):
+        """An entry whose lease ran out goes back to the queue, counting attempts"""
+        queue = OrderQueue()
+        queue.append(make_doc("ORD-0"))
+        queue.append(make_doc("ORD-1"))
+
+        assert [doc["attempts"] for doc in queue.claim("worker-0", limit=2, lease_sec=10, now=100)] == [1, 1]
+        assert queue.claim("worker-1", now=105) == []
+        reclaimed = queue.claim("worker-1", limit=2, now=111)
+        assert [(doc["order_id"], doc["attempts"]) for doc in reclaimed] == [("ORD-0", 2), ("ORD-1", 2)]
+        assert queue.claimed_by("ORD-0") == "worker-1"
+        # The stale lease of the first claim no longer applies, nor may
+        # its worker release the entry from under the new holder
+        assert queue.release("ORD-0", "worker-0", now=112) is False
+        assert queue.claimed_by("ORD-0") == "worker-1"
+        assert queue.claim("worker-2", now=10**6) == []
+
+    def test_renewed_lease_outlasts_original(self):
+        """Only the holder can renew a claim, which then expires at the new time"""
+        queue = OrderQueue()
+        queue.append(make_doc("ORD-0"))
+        queue.claim("worker-0", lease_sec=10, now=100)
+
+        assert queue.renew("ORD-0", "worker-1", lease_sec=10, now=105) is False
+        assert queue.renew("ORD-0", "worker-0", lease_sec=10, now=105) is True
+        assert queue.claim("worker-1", now=111) == []
+        assert [doc["order_id"] for doc in queue.claim("worker-1", now=115)] == ["ORD-0"]
+        assert queue.renew("ORD-0", "worker-0", now=116) is False
+
+    def test_release_with_delay(self):
+        """A delayed release is not claimable until its delay has passed"""
+        queue = OrderQueue()
+        queue.append(make_doc("ORD-0"))
+        queue.append(make_doc("ORD-1"))
+        queue.claim("worker-0", now=100)
+
+        queue.release("ORD-0", "worker-0", delay_sec=5, now=100)
+        assert queue.delayed_count == 1
+        assert queue.next_pending()["order_id"] == "ORD-1"
+        assert [doc["order_id"] for doc in queue.claim("worker-0", limit=2, now=101)] == ["ORD-1"]
+        assert [doc["order_id"] for doc in queue.claim("worker-0", limit=2, now=105)] == ["ORD-0"]
+        assert queue.delayed_count == 0
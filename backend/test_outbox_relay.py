@@ -0,0 +1,92 @@
+"""
+Unit tests for the outbox relay
+Run with: pytest backend/test_outbox_relay.py -v
+"""
+
+import asyncio
+
+from outbox_relay import OutboxRelay
+from storage import InMemoryDB
+from storage.outbox import outbox_message
+
+
+class RecordingProducer:
+    """Stands in for KafkaOrderProducer; fails the next `fail_next` batches."""
+
+    def __init__(self, connected=True, fail_next=0):
+        self.is_connected = connected
+        self.fail_next = fail_next
+        self.sent = []
+
+    async def publish_encoded_async(self, topic, records):
+        if self.fail_next:
+            self.fail_next -= 1
+            return False
+        self.sent.extend((topic, key) for key, _, _ in records)
+        return True
+
+
+async def fill(db, count):
+    for i in range(count):
+        topic = "orders" if i % 2 == 0 else "order-events"
+        await db.insert_one("orders_queue", {"order_id": f"ORD-{i}", "processed": False},
+                            outbox=[outbox_message(topic, f"ORD-{i}", {"order_id": f"ORD-{i}"})])
+
+
+class TestOutboxRelay:
+    """Test suite for OutboxRelay"""
+
+    def test_batches_by_topic_and_marks_delivered(self):
+        """One producer batch per topic; delivered rows leave the backlog"""
+        async def scenario():
+            db = InMemoryDB()
+            producer = RecordingProducer()
+            relay = OutboxRelay(db, producer, batch_size=10)
+            await fill(db, 4)
+            handled, failed = await relay.relay_once()
+            return handled, failed, relay.batches, producer.sent, db.outbox.pending_count
+
+        assert asyncio.run(scenario()) == (
+            4, False, 2,
+            [("orders", "ORD-0"), ("orders", "ORD-2"), ("order-events", "ORD-1"), ("order-events", "ORD-3")],
+            0,
+        )
+
+    def test_failed_batch_stays_pending(self):
+        """A failed send is retried on the next pass"""
+        async def scenario():
+            db = InMemoryDB()
+            producer = RecordingProducer(fail_next=1)
+            relay = OutboxRelay(db, producer, batch_size=10)
+            await fill(db, 2)
+            first = await relay.relay_once()
+            backlog = db.outbox.pending_count
+            attempts = [row["attempts"] for row in db.outbox.pending(10)]
+            second = await relay.relay_once()
+            return first, backlog, attempts, second, db.outbox.pending_count
+
+        assert asyncio.run(scenario()) == ((2, True), 1, [1], (1, False), 0)
+
+    def test_fallback_when_kafka_disconnected(self):
+        """Without Kafka, rows go to the fallback and are marked delivered"""
+        async def scenario():
+            db = InMemoryDB()
+            seen = []
+            relay = OutboxRelay(db, RecordingProducer(connected=False), fallback=lambda row: seen.append(row["key"]))
+            await fill(db, 3)
+            await relay.relay_once()
+            return seen, db.outbox.pending_count, relay.fallback_delivered
+
+        assert asyncio.run(scenario()) == (["ORD-0", "ORD-1", "ORD-2"], 0, 3)
+
+    def test_backoff_grows_and_caps(self):
+        """Backoff doubles per consecutive failure up to the cap"""
+        relay = OutboxRelay(InMemoryDB(), RecordingProducer(), backoff_base_sec=1, backoff_max_sec=4)
+        delays = []
+        for failures in (1, 2, 3, 4):
+            relay.consecutive_failures = failures
+            delays.append(relay.backoff_delay())
+        assert 0.5 <= delays[0] <= 1
+        assert 1 <= delays[1] <= 2
+        assert 2 <= delays[2] <= 4
+        assert 2 <= delays[3] <= 4
@@ -0,0 +1,201 @@
+"""
+Unit tests for WAL + snapshot persistence
+Run with: pytest backend/test_persistence.py -v
+"""
+
+import asyncio
+import time
+
+from persistence import Persistence
+from retention import RetentionPolicy
+from storage import InMemoryDB
+from storage.outbox import outbox_message
+
+
+async def ingest(db, order_ids):
+    await asyncio.gather(*(
+        db.insert_one("orders_queue", {"order_id": order_id, "status": "pending", "processed": False})
+        for order_id in order_ids
+    ))
+
+
+class TestPersistence:
+    """Test suite for Persistence"""
+
+    def test_recover_from_wal_only(self, tmp_path):
+        """Writes are replayed from the WAL when no snapshot exists"""
+        async def write():
+            db = InMemoryDB()
+            persistence = Persistence(tmp_path, group_commit_ms=1)
+            persistence.recover(db)
+            db.persistence = persistence
+            await ingest(db, ["ORD-1", "ORD-2", "ORD-3"])
+            await db.update_one("orders_queue", {"order_id": "ORD-1"}, {"$set": {"processed": True}})
+            # Concurrent writes share flushes (group commit)
+            assert persistence.wal.flushes < persistence.wal.seq
+            await persistence.wal.close()
+
+        asyncio.run(write())
+
+        db = InMemoryDB()
+        stats = Persistence(tmp_path).recover(db)
+        assert stats["replayed_records"] == 4
+        assert len(db.orders_queue) == 3
+        assert db.orders_queue.next_pending()["order_id"] == "ORD-2"
+
+    def test_recover_snapshot_plus_tail(self, tmp_path):
+        """Recovery loads the snapshot and replays only later records"""
+        async def write():
+            db = InMemoryDB()
+            persistence = Persistence(tmp_path, group_commit_ms=1)
+            persistence.recover(db)
+            db.persistence = persistence
+            await ingest(db, ["ORD-1", "ORD-2"])
+            await persistence.snapshot(db)
+            await ingest(db, ["ORD-3"])
+            await persistence.wal.close()
+
+        asyncio.run(write())
+
+        db = InMemoryDB()
+        stats = Persistence(tmp_path).recover(db)
+        assert stats["snapshot_seq"] == 2
+        assert stats["replayed_records"] == 1
+        assert [doc["order_id"] for doc in db.orders_queue] == ["ORD-1", "ORD-2", "ORD-3"]
+
+    def test_truncated_tail_is_ignored(self, tmp_path):
+        """A torn final record does not prevent recovery"""
+        async def write():
+            db = InMemoryDB()
+            persistence = Persistence(tmp_path, group_commit_ms=1)
+            persistence.recover(db)
+            db.persistence = persistence
+            await ingest(db, ["ORD-1"])
+            await persistence.wal.close()
+
+        asyncio.run(write())
+        segment = Persistence(tmp_path).wal.segments()[-1]
+        with open(segment, "ab") as f:
+            f.write(b'{"seq":2,"c":"orders_q')
+
+        db = InMemoryDB()
+        assert Persistence(tmp_path).recover(db)["replayed_records"] == 1
+        assert db.orders_queue.get("ORD-1") is not None
+
+    def test_undelivered_outbox_survives_restart(self, tmp_path):
+        """Outbox rows are recovered until they are marked delivered"""
+        async def write():
+            db = InMemoryDB()
+            persistence = Persistence(tmp_path, group_commit_ms=1)
+            persistence.recover(db)
+            db.persistence = persistence
+            for order_id in ("ORD-1", "ORD-2", "ORD-3"):
+                await db.insert_one("orders_queue", {"order_id": order_id, "processed": False},
+                                    outbox=[outbox_message("orders", order_id, {"order_id": order_id})])
+            await persistence.snapshot(db)
+            await db.outbox_mark_delivered([1, 2])
+            await persistence.wal.close()
+
+        asyncio.run(write())
+
+        db = InMemoryDB()
+        Persistence(tmp_path).recover(db)
+        assert [row["key"] for row in db.outbox.pending(10)] == ["ORD-3"]
+        assert db.outbox.seq == 3
+
+    def test_bulk_completion_replayed(self, tmp_path):
+        """Orders, queue flags, events and outbox rows of a bulk completion are recovered"""
+        async def write():
+            db = InMemoryDB()
+            persistence = Persistence(tmp_path, group_commit_ms=1)
+            persistence.recover(db)
+            db.persistence = persistence
+            await ingest(db, ["ORD-1", "ORD-2", "ORD-3"])
+            claimed = await db.claim_orders("worker-0", 2)
+            await db.complete_orders([
+                ({**doc, "status": "completed"}, {"order_id": doc["order_id"], "event_type": "order_completed"},
+                 [outbox_message("order-events", doc["order_id"], {"order_id": doc["order_id"]})])
+                for doc in claimed
+            ], "worker-0")
+            await persistence.wal.close()
+
+        asyncio.run(write())
+
+        db = InMemoryDB()
+        Persistence(tmp_path).recover(db)
+        assert sorted(db.orders) == ["ORD-1", "ORD-2"]
+        assert db.orders_queue.pending_count == 1
+        assert len(db.order_events) == 2
+        assert db.outbox.pending_count == 2
+
+    def test_compaction_survives_replay(self, tmp_path):
+        """Entries removed by retention stay removed when the WAL is replayed"""
+        async def write():
+            db = InMemoryDB()
+            persistence = Persistence(tmp_path, group_commit_ms=1)
+            persistence.recover(db)
+            db.persistence = persistence
+            await db.insert_one("idempotency_keys", {"key": "k-1", "order_id": "ORD-1"})
+            await ingest(db, ["ORD-1", "ORD-2"])
+            await db.update_one("orders_queue", {"order_id": "ORD-1"}, {"$set": {"processed": True}})
+            for i in range(3):
+                await db.insert_one("order_events", {"order_id": f"ORD-{i}", "timestamp": "2026-01-01T00:00:00+00:00"})
+            policy = RetentionPolicy(idempotency_ttl_sec=1, queue_retention_sec=1, events_max_count=1,
+                                     events_max_age_sec=0)
+            removed = await db.compact(policy, budget=10, now=float("inf"))
+            await persistence.wal.close()
+            return removed
+
+        removed = asyncio.run(write())
+        assert removed == {"idempotency_keys": 1, "orders_queue": 1, "order_events": 2, "outbox": 0}
+
+        db = InMemoryDB()
+        Persistence(tmp_path).recover(db)
+        assert db.idempotency_keys == {}
+        assert [doc["order_id"] for doc in db.orders_queue] == ["ORD-2"]
+        assert [event["order_id"] for event in db.order_events] == ["ORD-2"]
+
+    def test_idempotency_ttl_not_restarted(self, tmp_path):
+        """Recovered idempotency keys keep their insertion time, from the snapshot and the WAL"""
+        async def write():
+            db = InMemoryDB()
+            persistence = Persistence(tmp_path, group_commit_ms=1)
+            persistence.recover(db)
+            db.persistence = persistence
+            await db.insert_one("idempotency_keys", {"key": "k-1", "order_id": "ORD-1"})
+            await persistence.snapshot(db)
+            await db.ingest_orders([({"key": "k-2", "order_id": "ORD-2"},
+                                     {"order_id": "ORD-2", "processed": False}, [])])
+            await persistence.wal.close()
+            return {key: doc["inserted_at"] for key, doc in db.idempotency_keys.items()}
+
+        inserted = asyncio.run(write())
+        time.sleep(0.1)
+
+        db = InMemoryDB()
+        Persistence(tmp_path).recover(db)
+        assert {key: doc["inserted_at"] for key, doc in db.idempotency_keys.items()} == inserted
+        removed = asyncio.run(db.compact(RetentionPolicy(idempotency_ttl_sec=0.05), budget=10))
+        assert removed["idempotency_keys"] == 2
+
+    def test_dead_letters_recovered(self, tmp_path):
+        """Dead letters and requeues are logged, so recovery restores both"""
+        async def write():
+            db = InMemoryDB()
+            persistence = Persistence(tmp_path, group_commit_ms=1)
+            persistence.recover(db)
+            db.persistence = persistence
+            await ingest(db, ["ORD-1", "ORD-2"])
+            await db.claim_orders("worker-0", 2)
+            for order_id in ("ORD-1", "ORD-2"):
+                await db.dead_letter_order(order_id, "worker-0", "RuntimeError: boom")
+            await db.requeue_dead_letter("ORD-2")
+            await persistence.wal.close()
+
+        asyncio.run(write())
+
+        db = InMemoryDB()
+        Persistence(tmp_path).recover(db)
+        assert list(db.dead_letters) == ["ORD-1"]
+        assert db.dead_letters["ORD-1"]["error"] == "RuntimeError: boom"
+        assert db.orders_queue.next_pending()["order_id"] == "ORD-2"
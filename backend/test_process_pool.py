@@ -0,0 +1,114 @@
+"""
+Unit tests for the sharded order process pool
+Run with: pytest backend/test_process_pool.py -v
+"""
+
+import asyncio
+import os
+import time
+
+import pytest
+
+from order_calculation import calculate_order
+from process_pool import ShardedProcessPool, shard_for
+
+
+def tag_with_pid(order):
+    """Handler recording which process saw the order."""
+    time.sleep(order.get("sleep", 0))
+    if order.get("crash"):
+        os._exit(3)
+    return {"order_id": order["order_id"], "pid": os.getpid(), "at": time.monotonic()}
+
+
+def make_orders(count, customers=3):
+    return [{"order_id": f"ORD-{i}", "customer_id": f"CUST-{i % customers}",
+             "items": [{"quantity": 2, "price": 5.0}]} for i in range(count)]
+
+
+class TestShardedProcessPool:
+    """Test suite for ShardedProcessPool"""
+
+    def test_shard_for_is_stable(self):
+        """The shard of a key does not depend on the process's hash seed"""
+        assert shard_for("CUST-1", 4) == shard_for("CUST-1", 4)
+        assert {shard_for(f"CUST-{i}", 4) for i in range(100)} == {0, 1, 2, 3}
+
+    def test_results_in_order_and_keys_stay_on_one_process(self):
+        """Results line up with the input; one customer's orders share a process"""
+        async def scenario():
+            pool = ShardedProcessPool(tag_with_pid, processes=2, shard_key="customer_id")
+            pool.start()
+            try:
+                orders = make_orders(12)
+                results = await pool.run(orders)
+                return orders, results, pool.stats
+            finally:
+                await pool.stop()
+
+        orders, results, stats = asyncio.run(scenario())
+        assert [r["order_id"] for r in results] == [o["order_id"] for o in orders]
+        pids = {}
+        for order, result in zip(orders, results):
+            assert pids.setdefault(order["customer_id"], result["pid"]) == result["pid"]
+        assert os.getpid() not in pids.values()
+        assert sum(shard["orders"] for shard in stats["shards"]) == 12
+
+    def test_concurrent_calls_keep_key_order(self):
+        """Orders with one key from concurrent calls are handled in call order"""
+        async def scenario():
+            pool = ShardedProcessPool(tag_with_pid, processes=2, shard_key="customer_id")
+            pool.start()
+            try:
+                calls = [pool.run([{"order_id": f"ORD-{i}", "customer_id": "CUST-1", "sleep": 0.01}])
+                         for i in range(5)]
+                return [result for results in await asyncio.gather(*calls) for result in results]
+            finally:
+                await pool.stop()
+
+        results = asyncio.run(scenario())
+        assert len({r["pid"] for r in results}) == 1
+        assert [r["order_id"] for r in sorted(results, key=lambda r: r["at"])] == [f"ORD-{i}" for i in range(5)]
+
+    def test_dead_process_fails_batch_and_restarts(self):
+        """A crashed shard fails its in-flight batch and is restarted"""
+        async def scenario():
+            pool = ShardedProcessPool(tag_with_pid, processes=1)
+            pool.start()
+            try:
+                with pytest.raises(RuntimeError):
+                    await pool.run([{"order_id": "ORD-X", "crash": True}])
+                results = await pool.run(make_orders(2))
+                return results, pool.stats["shards"][0]
+            finally:
+                await pool.stop()
+
+        results, shard = asyncio.run(scenario())
+        assert [r["order_id"] for r in results] == ["ORD-0", "ORD-1"]
+        assert shard["restarts"] == 1
+        assert shard["failed_batches"] == 1
+
+    def test_dead_process_detected_while_others_busy(self):
+        """A shard dying is noticed even while another shard keeps returning results"""
+        async def scenario():
+            pool = ShardedProcessPool(tag_with_pid, processes=2)
+            pool.start()
+            try:
+                ids = {shard_for(f"ORD-{i}", 2): f"ORD-{i}" for i in range(20)}
+                crash = asyncio.create_task(pool.run([{"order_id": ids[0], "crash": True, "sleep": 0.5}]))
+                deadline = time.monotonic() + 4
+                while not crash.done() and time.monotonic() < deadline:
+                    await pool.run([{"order_id": ids[1], "sleep": 0.05}])
+                with pytest.raises(RuntimeError):
+                    await asyncio.wait_for(crash, 0.1)
+                return time.monotonic() - (deadline - 4)
+            finally:
+                await pool.stop()
+
+        assert asyncio.run(scenario()) < 3
+
+    def test_calculate_order(self):
+        """The calculation step derives totals from the items"""
+        result = calculate_order(make_orders(1)[0])
+        assert (result["subtotal"], result["tax"], result["total"]) == (10.0, 1.0, 11.0)
+        assert result["status"] in ("completed", "failed")
@@ -0,0 +1,82 @@
+"""
+Unit tests for single-flight request coalescing
+Run with: pytest backend/test_single_flight.py -v
+"""
+
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+class TestSingleFlight:
+    """Test suite for SingleFlight"""
+
+    def test_concurrent_callers_share_one_execution(self):
+        """Callers with the same key get the leader's result"""
+        async def scenario():
+            flights = SingleFlight()
+            calls = []
+
+            async def work():
+                calls.append(1)
+                await asyncio.sleep(0.01)
+                return "ORD-1"
+
+            results = await asyncio.gather(*(flights.run("key", work) for _ in range(5)))
+            return results, len(calls), flights.stats
+
+        results, calls, stats = asyncio.run(scenario())
+        assert [r for r, _ in results] == ["ORD-1"] * 5
+        assert [shared for _, shared in results].count(False) == 1
+        assert calls == 1
+        assert stats == {"in_flight": 0, "leaders": 1, "coalesced": 4}
+
+    def test_distinct_keys_run_separately(self):
+        """Different keys never share a flight"""
+        async def scenario():
+            flights = SingleFlight()
+
+            async def work(value):
+                await asyncio.sleep(0)
+                return value
+
+            return await asyncio.gather(flights.run("a", lambda: work(1)), flights.run("b", lambda: work(2)))
+
+        assert asyncio.run(scenario()) == [(1, False), (2, False)]
+
+    def test_exception_reaches_every_caller(self):
+        """A failed flight raises for all waiters and is not cached"""
+        async def scenario():
+            flights = SingleFlight()
+
+            async def work():
+                await asyncio.sleep(0.01)
+                raise ValueError("conflict")
+
+            results = await asyncio.gather(*(flights.run("key", work) for _ in range(3)), return_exceptions=True)
+            return results, len(flights)
+
+        results, in_flight = asyncio.run(scenario())
+        assert all(isinstance(r, ValueError) for r in results)
+        assert in_flight == 0
+
+    def test_cancelled_caller_does_not_cancel_flight(self):
+        """A waiter going away leaves the shared work running"""
+        async def scenario():
+            flights = SingleFlight()
+
+            async def work():
+                await asyncio.sleep(0.02)
+                return "done"
+
+            leader = asyncio.create_task(flights.run("key", work))
+            follower = asyncio.create_task(flights.run("key", work))
+            await asyncio.sleep(0)
+            leader.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            return await follower
+
+        assert asyncio.run(scenario()) == ("done", True)
@@ -0,0 +1,394 @@
+"""
+Contract tests run against every storage backend
+Run with: pytest backend/test_storage.py -v
+"""
+
+import asyncio
+
+import pytest
+
+from retention import RetentionPolicy
+from storage import InMemoryDB, SQLiteDB, order_sort_key
+from storage.indexes import OrderIndexes
+from storage.outbox import outbox_message
+from storage.records import OrderRecord
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_db(request, tmp_path):
+    def factory():
+        if request.param == "memory":
+            return InMemoryDB()
+        return SQLiteDB(str(tmp_path / "orders.db"))
+    return factory
+
+
+def run(make_db, scenario):
+    async def wrapper():
+        db = make_db()
+        await db.open()
+        await db.ensure_indexes()
+        try:
+            return await scenario(db)
+        finally:
+            await db.close()
+    return asyncio.run(wrapper())
+
+
+class TestStorageBackends:
+    """Behaviour every StorageBackend must share"""
+
+    def test_queue_claim_and_complete(self, make_db):
+        """Pending queue entries come back in FIFO order and can be completed"""
+        async def scenario(db):
+            for i in range(3):
+                await db.insert_one("orders_queue", {"order_id": f"ORD-{i}", "status": "pending", "processed": False})
+            first = await db.find_one("orders_queue", {"processed": False})
+            await db.update_one("orders_queue", {"order_id": first["order_id"]}, {"$set": {"processed": True}})
+            await db.update_one("orders", {"order_id": first["order_id"]},
+                                {"$set": {**first, "status": "completed", "processing_time_ms": 5.0}}, upsert=True)
+            return (
+                first["order_id"],
+                (await db.find_one("orders_queue", {"processed": False}))["order_id"],
+                await db.count_documents("orders_queue", {"processed": False}),
+                await db.count_documents("orders", {"status": "completed"}),
+                (await db.find_one("orders", {"order_id": "ORD-0"}))["status"],
+            )
+
+        assert run(make_db, scenario) == ("ORD-0", "ORD-1", 2, 1, "completed")
+
+    def test_complete_orders_in_bulk(self, make_db):
+        """Bulk completion writes orders, queue flags, events and outbox rows"""
+        async def scenario(db):
+            for i in range(3):
+                await db.insert_one("orders_queue", {"order_id": f"ORD-{i}", "status": "pending", "processed": False})
+            claimed = await db.claim_orders("worker-0", 2)
+            skipped = await db.complete_orders([
+                ({**doc, "status": "completed", "processing_time_ms": 4.0},
+                 {"event_id": f"EVT-{doc['order_id']}", "order_id": doc["order_id"], "event_type": "order_completed"},
+                 [outbox_message("order-events", doc["order_id"], {"order_id": doc["order_id"]})])
+                for doc in claimed
+            ], "worker-0")
+            return (
+                skipped,
+                await db.count_documents("orders", {"status": "completed"}),
+                await db.count_documents("orders_queue", {"processed": False}),
+                [doc["order_id"] for doc in await db.claim_orders("worker-1", 5)],
+                len(await db.outbox_pending(10)),
+            )
+
+        assert run(make_db, scenario) == ([], 2, 1, ["ORD-2"], 2)
+
+    def test_complete_orders_fenced_by_claim(self, make_db):
+        """A worker cannot complete an order whose lease passed to another worker, or one already completed"""
+        async def scenario(db):
+            for i in range(2):
+                await db.insert_one("orders_queue", {"order_id": f"ORD-{i}", "status": "pending", "processed": False})
+            claimed = await db.claim_orders("worker-0", 1, lease_sec=0.01)
+            claimed += await db.claim_orders("worker-0", 1, lease_sec=30)
+            await asyncio.sleep(0.05)
+            # ORD-0's lease lapsed and the order passed to worker-1
+            await db.claim_orders("worker-1", 1)
+            entries = [({**doc, "status": "completed"}, {"order_id": doc["order_id"], "event_type": "order_completed"},
+                        [outbox_message("order-events", doc["order_id"], {"order_id": doc["order_id"]})])
+                       for doc in claimed]
+            stale = await db.complete_orders(entries, "worker-0")
+            repeated = await db.complete_orders(entries[1:], "worker-0")
+            return (
+                stale,
+                repeated,
+                await db.count_documents("orders", {"status": "completed"}),
+                (await db.find_one("orders_queue", {"order_id": "ORD-0"}))["processed"],
+                len(await db.outbox_pending(10)),
+                await db.complete_orders(entries[:1], "worker-1"),
+            )
+
+        assert run(make_db, scenario) == (["ORD-0"], ["ORD-1"], 1, False, 1, [])
+
+    def test_concurrent_claims_never_overlap(self, make_db):
+        """Workers claiming at once each get distinct entries, oldest first"""
+        async def scenario(db):
+            for i in range(10):
+                await db.insert_one("orders_queue", {"order_id": f"ORD-{i}", "status": "pending", "processed": False})
+            claims = await asyncio.gather(*(db.claim_orders(f"worker-{w}", 3) for w in range(4)))
+            claimed = sorted(doc["order_id"] for docs in claims for doc in docs)
+            unclaimed = await db.find_one("orders_queue", {"processed": False})
+
+            released = claims[0][0]["order_id"]
+            await db.update_one("orders_queue", {"order_id": claims[1][0]["order_id"]}, {"$set": {"processed": True}})
+            return (
+                claimed,
+                unclaimed,
+                await db.release_order(released, "worker-1"),
+                await db.release_order(released, "worker-0"),
+                await db.release_order(claims[1][0]["order_id"], "worker-1"),
+                [doc["order_id"] for doc in await db.claim_orders("worker-9", 5)],
+            )
+
+        claimed, unclaimed, not_holder, released, processed_release, reclaimed = run(make_db, scenario)
+        assert claimed == [f"ORD-{i}" for i in range(10)]
+        assert unclaimed is None
+        assert (not_holder, released, processed_release) == (False, True, False)
+        assert len(reclaimed) == 1
+
+    def test_expired_lease_and_retry_delay(self, make_db):
+        """Leased entries return once the lease expires; delayed releases wait"""
+        async def scenario(db):
+            for i in range(2):
+                await db.insert_one("orders_queue", {"order_id": f"ORD-{i}", "status": "pending", "processed": False})
+            first = [doc["attempts"] for doc in await db.claim_orders("worker-0", 2, lease_sec=0.05)]
+            held = await db.claim_orders("worker-1", 2)
+            await asyncio.sleep(0.1)
+            reclaimed = await db.claim_orders("worker-1", 2, lease_sec=30)
+            # The first worker's lease is gone, so its release is ignored
+            stale = await db.release_order("ORD-0", "worker-0")
+            await db.release_order("ORD-0", "worker-1", delay_sec=0.1)
+            delayed = await db.claim_orders("worker-2", 2)
+            await asyncio.sleep(0.15)
+            return (
+                first,
+                held,
+                [(doc["order_id"], doc["attempts"]) for doc in reclaimed],
+                stale,
+                delayed,
+                [(doc["order_id"], doc["attempts"]) for doc in await db.claim_orders("worker-2", 2)],
+            )
+
+        assert run(make_db, scenario) == ([1, 1], [], [("ORD-0", 2), ("ORD-1", 2)], False, [],
+                                         [("ORD-0", 3)])
+
+    def test_renew_leases(self, make_db):
+        """Renewing keeps a claim past its first lease; only held entries renew"""
+        async def scenario(db):
+            for i in range(3):
+                await db.insert_one("orders_queue", {"order_id": f"ORD-{i}", "status": "pending", "processed": False})
+            await db.claim_orders("worker-0", 2, lease_sec=0.1)
+            await db.update_one("orders_queue", {"order_id": "ORD-1"}, {"$set": {"processed": True}})
+            renewed = await db.renew_leases("worker-0", ["ORD-0", "ORD-1", "ORD-2"], lease_sec=30)
+            await asyncio.sleep(0.15)
+            return renewed, [doc["order_id"] for doc in await db.claim_orders("worker-1", 5)]
+
+        assert run(make_db, scenario) == (["ORD-0"], ["ORD-2"])
+
+    def test_dead_letter_and_requeue(self, make_db):
+        """A dead-lettered entry leaves the queue until requeued with fresh attempts"""
+        async def scenario(db):
+            for i in range(2):
+                await db.insert_one("orders_queue", {"order_id": f"ORD-{i}", "status": "pending", "processed": False})
+            await db.claim_orders("worker-0", 1)
+            not_holder = await db.dead_letter_order("ORD-0", "worker-1", "RuntimeError: boom")
+            record = await db.dead_letter_order("ORD-0", "worker-0", "RuntimeError: boom")
+            again = await db.dead_letter_order("ORD-0", "worker-0", "RuntimeError: boom")
+            letters = await db.find_dead_letters(10)
+            pending = await db.count_documents("orders_queue", {"processed": False})
+            entry = await db.requeue_dead_letter("ORD-0")
+            return (
+                not_holder,
+                (record["order_id"], record["attempts"], record["error"], record["order"]["status"]),
+                again,
+                [letter["order_id"] for letter in letters],
+                pending,
+                (entry["order_id"], entry["processed"]),
+                await db.requeue_dead_letter("ORD-0"),
+                await db.count_documents("dead_letters"),
+                [(doc["order_id"], doc["attempts"]) for doc in await db.claim_orders("worker-1", 5)],
+            )
+
+        assert run(make_db, scenario) == (
+            None, ("ORD-0", 1, "RuntimeError: boom", "pending"), None, ["ORD-0"], 1, ("ORD-0", False), None, 0,
+            [("ORD-1", 1), ("ORD-0", 1)],
+        )
+
+    def test_update_without_upsert_misses(self, make_db):
+        """Updating an unknown order without upsert modifies nothing"""
+        async def scenario(db):
+            result = await db.update_one("orders", {"order_id": "ORD-404"}, {"$set": {"status": "failed"}})
+            return result.modified_count, await db.find_one("orders", {"order_id": "ORD-404"})
+
+        assert run(make_db, scenario) == (0, None)
+
+    def test_order_upsert_from_queue_entry(self, make_db):
+        """Upserting an order straight from its queue entry leaves the queue flag behind"""
+        async def scenario(db):
+            entry = {"order_id": "ORD-1", "status": "completed", "processed": False}
+            await db.insert_one("orders_queue", entry)
+            await db.update_one("orders", {"order_id": "ORD-1"}, {"$set": entry}, upsert=True)
+            return "processed" in await db.find_one("orders", {"order_id": "ORD-1"})
+
+        assert run(make_db, scenario) is False
+
+    def test_ingest_orders_batch(self, make_db):
+        """Bulk ingest inserts new keys once and reports existing ones"""
+        async def scenario(db):
+            await db.insert_one("idempotency_keys", {"key": "k-0", "order_id": "ORD-0"})
+            entries = [
+                ({"key": f"k-{i}", "order_id": f"ORD-{i + 1}"},
+                 {"order_id": f"ORD-{i + 1}", "status": "pending", "processed": False},
+                 [outbox_message("orders", f"ORD-{i + 1}", {"order_id": f"ORD-{i + 1}"})])
+                for i in (0, 1, 1)
+            ]
+            results = await db.ingest_orders(entries)
+            return (
+                [r["order_id"] if r else None for r in results],
+                await db.count_documents("orders_queue", {"processed": False}),
+                (await db.find_one("orders_queue", {"processed": False}))["order_id"],
+                [row["key"] for row in await db.outbox_pending(10)],
+            )
+
+        assert run(make_db, scenario) == (["ORD-0", None, "ORD-2"], 1, "ORD-2", ["ORD-2"])
+
+    def test_outbox_delivery_cycle(self, make_db):
+        """Outbox rows are written with their document and drained in order"""
+        async def scenario(db):
+            for i in range(3):
+                await db.insert_one("order_events", {"order_id": f"ORD-{i}", "timestamp": "2026-01-01T00:00:00+00:00"},
+                                    outbox=[outbox_message("order-events", f"ORD-{i}", {"n": i}, {"event_type": "x"})])
+            pending = await db.outbox_pending(2)
+            await db.outbox_mark_failed([row["seq"] for row in pending])
+            await db.outbox_mark_delivered([pending[0]["seq"]])
+            remaining = await db.outbox_pending(10)
+            stats = await db.outbox_stats()
+            removed = await db.compact(RetentionPolicy(), budget=10)
+            return ([r["key"] for r in pending], [(r["key"], r["attempts"], r["headers"]) for r in remaining],
+                    stats["pending"], removed["outbox"], remaining[0]["value"])
+
+        assert run(make_db, scenario) == (
+            ["ORD-0", "ORD-1"], [("ORD-1", 1, {"event_type": "x"}), ("ORD-2", 0, {"event_type": "x"})],
+            2, 1, '{"n":1}',
+        )
+
+    def test_idempotency_keys_and_listing(self, make_db):
+        """Idempotency keys round-trip and to_list returns the newest orders"""
+        async def scenario(db):
+            await db.insert_one("idempotency_keys", {"key": "k-1", "order_id": "ORD-1"})
+            for i in range(5):
+                await db.update_one("orders", {"order_id": f"ORD-{i}"}, {"$set": {"order_id": f"ORD-{i}"}}, upsert=True)
+            latest = await db.to_list("orders", 2)
+            return (await db.find_one("idempotency_keys", {"key": "k-1"}))["order_id"], [o["order_id"] for o in latest]
+
+        assert run(make_db, scenario) == ("ORD-1", ["ORD-3", "ORD-4"])
+
+    def test_compact_removes_processed_entries(self, make_db):
+        """Retention removes processed queue entries past their grace period"""
+        async def scenario(db):
+            await db.insert_one("orders_queue", {"order_id": "ORD-1", "processed": False})
+            await db.insert_one("orders_queue", {"order_id": "ORD-2", "processed": False})
+            await db.update_one("orders_queue", {"order_id": "ORD-1"}, {"$set": {"processed": True}})
+            policy = RetentionPolicy(queue_retention_sec=1)
+            removed = await db.compact(policy, budget=10, now=float("inf"))
+            return removed["orders_queue"], await db.count_documents("orders_queue")
+
+        assert run(make_db, scenario) == (1, 1)
+
+    def test_orders_page_keyset(self, make_db):
+        """Pages walk the created_at index forwards and backwards"""
+        async def scenario(db):
+            for i in range(5):
+                await db.update_one("orders", {"order_id": f"ORD-{i}"}, {"$set": {
+                    "order_id": f"ORD-{i}",
+                    "status": "failed" if i == 2 else "completed",
+                    "created_at": f"2026-01-01T00:00:0{i}+00:00",
+                }}, upsert=True)
+            first, more = await db.find_orders_page(2)
+            second, _ = await db.find_orders_page(2, after=order_sort_key(first[-1]))
+            back, _ = await db.find_orders_page(2, before=order_sort_key(second[0]))
+            failed, _ = await db.find_orders_page(10, status="failed")
+            window, _ = await db.find_orders_page(10, created_from=1767225601.0, created_to=1767225602.0,
+                                                  descending=False)
+            ids = lambda docs: [d["order_id"] for d in docs]  # noqa: E731
+            return ids(first), more, ids(second), ids(back), ids(failed), ids(window)
+
+        assert run(make_db, scenario) == (
+            ["ORD-4", "ORD-3"], True, ["ORD-2", "ORD-1"], ["ORD-4", "ORD-3"], ["ORD-2"], ["ORD-1", "ORD-2"],
+        )
+
+    def test_search_orders(self, make_db):
+        """Search combines customer, status and time filters and pages with a cursor"""
+        async def scenario(db):
+            for i in range(6):
+                await db.update_one("orders", {"order_id": f"ORD-{i}"}, {"$set": {
+                    "order_id": f"ORD-{i}",
+                    "customer_id": "CUST-A" if i % 2 == 0 else "CUST-B",
+                    "status": "failed" if i == 4 else "completed",
+                    "created_at": f"2026-01-01T00:0{i}:00+00:00",
+                }}, upsert=True)
+            history, more = await db.search_orders(2, customer_id="CUST-A")
+            rest, _ = await db.search_orders(2, customer_id="CUST-A", after=order_sort_key(history[-1]))
+            failed, _ = await db.search_orders(10, customer_id="CUST-A", status="failed")
+            window, _ = await db.search_orders(10, created_from=1767225660.0, created_to=1767225780.0,
+                                               descending=False)
+            nobody, _ = await db.search_orders(10, customer_id="CUST-Z")
+            ids = lambda docs: [d["order_id"] for d in docs]  # noqa: E731
+            return (ids(history), more, ids(rest), ids(failed), ids(window), nobody,
+                    await db.count_documents("orders", {"status": "completed"}))
+
+        assert run(make_db, scenario) == (
+            ["ORD-4", "ORD-2"], True, ["ORD-0"], ["ORD-4"], ["ORD-1", "ORD-2", "ORD-3"], [], 5,
+        )
+
+    def test_search_follows_status_changes(self, make_db):
+        """An order moves between status results when its status changes"""
+        async def scenario(db):
+            await db.update_one("orders", {"order_id": "ORD-1"}, {"$set": {
+                "order_id": "ORD-1", "customer_id": "CUST-A", "status": "processing",
+                "created_at": "2026-01-01T00:00:00+00:00",
+            }}, upsert=True)
+            await db.update_one("orders", {"order_id": "ORD-1"}, {"$set": {"status": "completed"}})
+            processing, _ = await db.search_orders(10, status="processing")
+            completed, _ = await db.search_orders(10, status="completed")
+            page, _ = await db.find_orders_page(10, status="processing")
+            completed_page, _ = await db.find_orders_page(10, status="completed")
+            return (len(processing), [d["order_id"] for d in completed],
+                    len(page), [d["order_id"] for d in completed_page])
+
+        assert run(make_db, scenario) == (0, ["ORD-1"], 0, ["ORD-1"])
+
+
+class TestOrderRecord:
+    """Test suite for the compact in-memory order representation"""
+
+    def test_round_trip(self):
+        """A document survives conversion to a record and back"""
+        doc = {
+            "order_id": "ORD-1",
+            "customer_id": "CUST-1",
+            "customer_name": "Test Customer",
+            "items": [{"product_id": "PROD-1", "name": "Widget", "quantity": 2, "price": 25.5}],
+            "subtotal": 51.0,
+            "tax": 5.1,
+            "total": 56.1,
+            "status": "completed",
+            "idempotency_key": "key-1",
+            "created_at": "2026-01-01T00:00:00.123456+00:00",
+            "updated_at": "2026-01-01T00:00:01+00:00",
+            "processing_time_ms": 12.5,
+        }
+        assert OrderRecord.from_doc(doc).to_doc() == doc
+
+    def test_unknown_fields_kept_as_extras(self):
+        """Fields outside the order schema are preserved"""
+        record = OrderRecord.from_doc({"order_id": "ORD-1", "retries": 2})
+        assert record.to_doc()["retries"] == 2
+
+
+class TestOrderIndexes:
+    """Test suite for the in-memory secondary indexes"""
+
+    def test_match_intersects_sets(self):
+        """Equality filters intersect; unknown values match nothing"""
+        indexes = OrderIndexes(bucket_sec=60)
+        indexes.reindex("ORD-1", None, ("CUST-A", "completed", 0.0))
+        indexes.reindex("ORD-2", None, ("CUST-A", "failed", 30.0))
+        indexes.reindex("ORD-3", None, ("CUST-B", "completed", 90.0))
+        assert indexes.match(customer_id="CUST-A", status="completed") == {"ORD-1"}
+        assert indexes.match(status="completed", created_from=60.0) == {"ORD-3"}
+        assert indexes.match(customer_id="CUST-Z") == set()
+
+    def test_reindex_moves_between_buckets(self):
+        """Emptied index entries are dropped"""
+        indexes = OrderIndexes(bucket_sec=60)
+        indexes.reindex("ORD-1", None, ("CUST-A", "pending", 0.0))
+        indexes.reindex("ORD-1", ("CUST-A", "pending", 0.0), ("CUST-A", "completed", 120.0))
+        assert indexes.by_status == {"completed": {"ORD-1"}}
+        assert indexes.by_bucket == {2: {"ORD-1"}}
+        assert indexes.window(0.0, 60.0) == []
@@ -0,0 +1,245 @@
+"""
+Unit tests for the order worker pool
+Run with: pytest backend/test_worker_pool.py -v
+"""
+
+import asyncio
+
+from storage import InMemoryDB
+from worker_pool import WorkerPool
+
+
+async def fill(db, count):
+    for i in range(count):
+        await db.insert_one("orders_queue", {"order_id": f"ORD-{i}", "status": "pending", "processed": False})
+
+
+def make_processor(db, seen, delay=0.01, fail=(), batches=None):
+    async def process(orders, worker_id):
+        for order in orders:
+            if order["order_id"] in fail:
+                fail.discard(order["order_id"])
+                raise RuntimeError("simulated failure")
+        await asyncio.sleep(delay)
+        if batches is not None:
+            batches.append(len(orders))
+        seen.extend(order["order_id"] for order in orders)
+        await db.complete_orders([(order, {"order_id": order["order_id"]}, []) for order in orders], worker_id)
+    return process
+
+
+async def drain(db, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while await db.count_documents("orders_queue", {"processed": False}):
+        assert asyncio.get_running_loop().time() < deadline, "queue did not drain"
+        await asyncio.sleep(0.01)
+
+
+class TestWorkerPool:
+    """Test suite for WorkerPool"""
+
+    def test_each_order_processed_once(self):
+        """Concurrent workers share the queue without processing an order twice"""
+        async def scenario():
+            db = InMemoryDB()
+            await fill(db, 40)
+            seen = []
+            pool = WorkerPool(db, make_processor(db, seen), size=8, idle_poll_sec=0.01)
+            pool.start()
+            await drain(db)
+            stats = pool.stats
+            await pool.stop()
+            return seen, stats
+
+        seen, stats = asyncio.run(scenario())
+        assert sorted(seen) == sorted(f"ORD-{i}" for i in range(40))
+        assert stats["processed"] == 40
+        assert stats["running"] == 8
+        assert sum(1 for w in stats["workers"].values() if w["processed"]) > 1
+
+    def test_resize_at_runtime(self):
+        """Growing adds workers at once; shrinking retires surplus workers"""
+        async def scenario():
+            db = InMemoryDB()
+            pool = WorkerPool(db, make_processor(db, []), size=2, idle_poll_sec=0.01)
+            pool.start()
+            pool.resize(5)
+            grown = pool.stats["running"]
+            pool.resize(1)
+            await asyncio.sleep(0.05)
+            shrunk = pool.stats
+            await pool.stop()
+            return grown, shrunk["size"], shrunk["running"], shrunk["resizes"]
+
+        assert asyncio.run(scenario()) == (5, 1, 1, 2)
+
+    def test_failed_order_released_and_retried(self):
+        """An order whose processing raises goes back to the queue"""
+        async def scenario():
+            db = InMemoryDB()
+            await fill(db, 3)
+            seen = []
+            pool = WorkerPool(db, make_processor(db, seen, fail={"ORD-1"}), size=2,
+                              idle_poll_sec=0.01, retry_base_sec=0.01)
+            pool.start()
+            await drain(db)
+            stats = pool.stats
+            await pool.stop()
+            return sorted(seen), stats["processed"], stats["failed"], stats["retries"]
+
+        assert asyncio.run(scenario()) == (["ORD-0", "ORD-1", "ORD-2"], 3, 1, 1)
+
+    def test_busy_and_idle_time(self):
+        """Per-worker stats split wall time into busy and idle"""
+        async def scenario():
+            db = InMemoryDB()
+            await fill(db, 2)
+            pool = WorkerPool(db, make_processor(db, [], delay=0.05), size=1, idle_poll_sec=0.01)
+            pool.start()
+            await drain(db)
+            await asyncio.sleep(0.05)
+            worker = pool.stats["workers"]["worker-0"]
+            await pool.stop()
+            return worker
+
+        worker = asyncio.run(scenario())
+        assert worker["state"] == "idle"
+        assert worker["busy_sec"] >= 0.09
+        assert worker["idle_sec"] >= 0.04
+        assert 0 < worker["utilization"] < 1
+
+    def test_notify_wakes_idle_worker(self):
+        """A notified order is picked up at once, not at the next poll"""
+        async def scenario():
+            db = InMemoryDB()
+            seen = []
+            pool = WorkerPool(db, make_processor(db, seen, delay=0), size=2, idle_poll_sec=30)
+            pool.start()
+            await asyncio.sleep(0.01)
+            waiting = pool.stats["waiting"]
+
+            await fill(db, 1)
+            pool.notify()
+            await drain(db, timeout=0.5)
+            stats = pool.stats
+            await pool.stop()
+            return waiting, seen, stats["wakeups"], stats["idle_polls"]
+
+        assert asyncio.run(scenario()) == (2, ["ORD-0"], 1, 0)
+
+    def test_batch_claiming(self):
+        """Workers claim up to batch_size orders and complete them together"""
+        async def scenario():
+            db = InMemoryDB()
+            await fill(db, 25)
+            seen, batches = [], []
+            pool = WorkerPool(db, make_processor(db, seen, batches=batches), size=2, batch_size=10,
+                              idle_poll_sec=0.01)
+            pool.start()
+            await drain(db)
+            stats = pool.stats
+            await pool.stop()
+            return sorted(seen), sorted(batches), stats["batches"], len(db.order_events)
+
+        seen, batches, batch_count, events = asyncio.run(scenario())
+        assert seen == sorted(f"ORD-{i}" for i in range(25))
+        assert batches == [5, 10, 10]
+        assert (batch_count, events) == (3, 25)
+
+    def test_poison_order_dead_lettered(self):
+        """An order failing every attempt is dead-lettered while the rest of its batch completes"""
+        async def scenario():
+            db = InMemoryDB()
+            await fill(db, 10)
+            seen, dead = [], []
+
+            async def process(orders, worker_id):
+                if any(order["order_id"] == "ORD-3" for order in orders):
+                    raise RuntimeError("bad order")
+                await make_processor(db, seen, delay=0)(orders, worker_id)
+
+            async def on_dead_letter(record):
+                dead.append(record)
+
+            pool = WorkerPool(db, process, size=2, batch_size=5, idle_poll_sec=0.01, max_attempts=3,
+                              retry_base_sec=0.01, on_dead_letter=on_dead_letter)
+            pool.start()
+            await drain(db)
+            stats = pool.stats
+            await pool.stop()
+            return sorted(seen), dead, stats, await db.find_dead_letters(10)
+
+        seen, dead, stats, letters = asyncio.run(scenario())
+        assert seen == sorted(f"ORD-{i}" for i in range(10) if i != 3)
+        assert [(r["order_id"], r["attempts"], r["error"]) for r in dead] == [("ORD-3", 3, "RuntimeError: bad order")]
+        assert [letter["order_id"] for letter in letters] == ["ORD-3"]
+        assert (stats["retries"], stats["dead_lettered"], stats["failed"]) == (2, 1, 3)
+
+    def test_serial_retry_keeps_lease(self):
+        """Retrying a failed batch one order at a time renews the leases, so no order runs twice"""
+        async def scenario():
+            db = InMemoryDB()
+            await fill(db, 5)
+            seen, stolen = [], []
+
+            async def process(orders, worker_id):
+                if len(orders) > 1:
+                    await asyncio.sleep(0.15)
+                    raise RuntimeError("batch failed")
+                await make_processor(db, seen, delay=0.05)(orders, worker_id)
+
+            pool = WorkerPool(db, process, size=1, batch_size=5, idle_poll_sec=0.01, lease_sec=0.2)
+            pool.start()
+            await asyncio.sleep(0.02)
+            # Another instance claiming whatever a lapsed lease lets go of
+            while await db.count_documents("orders_queue", {"processed": False}):
+                stolen.extend(doc["order_id"] for doc in await db.claim_orders("rival", 5, lease_sec=30))
+                await asyncio.sleep(0.01)
+            stats = pool.stats
+            await pool.stop()
+            return seen, stolen, stats["processed"], stats["failed"]
+
+        assert asyncio.run(scenario()) == ([f"ORD-{i}" for i in range(5)], [], 5, 0)
+
+    def test_slow_batch_keeps_lease(self):
+        """A batch taking several leases to process keeps its orders through the heartbeat"""
+        async def scenario():
+            db = InMemoryDB()
+            await fill(db, 5)
+            seen, stolen = [], []
+            pool = WorkerPool(db, make_processor(db, seen, delay=0.5), size=1, batch_size=5,
+                              idle_poll_sec=0.01, lease_sec=0.2)
+            pool.start()
+            await asyncio.sleep(0.02)
+            deadline = asyncio.get_running_loop().time() + 2.0
+            while (await db.count_documents("orders_queue", {"processed": False})
+                   and asyncio.get_running_loop().time() < deadline):
+                stolen.extend(doc["order_id"] for doc in await db.claim_orders("rival", 5, lease_sec=30))
+                await asyncio.sleep(0.01)
+            stats = pool.stats
+            await pool.stop()
+            return seen, stolen, stats["processed"]
+
+        assert asyncio.run(scenario()) == ([f"ORD-{i}" for i in range(5)], [], 5)
+
+    def test_retry_backoff_is_bounded(self):
+        """Retry delays double per attempt up to the cap, with jitter below them"""
+        pool = WorkerPool(InMemoryDB(), make_processor(None, []), retry_base_sec=1, retry_max_sec=10)
+        for attempts, ceiling in ((1, 1), (2, 2), (3, 4), (4, 8), (5, 10), (20, 10)):
+            assert ceiling / 2 <= pool.retry_delay(attempts) <= ceiling
+
+    def test_expired_lease_dead_lettered_after_max_attempts(self):
+        """An order whose lease keeps expiring is dead-lettered without another run"""
+        async def scenario():
+            db = InMemoryDB()
+            await fill(db, 1)
+            for _ in range(2):  # two workers that died holding the order
+                await db.claim_orders("gone", 1, lease_sec=0)
+            seen = []
+            pool = WorkerPool(db, make_processor(db, seen), size=1, idle_poll_sec=0.01, max_attempts=2)
+            pool.start()
+            await drain(db)
+            await pool.stop()
+            return seen, [(r["order_id"], r["attempts"]) for r in await db.find_dead_letters(10)]
+
+        assert asyncio.run(scenario()) == ([], [("ORD-0", 3)])
@@ -0,0 +1,217 @@
+"""
+Kafka Wire Format for SwiftCart Order Manager
+Messages on the five topics are JSON by default. The optional compact
+format drops the repeated field names: each topic has a versioned schema
+(an ordered field list), a message is encoded as the list of its values
+in schema order, and that list is packed with msgpack when it is
+installed (a JSON array otherwise).
+
+Compact payloads start with a 4-byte prefix (magic, body format, schema
+id, schema version), which JSON never does, so `decode` reads both
+formats without looking at headers and consumers can be upgraded before
+producers switch. Every message also carries `content-type` and
+`schema-version` headers for consumers outside this codebase.
+
+Schemas only ever gain versions: a new version is a new field list, and
+old versions stay registered so messages already on a topic still decode.
+Fields missing from a message decode as None; keys the schema does not
+know travel in a trailing dict and decode unchanged.
+"""
+
+import os
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+import codec
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = 'json'
+COMPACT = 'compact'
+FORMATS = (JSON, COMPACT)
+
+MAGIC = 0
+BODY_MSGPACK = 1
+BODY_JSON = 2
+_PREFIX = struct.Struct('>BBBB')  # magic, body format, schema id, version
+
+Headers = List[Tuple[str, bytes]]
+
+
+class Layout:
+    """
+    Field order of one schema version. `nested` maps a field to the Layout
+    of its dict value, or to a one-element list holding the Layout of the
+    dicts in its list value.
+    """
+
+    def __init__(self, fields, nested: Optional[Dict[str, Any]] = None):
+        self.fields = tuple(fields)
+        self.nested = nested or {}
+        self._known = frozenset(self.fields)
+        self._nested_at = [(self.fields.index(field), layout) for field, layout in self.nested.items()]
+
+    def pack(self, doc: Dict[str, Any]) -> list:
+        values = [doc.get(field) for field in self.fields]
+        for i, layout in self._nested_at:
+            value = values[i]
+            if value is None:
+                continue
+            if isinstance(layout, list):
+                values[i] = [layout[0].pack(v) for v in value]
+            else:
+                values[i] = layout.pack(value)
+        if not self._known.issuperset(doc):
+            values.append({k: v for k, v in doc.items() if k not in self._known})
+        return values
+
+    def unpack(self, values: list) -> Dict[str, Any]:
+        doc = dict(zip(self.fields, values))
+        if len(values) > len(self.fields):
+            doc.update(values[-1])
+        for field, layout in self.nested.items():
+            value = doc.get(field)
+            if value is None:
+                continue
+            if isinstance(layout, list):
+                doc[field] = [layout[0].unpack(v) for v in value]
+            else:
+                doc[field] = layout.unpack(value)
+        return doc
+
+
+class Schema:
+    """A topic's message schema: every registered version, by number."""
+
+    def __init__(self, schema_id: int, name: str, versions: Dict[int, Layout]):
+        self.schema_id = schema_id
+        self.name = name
+        self.versions = versions
+        self.version = max(versions)
+        self.layout = versions[self.version]
+        self.version_header = str(self.version).encode('utf-8')
+
+
+ORDER_ITEM = Layout(('product_id', 'name', 'quantity', 'price'))
+
+# Keyed by topic name (see kafka_config.TOPIC_*). Schema ids are part of
+# the wire format and must never be reused.
+SCHEMAS: Dict[str, Schema] = {
+    'orders': Schema(1, 'order', {
+        1: Layout(('order_id', 'customer_id', 'customer_name', 'items', 'subtotal', 'tax', 'total',
+                   'status', 'idempotency_key', 'created_at', 'updated_at', 'processing_time_ms',
+                   'processed'),
+                  nested={'items': [ORDER_ITEM]}),
+    }),
+    'order-events': Schema(2, 'order-event', {
+        1: Layout(('event_id', 'order_id', 'event_type', 'timestamp', 'data'),
+                  nested={'data': Layout(('status', 'processing_time_ms'))}),
+    }),
+    'inventory-events': Schema(3, 'inventory-event', {
+        1: Layout(('service', 'order_id', 'event_type', 'success', 'items', 'processing_time_ms',
+                   'timestamp'),
+                  nested={'items': [Layout(('product_id', 'quantity', 'status', 'warehouse'))]}),
+    }),
+    'payment-events': Schema(4, 'payment-event', {
+        1: Layout(('service', 'order_id', 'event_type', 'success', 'amount', 'payment_method',
+                   'transaction_id', 'processing_time_ms', 'timestamp')),
+    }),
+    'notification-events': Schema(5, 'notification-event', {
+        1: Layout(('service', 'order_id', 'event_type', 'success', 'notifications',
+                   'processing_time_ms', 'timestamp')),
+    }),
+}
+_BY_ID = {schema.schema_id: schema for schema in SCHEMAS.values()}
+
+_JSON_TYPE = ('content-type', b'application/json')
+_COMPACT_TYPE = ('content-type', b'application/x-swiftcart-compact')
+
+
+def parse_topic_setting(value: str, default: str) -> Tuple[str, Dict[str, str]]:
+    """
+    Parse a per-topic setting such as "json,orders=compact": entries
+    without a topic set the default, "topic=value" entries override it.
+    """
+    overrides = {}
+    for entry in filter(None, (part.strip() for part in value.split(','))):
+        topic, sep, setting = entry.partition('=')
+        if sep:
+            overrides[topic.strip()] = setting.strip()
+        else:
+            default = entry
+    return default, overrides
+
+
+def _pack_body(values: list) -> Tuple[int, bytes]:
+    if msgpack is not None:
+        return BODY_MSGPACK, msgpack.packb(values, use_bin_type=True, default=str)
+    return BODY_JSON, codec.dumps(values)
+
+
+def decode(data: bytes) -> Any:
+    """Decode a message value in either format (the consumer deserializer)."""
+    if not data or data[0] != MAGIC:
+        return codec.loads(data)
+    _, body_format, schema_id, version = _PREFIX.unpack_from(data)
+    schema = _BY_ID.get(schema_id)
+    layout = schema.versions.get(version) if schema is not None else None
+    if layout is None:
+        raise ValueError(f"Unknown message schema {schema_id} v{version}")
+    body = memoryview(data)[_PREFIX.size:]
+    if body_format == BODY_MSGPACK:
+        if msgpack is None:
+            raise ValueError("msgpack-encoded message but msgpack is not installed")
+        values = msgpack.unpackb(body)
+    else:
+        values = codec.loads(bytes(body))
+    return layout.unpack(values)
+
+
+class WireFormat:
+    """Per-topic choice of JSON or the compact format for produced messages."""
+
+    def __init__(self, default: str = JSON, formats: Optional[Dict[str, str]] = None):
+        for value in (default, *(formats or {}).values()):
+            if value not in FORMATS:
+                raise ValueError(f"Unknown Kafka wire format '{value}' (expected one of {FORMATS})")
+        self.default = default
+        self.formats = formats or {}
+
+    @classmethod
+    def from_env(cls):
+        return cls(*parse_topic_setting(os.environ.get('KAFKA_WIRE_FORMAT', JSON), JSON))
+
+    def format_for(self, topic: str) -> str:
+        """The topic's format; compact only applies to topics with a schema."""
+        wire = self.formats.get(topic, self.default)
+        return wire if wire == JSON or topic in SCHEMAS else JSON
+
+    def _json_headers(self, topic: str) -> Headers:
+        schema = SCHEMAS.get(topic)
+        return [_JSON_TYPE, ('schema-version', schema.version_header)] if schema else [_JSON_TYPE]
+
+    def encode(self, topic: str, value: Dict[str, Any]) -> Tuple[bytes, Headers]:
+        """A message value for `topic` and the headers describing it."""
+        if self.format_for(topic) == JSON:
+            return codec.dumps(value), self._json_headers(topic)
+        schema = SCHEMAS[topic]
+        body_format, body = _pack_body(schema.layout.pack(value))
+        prefix = _PREFIX.pack(MAGIC, body_format, schema.schema_id, schema.version)
+        return prefix + body, [_COMPACT_TYPE, ('schema-version', schema.version_header)]
+
+    def transcode(self, topic: str, value) -> Tuple[bytes, Headers]:
+        """`encode` for a value that is already JSON (str or bytes), e.g. an outbox row."""
+        if self.format_for(topic) == JSON:
+            return value.encode('utf-8') if isinstance(value, str) else value, self._json_headers(topic)
+        return self.encode(topic, codec.loads(value))
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "default": self.default,
+            "topics": {topic: self.format_for(topic) for topic in SCHEMAS},
+            "compact_body": "msgpack" if msgpack is not None else "json",
+        }
@@ -0,0 +1,381 @@
+"""
+Order Worker Pool for SwiftCart Order Manager
+Runs N order processors as coroutines on the event loop. Each worker
+claims up to `batch_size` pending orders at a time from storage
+(`claim_orders`), which hands every entry to exactly one worker, so a pool
+of any size processes each order once. The pool can be resized while
+running: new workers start claiming at once, and surplus workers finish
+the order in hand before exiting. Per-worker busy and idle time is tracked
+for the health endpoint.
+
+Idle workers do not poll: they wait until ingest calls `notify`, which
+wakes one waiting worker per batch of new orders. A slow fallback poll
+covers orders that reach the queue without a notification (e.g. recovered
+at startup).
+
+Claims are leases: an order whose worker hangs or dies is handed out again
+once `lease_sec` has passed, so processing is at-least-once. While a batch
+is processed its worker renews the leases every half `lease_sec`, so a
+slow batch keeps its orders, and only the holder of an order's lease may
+complete it. A failed order is retried after an exponential backoff
+(capped at `retry_max_sec`, with jitter) while the rest of the queue keeps
+flowing; after `max_attempts` it is moved to the dead-letter collection,
+where it can be inspected and requeued.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = 256
+MAX_BATCH_SIZE = 1000
+
+IDLE = 'idle'
+BUSY = 'busy'
+STOPPING = 'stopping'
+
+
+class WorkerStats:
+    """Counters and busy/idle time of one worker."""
+
+    def __init__(self, worker_id: str, now: float):
+        self.worker_id = worker_id
+        self.state = IDLE
+        self.current_orders: List[str] = []
+        self.processed = 0
+        self.failed = 0
+        self.busy_sec = 0.0
+        self.idle_sec = 0.0
+        self.started_at = now
+        self._since = now
+        self.stopping = False
+
+    def set_state(self, state: str, order_ids: Optional[List[str]] = None, now: Optional[float] = None):
+        now = now if now is not None else time.monotonic()
+        if self.state == BUSY:
+            self.busy_sec += now - self._since
+        else:
+            self.idle_sec += now - self._since
+        self.state = state
+        self.current_orders = order_ids or []
+        self._since = now
+
+    def to_dict(self, now: float) -> Dict[str, Any]:
+        busy, idle = self.busy_sec, self.idle_sec
+        if self.state == BUSY:
+            busy += now - self._since
+        else:
+            idle += now - self._since
+        return {
+            "state": STOPPING if self.stopping and self.state != BUSY else self.state,
+            "current_orders": self.current_orders,
+            "processed": self.processed,
+            "failed": self.failed,
+            "busy_sec": round(busy, 3),
+            "idle_sec": round(idle, 3),
+            "utilization": round(busy / (busy + idle), 3) if busy + idle > 0 else 0.0,
+        }
+
+
+class WorkerPool:
+    """
+    `process` is awaited with each claimed batch (a list of queue entries,
+    each carrying its `attempts` count) and the claiming worker's id, and is
+    responsible for marking them processed as that worker (so an order whose
+    lease has passed to another worker is left to it). If a batch raises, its
+    orders are retried one by one, renewing their leases as the pass goes on,
+    so only the failing order is released for a backoff retry or, on its
+    `max_attempts`th attempt, dead-lettered; `on_dead_letter` is then awaited
+    with the dead-letter record. Idle workers wait for `notify`, or at most
+    `idle_poll_sec` before checking anyway. `error_backoff_sec` is the pause
+    after a failed claim.
+    """
+
+    def __init__(self, db, process: Callable[[List[Dict[str, Any]], str], Awaitable[None]], size: int = 4,
+                 batch_size: int = 1, idle_poll_sec: float = 5.0, error_backoff_sec: float = 1.0,
+                 lease_sec: Optional[float] = 30.0, max_attempts: int = 5, retry_base_sec: float = 1.0,
+                 retry_max_sec: float = 60.0,
+                 on_dead_letter: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None):
+        if not 0 <= size <= MAX_WORKERS:
+            raise ValueError(f"Worker pool size must be between 0 and {MAX_WORKERS}")
+        if not 1 <= batch_size <= MAX_BATCH_SIZE:
+            raise ValueError(f"Worker batch size must be between 1 and {MAX_BATCH_SIZE}")
+        if max_attempts < 1:
+            raise ValueError("Orders need at least one attempt")
+        self.db = db
+        self.process = process
+        self.size = size
+        self.batch_size = batch_size
+        self.idle_poll_sec = idle_poll_sec
+        self.error_backoff_sec = error_backoff_sec
+        self.lease_sec = lease_sec
+        self.max_attempts = max_attempts
+        self.retry_base_sec = retry_base_sec
+        self.retry_max_sec = retry_max_sec
+        self.on_dead_letter = on_dead_letter
+        self.running = False
+        self.resizes = 0
+        self._workers: Dict[str, WorkerStats] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._next_id = 0
+        # Idle workers parked in `_wait_for_work`, oldest first
+        self._waiters: Deque[Tuple[WorkerStats, asyncio.Future]] = deque()
+        # Bumped by every `notify`, so a worker can tell whether orders
+        # arrived while its (empty) claim was in flight
+        self._signals = 0
+        self.wakeups = 0
+        self.idle_polls = 0
+        self.batches = 0
+        self.retries = 0
+        self.dead_lettered = 0
+        # Totals of workers that have exited
+        self._retired_processed = 0
+        self._retired_failed = 0
+
+    @classmethod
+    def from_env(cls, db, process, on_dead_letter=None):
+        lease_sec = float(os.environ.get('ORDER_LEASE_SEC', 30))
+        return cls(
+            db, process,
+            size=int(os.environ.get('ORDER_WORKERS', 4)),
+            batch_size=int(os.environ.get('ORDER_WORKER_BATCH_SIZE', 1)),
+            idle_poll_sec=float(os.environ.get('ORDER_WORKER_IDLE_POLL_SEC', 5)),
+            lease_sec=lease_sec if lease_sec > 0 else None,
+            max_attempts=int(os.environ.get('ORDER_MAX_ATTEMPTS', 5)),
+            retry_base_sec=float(os.environ.get('ORDER_RETRY_BASE_SEC', 1)),
+            retry_max_sec=float(os.environ.get('ORDER_RETRY_MAX_SEC', 60)),
+            on_dead_letter=on_dead_letter,
+        )
+
+    def start(self):
+        self.running = True
+        self._spawn(self.size)
+        logger.info(f"Order worker pool started with {self.size} workers")
+
+    def _spawn(self, count: int):
+        for _ in range(count):
+            worker_id = f"worker-{self._next_id}"
+            self._next_id += 1
+            self._workers[worker_id] = WorkerStats(worker_id, time.monotonic())
+            self._tasks[worker_id] = asyncio.create_task(self._run(self._workers[worker_id]))
+
+    def resize(self, size: int) -> int:
+        """Set the number of workers; returns the previous size."""
+        if not 0 <= size <= MAX_WORKERS:
+            raise ValueError(f"Worker pool size must be between 0 and {MAX_WORKERS}")
+        previous, self.size = self.size, size
+        if not self.running:
+            return previous
+        active = [w for w in self._workers.values() if not w.stopping]
+        if size > len(active):
+            self._spawn(size - len(active))
+        else:
+            # Retire the newest workers once their current order is done; idle
+            # ones are woken to exit. Not cancelled: a claim in flight would be
+            # left with no worker.
+            for worker in active[size:]:
+                worker.stopping = True
+            for worker, waiter in self._waiters:
+                if worker.stopping and not waiter.done():
+                    waiter.set_result(None)
+        self.resizes += 1
+        logger.info(f"Order worker pool resized from {previous} to {size}")
+        return previous
+
+    def set_batch_size(self, batch_size: int):
+        """Change how many orders a worker claims at once (from its next claim)."""
+        if not 1 <= batch_size <= MAX_BATCH_SIZE:
+            raise ValueError(f"Worker batch size must be between 1 and {MAX_BATCH_SIZE}")
+        self.batch_size = batch_size
+
+    def notify(self, count: int = 1):
+        """Wake enough idle workers to claim `count` newly queued orders."""
+        self._signals += 1
+        count = -(-count // self.batch_size)
+        while count > 0 and self._waiters:
+            _, waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self.wakeups += 1
+                count -= 1
+
+    async def _wait_for_work(self, worker: WorkerStats, signals: int):
+        if self._signals != signals:
+            return  # orders were queued since the claim began
+        entry = (worker, asyncio.get_running_loop().create_future())
+        self._waiters.append(entry)
+        try:
+            await asyncio.wait_for(entry[1], self.idle_poll_sec)
+        except asyncio.TimeoutError:
+            self.idle_polls += 1
+        finally:
+            if entry in self._waiters:  # timed out or cancelled, not notified
+                self._waiters.remove(entry)
+
+    def retry_delay(self, attempts: int) -> float:
+        """Backoff before retrying an order that failed its `attempts`th attempt."""
+        delay = min(self.retry_max_sec, self.retry_base_sec * 2 ** (attempts - 1))
+        # Jitter spreads out retries of orders that failed together
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _retry_later(self, worker: WorkerStats, order: Dict[str, Any], error: str):
+        attempts = order.get("attempts", 1)
+        if attempts >= self.max_attempts:
+            await self._dead_letter(worker, order, error)
+            return
+        delay = self.retry_delay(attempts)
+        if not await self.db.release_order(order["order_id"], worker.worker_id, delay):
+            return  # the lease expired and another worker holds the order now
+        self.retries += 1
+        logger.warning(f"Order {order['order_id']} failed attempt {attempts}/{self.max_attempts} ({error}); "
+                       f"retrying in {delay:.1f}s")
+        # Wake a worker when the order becomes claimable again
+        asyncio.get_running_loop().call_later(delay, self.notify)
+
+    async def _dead_letter(self, worker: WorkerStats, order: Dict[str, Any], error: str):
+        record = await self.db.dead_letter_order(order["order_id"], worker.worker_id, error)
+        if record is None:
+            return  # the lease expired and another worker claimed or completed the order
+        self.dead_lettered += 1
+        logger.error(f"Order {order['order_id']} dead-lettered after {record['attempts']} attempts: {error}")
+        if self.on_dead_letter is not None:
+            try:
+                await self.on_dead_letter(record)
+            except Exception as e:
+                logger.error(f"Error handling dead-lettered order {order['order_id']}: {e}")
+
+    async def _process_claimed(self, worker: WorkerStats, orders: List[Dict[str, Any]]):
+        order_ids = [order["order_id"] for order in orders]
+        worker.set_state(BUSY, order_ids)
+        self.batches += 1
+        try:
+            await self._process_with_heartbeat(worker, orders)
+            worker.processed += len(orders)
+            worker.set_state(IDLE)
+        except Exception as e:
+            worker.set_state(IDLE)
+            if len(orders) > 1:
+                # Find the failing order(s) without holding back the rest
+                logger.warning(f"Batch of {len(orders)} orders failed on {worker.worker_id} ({e}); "
+                               f"retrying them one at a time")
+                await self._process_one_at_a_time(worker, orders)
+                return
+            worker.failed += 1
+            logger.error(f"Error processing order {order_ids[0]} on {worker.worker_id}: {e}")
+            await self._retry_later(worker, orders[0], f"{type(e).__name__}: {e}")
+
+    async def _process_with_heartbeat(self, worker: WorkerStats, orders: List[Dict[str, Any]]):
+        """Await `process` on `orders`, renewing their leases every half `lease_sec` until it returns."""
+        if self.lease_sec is None:
+            await self.process(orders, worker.worker_id)
+            return
+        heartbeat = asyncio.create_task(self._heartbeat(worker, orders))
+        try:
+            await self.process(orders, worker.worker_id)
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, worker: WorkerStats, orders: List[Dict[str, Any]]):
+        while orders:
+            await asyncio.sleep(self.lease_sec / 2)
+            try:
+                held = await self._renew_leases(worker, orders)
+            except Exception as e:
+                # The next beat may still land within the lease
+                logger.error(f"Error renewing leases on {worker.worker_id}: {e}")
+                continue
+            orders = [order for order in orders if order["order_id"] in held]
+
+    async def _renew_leases(self, worker: WorkerStats, orders: List[Dict[str, Any]]) -> Set[str]:
+        """Order ids of `orders` that `worker` still holds, leased for a full `lease_sec` again."""
+        order_ids = [order["order_id"] for order in orders]
+        if self.lease_sec is None:
+            return set(order_ids)
+        held = set(await self.db.renew_leases(worker.worker_id, order_ids, self.lease_sec))
+        if len(held) < len(order_ids):
+            logger.warning(f"{worker.worker_id} lost the lease on {len(order_ids) - len(held)} order(s); "
+                           f"leaving them to their new holder")
+        return held
+
+    async def _process_one_at_a_time(self, worker: WorkerStats, orders: List[Dict[str, Any]]):
+        # The order being run keeps its lease through the heartbeat; the ones
+        # waiting their turn are renewed before the pass and whenever half a
+        # lease has passed. An order whose lease could not be renewed belongs
+        # to another worker and is skipped rather than run twice
+        held = await self._renew_leases(worker, orders)
+        renewed_at = time.monotonic()
+        for position, order in enumerate(orders):
+            if self.lease_sec is not None and time.monotonic() - renewed_at > self.lease_sec / 2:
+                held = await self._renew_leases(worker, [o for o in orders[position:] if o["order_id"] in held])
+                renewed_at = time.monotonic()
+            if order["order_id"] in held:
+                await self._process_claimed(worker, [order])
+
+    async def _run(self, worker: WorkerStats):
+        claimed: List[Dict[str, Any]] = []
+        try:
+            while self.running and not worker.stopping:
+                signals = self._signals
+                try:
+                    claimed = await self.db.claim_orders(worker.worker_id, self.batch_size, self.lease_sec)
+                except Exception as e:
+                    logger.error(f"Error claiming orders on {worker.worker_id}: {e}")
+                    await asyncio.sleep(self.error_backoff_sec)
+                    continue
+                if not claimed:
+                    await self._wait_for_work(worker, signals)
+                    continue
+                # Claimed again after every attempt's lease ran out (the worker
+                # hung or crashed each time): give up without another try
+                for order in [o for o in claimed if o.get("attempts", 1) > self.max_attempts]:
+                    claimed.remove(order)
+                    await self._dead_letter(worker, order, f"Lease expired on all {self.max_attempts} attempts")
+                if claimed:
+                    await self._process_claimed(worker, claimed)
+                claimed = []
+        except asyncio.CancelledError:
+            # Cancelled mid-batch (shutdown): let the next run pick the orders up
+            for order in claimed:
+                await asyncio.shield(self.db.release_order(order["order_id"], worker.worker_id))
+            raise
+        finally:
+            self._retired_processed += worker.processed
+            self._retired_failed += worker.failed
+            self._workers.pop(worker.worker_id, None)
+            self._tasks.pop(worker.worker_id, None)
+
+    async def stop(self):
+        self.running = False
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        workers = {worker_id: w.to_dict(now) for worker_id, w in self._workers.items()}
+        return {
+            "size": self.size,
+            "batch_size": self.batch_size,
+            "running": len(workers),
+            "busy": sum(1 for w in workers.values() if w["state"] == BUSY),
+            "processed": self._retired_processed + sum(w["processed"] for w in workers.values()),
+            "failed": self._retired_failed + sum(w["failed"] for w in workers.values()),
+            "resizes": self.resizes,
+            "batches": self.batches,
+            "retries": self.retries,
+            "dead_lettered": self.dead_lettered,
+            "lease_sec": self.lease_sec,
+            "max_attempts": self.max_attempts,
+            "waiting": len(self._waiters),
+            "wakeups": self.wakeups,
+            "idle_polls": self.idle_polls,
+            "workers": workers,
+        }